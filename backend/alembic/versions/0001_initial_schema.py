@@ -0,0 +1,111 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Matches what Base.metadata.create_all used to build at startup, so databases
+# created that way can be adopted with `alembic stamp 0001`
+resource_type = sa.Enum('VIDEO', 'ARTICLE', 'INTERACTIVE', 'QUIZ', 'SIMULATION', name='resourcetype')
+resource_status = sa.Enum('PENDING', 'IN_PROGRESS', 'COMPLETED', 'SKIPPED', name='resourcestatus')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password_hash', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+
+    op.create_table(
+        'user_profiles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('learning_style', sa.String(), nullable=True),
+        sa.Column('pace', sa.String(), nullable=True),
+        sa.Column('interests', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('goals', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_profiles_id'), 'user_profiles', ['id'], unique=False)
+
+    op.create_table(
+        'curriculums',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_curriculums_id'), 'curriculums', ['id'], unique=False)
+
+    op.create_table(
+        'curriculum_modules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('curriculum_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('order', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['curriculum_id'], ['curriculums.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_curriculum_modules_id'), 'curriculum_modules', ['id'], unique=False)
+
+    op.create_table(
+        'learning_resources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('url', sa.String(), nullable=False),
+        sa.Column('resource_type', resource_type, nullable=False),
+        sa.Column('status', resource_status, nullable=True),
+        sa.Column('order', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['module_id'], ['curriculum_modules.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_learning_resources_id'), 'learning_resources', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_learning_resources_id'), table_name='learning_resources')
+    op.drop_table('learning_resources')
+    op.drop_index(op.f('ix_curriculum_modules_id'), table_name='curriculum_modules')
+    op.drop_table('curriculum_modules')
+    op.drop_index(op.f('ix_curriculums_id'), table_name='curriculums')
+    op.drop_table('curriculums')
+    op.drop_index(op.f('ix_user_profiles_id'), table_name='user_profiles')
+    op.drop_table('user_profiles')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
+    resource_status.drop(op.get_bind(), checkfirst=True)
+    resource_type.drop(op.get_bind(), checkfirst=True)
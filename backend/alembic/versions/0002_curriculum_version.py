@@ -0,0 +1,28 @@
+"""curriculum version counter and keyset index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('curriculums', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.create_index('ix_curriculums_user_id_created_at', 'curriculums', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_curriculums_user_id_created_at', table_name='curriculums')
+    op.drop_column('curriculums', 'version')
@@ -0,0 +1,68 @@
+"""progress event log and daily rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Created by 0001
+resource_status = postgresql.ENUM('PENDING', 'IN_PROGRESS', 'COMPLETED', 'SKIPPED', name='resourcestatus', create_type=False)
+
+
+def upgrade() -> None:
+    op.create_table('progress_daily',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('completed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('started', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('skipped', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('events', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    op.create_table('progress_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('curriculum_id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('previous_status', resource_status, nullable=True),
+    sa.Column('status', resource_status, nullable=False),
+    sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_progress_events_user_id_occurred_at', 'progress_events', ['user_id', 'occurred_at'], unique=False)
+
+    # Seed rollups from current statuses; the day of the last change is the best date we have
+    op.execute("""
+        INSERT INTO progress_daily (user_id, day, completed, started, skipped, events)
+        SELECT c.user_id,
+               (COALESCE(r.status_changed_at, r.updated_at, r.created_at) AT TIME ZONE 'UTC')::date,
+               COUNT(*) FILTER (WHERE r.status = 'COMPLETED'),
+               COUNT(*) FILTER (WHERE r.status = 'IN_PROGRESS'),
+               COUNT(*) FILTER (WHERE r.status = 'SKIPPED'),
+               COUNT(*)
+        FROM learning_resources r
+        JOIN curriculum_modules m ON m.id = r.module_id
+        JOIN curriculums c ON c.id = m.curriculum_id
+        WHERE r.status IS NOT NULL AND r.status <> 'PENDING'
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_progress_events_user_id_occurred_at', table_name='progress_events')
+    op.drop_table('progress_events')
+    op.drop_table('progress_daily')
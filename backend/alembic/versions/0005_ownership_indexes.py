@@ -0,0 +1,38 @@
+"""indexes for ownership-checked and ordered child queries
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Racing profile creation could leave several profiles per user; keep the newest
+    op.execute("""
+        DELETE FROM user_profiles p
+        USING user_profiles newer
+        WHERE newer.user_id = p.user_id AND newer.id > p.id
+    """)
+
+    # Built concurrently so a large live database keeps taking writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_profiles_user_id', 'user_profiles', ['user_id'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_curriculum_modules_curriculum_id_order', 'curriculum_modules', ['curriculum_id', 'order'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_learning_resources_module_id_order', 'learning_resources', ['module_id', 'order'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_learning_resources_module_id_order', table_name='learning_resources')
+    op.drop_index('ix_curriculum_modules_curriculum_id_order', table_name='curriculum_modules')
+    op.drop_index('ix_user_profiles_user_id', table_name='user_profiles')
@@ -0,0 +1,38 @@
+"""denormalized owner on learning resources
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('learning_resources', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE learning_resources r
+        SET user_id = c.user_id
+        FROM curriculum_modules m
+        JOIN curriculums c ON c.id = m.curriculum_id
+        WHERE m.id = r.module_id
+    """)
+    op.alter_column('learning_resources', 'user_id', nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_learning_resources_user_id_status', 'learning_resources', ['user_id', 'status'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_learning_resources_user_id_status', table_name='learning_resources')
+    op.drop_column('learning_resources', 'user_id')
@@ -0,0 +1,38 @@
+"""curriculum soft delete and cascading foreign keys
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('curriculums', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_curriculums_deleted_at', 'curriculums', ['deleted_at'], unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+    op.drop_constraint('curriculum_modules_curriculum_id_fkey', 'curriculum_modules', type_='foreignkey')
+    op.create_foreign_key('curriculum_modules_curriculum_id_fkey', 'curriculum_modules', 'curriculums', ['curriculum_id'], ['id'], ondelete='CASCADE')
+    op.drop_constraint('learning_resources_module_id_fkey', 'learning_resources', type_='foreignkey')
+    op.create_foreign_key('learning_resources_module_id_fkey', 'learning_resources', 'curriculum_modules', ['module_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('learning_resources_module_id_fkey', 'learning_resources', type_='foreignkey')
+    op.create_foreign_key('learning_resources_module_id_fkey', 'learning_resources', 'curriculum_modules', ['module_id'], ['id'])
+    op.drop_constraint('curriculum_modules_curriculum_id_fkey', 'curriculum_modules', type_='foreignkey')
+    op.create_foreign_key('curriculum_modules_curriculum_id_fkey', 'curriculum_modules', 'curriculums', ['curriculum_id'], ['id'])
+
+    op.drop_index('ix_curriculums_deleted_at', table_name='curriculums', postgresql_where=sa.text('deleted_at IS NOT NULL'))
+    op.drop_column('curriculums', 'deleted_at')
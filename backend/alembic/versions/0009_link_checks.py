@@ -0,0 +1,39 @@
+"""link check cache and resource link status
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('link_checks',
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('http_status', sa.Integer(), nullable=True),
+    sa.Column('final_url', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('checked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('url')
+    )
+    # Nullable with no default, so existing rows are not rewritten
+    op.add_column('learning_resources', sa.Column('link_status', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('learning_resources', 'link_status')
+    op.drop_table('link_checks')
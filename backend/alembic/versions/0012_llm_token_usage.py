@@ -0,0 +1,38 @@
+"""per-user llm token usage and quotas
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('tier', sa.String(), server_default='free', nullable=False))
+    op.add_column('users', sa.Column('llm_daily_token_quota', sa.BigInteger(), nullable=True))
+    op.create_table('llm_token_usage',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('tokens', sa.BigInteger(), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'kind')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('llm_token_usage')
+    op.drop_column('users', 'llm_daily_token_quota')
+    op.drop_column('users', 'tier')
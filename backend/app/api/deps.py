@@ -1,17 +1,15 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.core.replicas import replica_router
 from app.core.security import verify_token
 from app.models.user import User
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
 
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+def _token_claims(credentials: HTTPAuthorizationCredentials) -> Dict[str, Any]:
     try:
         payload = verify_token(credentials.credentials)
         email: str = payload.get("sub")
@@ -27,13 +25,67 @@ async def get_current_user(
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    return payload
+
+def _user_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="User not found",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    email = _token_claims(credentials)["sub"]
     user = db.query(User).filter(User.email == email).first()
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _user_not_found()
+    
+    # Writes committed through this request's session keep the user's next reads on the primary
+    db.info["user_id"] = user.id
+    return {"sub": email, "user_id": user.id}
+
+def user_id_from_token(token: str) -> Optional[int]:
+    """The id of the user a JWT was issued to, or None if it is invalid or the user no longer exists"""
+    try:
+        email = verify_token(token).get("sub")
+    except ValueError:
+        return None
+    if email is None:
+        return None
+    with SessionLocal() as db:
+        return db.query(User.id).filter(User.email == email).scalar()
+
+def get_read_db(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Iterator[Session]:
+    """Session for endpoints that only read: a replica when configured, unless the user has just written.
     
-    return {"sub": email, "user_id": user.id} 
\ No newline at end of file
+    The user is looked up on this session too, so a read request never
+    checks out a primary connection. Tokens carry the user's id ("uid") so
+    the session can be chosen before the lookup; older tokens without it
+    are always routed to a replica.
+    """
+    claims = _token_claims(credentials)
+    db = replica_router.read_session(claims.get("uid"))
+    try:
+        user_id = db.query(User.id).filter(User.email == claims["sub"]).scalar()
+        if user_id is None:
+            # A replica may not have the row yet for a user who has only just registered
+            with SessionLocal() as primary:
+                user_id = primary.query(User.id).filter(User.email == claims["sub"]).scalar()
+        if user_id is None:
+            raise _user_not_found()
+        db.info["current_user"] = {"sub": claims["sub"], "user_id": user_id}
+        yield db
+    finally:
+        db.close()
+
+def get_current_read_user(db: Session = Depends(get_read_db)) -> Dict[str, Any]:
+    """The current user, for endpoints that read through get_read_db"""
+    return db.info["current_user"]
+
+def get_agent_service():
+    """Shared AgentService; imported on first use so LangChain stays out of app startup"""
+    from app.services.agent_service import get_agent_service as shared_agent_service
+    return shared_agent_service()
\ No newline at end of file
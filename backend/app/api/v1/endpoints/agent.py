@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.api.deps import get_current_user
-from app.services.agent_service import AgentService
+from app.api.deps import get_current_user, get_agent_service, user_id_from_token
+from app.services.connection_manager import manager
+from app.services.llm_scheduler import LLMOverloadedError
+from app.services.token_quota import TokenQuotaExceededError
 from pydantic import BaseModel
 from typing import Dict, Any
+import asyncio
 import json
 
 router = APIRouter()
@@ -17,11 +20,11 @@ class ChatMessage(BaseModel):
 async def chat_with_agent(
     chat_data: ChatMessage,
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    agent_service = Depends(get_agent_service)
 ):
     """Chat with the AI agent"""
     try:
-        agent_service = AgentService()
         response = await agent_service.chat(
             user_id=current_user["user_id"],
             message=chat_data.message,
@@ -30,37 +33,33 @@ async def chat_with_agent(
         )
         
         return {"response": response}
+    except TokenQuotaExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except LLMOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get agent response: {str(e)}"
         )
 
-# WebSocket endpoint for real-time chat
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-manager = ConnectionManager()
-
+# WebSocket endpoint for real-time chat; generation jobs also push their completion here
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    await manager.connect(websocket)
-    agent_service = AgentService()
+async def websocket_endpoint(websocket: WebSocket, user_id: int, token: str = Query(None)):
+    # Browsers cannot set headers on a WebSocket, so the JWT comes as ?token=
+    if token is None or await asyncio.to_thread(user_id_from_token, token) != user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await manager.connect(websocket, user_id)
+    agent_service = get_agent_service()
     
     try:
         while True:
@@ -68,12 +67,19 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
             message_data = json.loads(data)
             
             # Process message with agent
-            response = await agent_service.chat(
-                user_id=user_id,
-                message=message_data.get("message", ""),
-                curriculum_id=message_data.get("curriculum_id"),
-                db=None  # WebSocket doesn't have db session
-            )
+            try:
+                response = await agent_service.chat(
+                    user_id=user_id,
+                    message=message_data.get("message", ""),
+                    curriculum_id=message_data.get("curriculum_id"),
+                    db=None  # WebSocket doesn't have db session
+                )
+            except (LLMOverloadedError, TokenQuotaExceededError) as e:
+                await manager.send_personal_message(
+                    json.dumps({"error": str(e), "retry_after": e.retry_after}),
+                    websocket
+                )
+                continue
             
             # Send response back
             await manager.send_personal_message(
@@ -81,4 +87,4 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
                 websocket
             )
     except WebSocketDisconnect:
-        manager.disconnect(websocket) 
\ No newline at end of file
+        manager.disconnect(websocket, user_id) 
\ No newline at end of file
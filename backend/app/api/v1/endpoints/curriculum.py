@@ -1,54 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query, Request, Response, status
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import get_db
-from app.api.deps import get_current_user
-from app.schemas.curriculum import CurriculumCreate, CurriculumResponse, CurriculumComplete, ProgressUpdate
+from app.api.deps import get_current_read_user, get_current_user, get_read_db
+from app.core.pagination import InvalidCursorError, make_etag, etag_matches
+from app.schemas.curriculum import CurriculumCreate, CurriculumResponse, CurriculumComplete, GenerationJobResponse, ProgressUpdate
+from app.services.background_tasks import background_task_service
+from app.services.curriculum_cache import curriculum_cache
 from app.services.curriculum_service import CurriculumService
-from app.services.agent_service import AgentService
-from typing import Dict, Any, List
+from app.services.generation_jobs import GenerationQueueFullError, generation_job_runner
+from app.services.token_quota import TokenQuotaExceededError, token_quota
+from typing import Dict, Any, List, Optional
 
 router = APIRouter()
 
-@router.post("/generate", response_model=CurriculumResponse)
-async def generate_curriculum(
+# Clients may keep copies but must revalidate them with If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+def _curriculum_etag(curriculum) -> str:
+    return make_etag("curriculum", curriculum.id, curriculum.version, curriculum.updated_at)
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+@router.post("/generate", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def generate_curriculum(
     curriculum_data: CurriculumCreate,
+    request: Request,
+    response: Response,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Generate a new personalized curriculum using AI agent"""
+    """Queue generation of a new personalized curriculum; poll the job or wait for its WebSocket push"""
     try:
-        agent_service = AgentService()
-        curriculum_service = CurriculumService(db)
-        
-        # Generate curriculum using AI agent
-        curriculum = await agent_service.generate_curriculum(
-            user_id=current_user["user_id"],
-            curriculum_data=curriculum_data,
-            db=db
+        # Cheap to refuse now; each of the job's LLM calls is checked again as it runs
+        token_quota.check(current_user["user_id"])
+        job = generation_job_runner.submit(db, current_user["user_id"], curriculum_data)
+    except (GenerationQueueFullError, TokenQuotaExceededError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
         )
-        
-        return curriculum
-    except Exception as e:
+    
+    response.headers["Location"] = str(request.url_for("get_generation_job", job_id=job.id))
+    return job
+
+@router.get("/jobs/{job_id}", response_model=GenerationJobResponse)
+def get_generation_job(
+    job_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the status of a curriculum generation job"""
+    job = generation_job_runner.get_job(db, job_id, current_user["user_id"])
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate curriculum: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Generation job not found"
         )
+    return job
 
 @router.get("/", response_model=List[CurriculumResponse])
 def get_user_curriculums(
-    current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Dict[str, Any] = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Get all curriculums for the current user"""
+    """Get a page of the current user's curriculums, newest first"""
     curriculum_service = CurriculumService(db)
-    curriculums = curriculum_service.get_user_curriculums(current_user["user_id"])
+    try:
+        curriculums, next_cursor = curriculum_service.get_user_curriculums(current_user["user_id"], limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    etag = make_etag("curriculums", next_cursor, *(
+        f"{c.id}.{c.version}.{c.updated_at}" for c in curriculums
+    ))
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
     return curriculums
 
 @router.get("/{curriculum_id}", response_model=CurriculumComplete)
 def get_curriculum(
     curriculum_id: int,
-    current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    current_user: Dict[str, Any] = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific curriculum with all modules and resources"""
     curriculum_service = CurriculumService(db)
@@ -60,15 +111,32 @@ def get_curriculum(
             detail="Curriculum not found"
         )
     
-    return curriculum
+    # Checked before modules and resources are loaded, so a 304 skips that work entirely
+    etag = _curriculum_etag(curriculum)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    
+    # The tree is cached serialized, so a hit skips the module and resource queries and validation
+    if settings.CURRICULUM_CACHE_ENABLED:
+        body = curriculum_cache.get_or_load(
+            curriculum.id, curriculum.version, lambda: curriculum_service.serialize_curriculum_tree(curriculum.id)
+        )
+    else:
+        body = curriculum_service.serialize_curriculum_tree(curriculum.id)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
 
 @router.delete("/{curriculum_id}")
 def delete_curriculum(
     curriculum_id: int,
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a curriculum"""
+    """Delete a curriculum; its modules and resources are purged after the response is sent"""
     curriculum_service = CurriculumService(db)
     success = curriculum_service.delete_curriculum(curriculum_id, current_user["user_id"])
     
@@ -78,4 +146,5 @@ def delete_curriculum(
             detail="Curriculum not found"
         )
     
+    background_tasks.add_task(background_task_service.purge_curriculum, curriculum_id)
     return {"message": "Curriculum deleted successfully"} 
\ No newline at end of file
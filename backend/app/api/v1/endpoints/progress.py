@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.api.deps import get_current_user
-from app.schemas.curriculum import ProgressUpdate
+from app.api.deps import get_current_read_user, get_current_user, get_read_db
+from app.schemas.curriculum import ProgressUpdate, ProgressBatchUpdate, ProgressBatchResponse
+from app.core.pagination import InvalidCursorError
 from app.services.progress_service import ProgressService
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 router = APIRouter()
 
@@ -36,10 +37,26 @@ def update_progress(
             detail=f"Failed to update progress: {str(e)}"
         )
 
-@router.get("/summary")
-def get_progress_summary(
+@router.post("/batch", response_model=ProgressBatchResponse)
+def batch_update_progress(
+    batch: ProgressBatchUpdate,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
+):
+    """Apply progress updates queued offline in one transaction, last writer wins per resource"""
+    try:
+        progress_service = ProgressService(db)
+        return progress_service.apply_status_updates(current_user["user_id"], batch.updates)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update progress: {str(e)}"
+        )
+
+@router.get("/summary")
+def get_progress_summary(
+    current_user: Dict[str, Any] = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get a summary of the user's learning progress"""
     try:
@@ -50,4 +67,37 @@ def get_progress_summary(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get progress summary: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.get("/history")
+def get_progress_history(
+    days: int = Query(30, ge=1, le=365),
+    current_user: Dict[str, Any] = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get daily completions, the current streak and weekly pace"""
+    try:
+        progress_service = ProgressService(db)
+        return progress_service.get_progress_history(current_user["user_id"], days)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get progress history: {str(e)}"
+        )
+
+@router.get("/recent")
+def get_recent_progress(
+    limit: int = Query(5, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get a page of recently started or completed resources, newest first"""
+    progress_service = ProgressService(db)
+    try:
+        return progress_service.get_recent_progress(current_user["user_id"], limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
\ No newline at end of file
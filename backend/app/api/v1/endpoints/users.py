@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import verify_password, get_password_hash, create_access_token
 from app.models.user import User, UserProfile
-from app.schemas.user import UserCreate, UserLogin, UserResponse, UserProfileCreate, UserProfileUpdate, UserProfileResponse, Token
-from app.api.deps import get_current_user
+from app.schemas.user import UserCreate, UserLogin, UserResponse, UserProfileCreate, UserProfileUpdate, UserProfileResponse, DeviceTokenCreate, DeviceTokenResponse, Token, TokenUsageResponse
+from app.api.deps import get_current_read_user, get_current_user, get_read_db
+from app.services.conversation_memory import conversation_memory
+from app.services.profile_cache import profile_cache
+from app.services.push_service import DeviceTokenService
+from app.services.token_quota import token_quota
 from typing import Dict, Any
 
 router = APIRouter()
@@ -46,7 +50,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
@@ -79,15 +83,19 @@ def update_profile(
     
     db.commit()
     db.refresh(db_profile)
+    
+    # Drop cached copies of the profile and the chat context blocks built from it
+    profile_cache.invalidate(user.id, db)
+    conversation_memory.invalidate_context(user.id)
     return db_profile
 
 @router.get("/me/profile", response_model=UserProfileResponse)
 def get_profile(
-    current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Dict[str, Any] = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     user = db.query(User).filter(User.email == current_user["sub"]).first()
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user.id).first()
+    profile = profile_cache.get(user.id, db)
     
     if not profile:
         raise HTTPException(
@@ -95,4 +103,36 @@ def get_profile(
             detail="Profile not found"
         )
     
-    return profile 
\ No newline at end of file
+    return profile 
+
+@router.post("/me/devices", response_model=DeviceTokenResponse, status_code=status.HTTP_201_CREATED)
+def register_device(
+    device: DeviceTokenCreate,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Register a device's push notification token; registering it again refreshes it"""
+    return DeviceTokenService(db).register(current_user["user_id"], device.token, device.platform)
+
+@router.delete("/me/devices/{token}")
+def unregister_device(
+    token: str,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stop sending push notifications to a device"""
+    if not DeviceTokenService(db).unregister(current_user["user_id"], token):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found"
+        )
+    return {"message": "Device unregistered successfully"}
+
+@router.get("/me/usage", response_model=TokenUsageResponse)
+def get_token_usage(
+    days: int = Query(7, ge=1, le=90),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the current user's daily LLM token budget and usage over the last few days"""
+    return token_quota.usage(db, current_user["user_id"], days)
\ No newline at end of file
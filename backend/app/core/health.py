@@ -0,0 +1,40 @@
+import os
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import text
+from app.core.database import engine
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+_head_revision: Optional[str] = None
+
+def head_revision() -> str:
+    """Latest migration revision shipped with this build (read once)"""
+    global _head_revision
+    if _head_revision is None:
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        _head_revision = ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+    return _head_revision
+
+def check_database() -> Tuple[bool, Dict[str, Any]]:
+    """Whether the database is reachable and migrated to the head revision"""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            try:
+                current = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+            except Exception:
+                # No alembic_version table: the schema was never migrated
+                current = None
+    except Exception as e:
+        return False, {"status": "unavailable", "error": str(e).splitlines()[0]}
+    
+    head = head_revision()
+    if current != head:
+        return False, {"status": "migrations pending", "revision": current, "head": head}
+    return True, {"status": "ok", "revision": current}
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    """Checks that must pass before the app can serve traffic"""
+    database_ok, database = check_database()
+    return database_ok, {"status": "ready" if database_ok else "not ready", "checks": {"database": database}}
\ No newline at end of file
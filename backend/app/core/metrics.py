@@ -0,0 +1,192 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Request latencies are mostly sub-second; LLM calls and jobs need the long tail
+HTTP_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+SLOW_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 300.0, 1800.0]
+COUNT_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metric:
+    """Base for a labelled metric family rendered in Prometheus text format"""
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return lines + self._samples()
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    type = "counter"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(Metric):
+    """A value set directly, or read from a callback at scrape time"""
+    
+    type = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), collect: Callable[[], Dict[LabelValues, float]] = None):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.collect = collect
+    
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self.values[self._key(labels)] = value
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self.values.items())
+        if self.collect:
+            items += list(self.collect().items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(Metric):
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: List[float] = HTTP_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = list(buckets)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self.series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self.series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+    
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self.series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide metric families, rendered together for /metrics"""
+    
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+    
+    def _register(self, metric: Metric) -> Metric:
+        # Re-registering returns the existing family so module reloads stay harmless
+        return self.metrics.setdefault(metric.name, metric)
+    
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+    
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = (), collect: Callable = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labels, collect))
+    
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: List[float] = HTTP_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+http_requests_total = metrics.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status")
+)
+http_request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_request_sql_statements = metrics.histogram(
+    "http_request_sql_statements", "SQL statements executed per HTTP request", ("method", "route"), COUNT_BUCKETS
+)
+http_request_db_seconds = metrics.histogram(
+    "http_request_db_seconds", "Total time spent in SQL per HTTP request", ("method", "route")
+)
+llm_calls_total = metrics.counter(
+    "llm_calls_total", "LLM calls made by the agent by kind and outcome", ("kind", "outcome")
+)
+llm_tokens_total = metrics.counter(
+    "llm_tokens_total", "Tokens used by LLM calls as reported by the provider, else estimated", ("kind",)
+)
+llm_call_duration_seconds = metrics.histogram(
+    "llm_call_duration_seconds", "LLM call latency including scheduling, routing and batching", ("kind",), SLOW_BUCKETS
+)
+llm_structured_outputs_total = metrics.counter(
+    "llm_structured_outputs_total",
+    "Structured LLM replies by kind and outcome (valid, repaired, partial or invalid)",
+    ("kind", "outcome")
+)
+llm_retries_total = metrics.counter(
+    "llm_retries_total", "LLM calls re-asked because the reply was unusable", ("kind",)
+)
+llm_wasted_tokens_total = metrics.counter(
+    "llm_wasted_tokens_total", "Tokens spent on LLM replies, or parts of them, that were thrown away", ("kind",)
+)
+background_job_duration_seconds = metrics.histogram(
+    "background_job_duration_seconds", "Background job run time", ("job", "outcome"), SLOW_BUCKETS
+)
+
+@contextmanager
+def time_job(job: str) -> Iterator[None]:
+    """Record how long a background job ran and whether it raised"""
+    started = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        background_job_duration_seconds.observe(time.perf_counter() - started, job=job, outcome=outcome)
\ No newline at end of file
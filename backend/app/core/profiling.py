@@ -0,0 +1,162 @@
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Optional, Set, Tuple
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.metrics import (
+    http_requests_total,
+    http_request_duration_seconds,
+    http_request_sql_statements,
+    http_request_db_seconds
+)
+
+logger = logging.getLogger(__name__)
+
+class RequestStats:
+    """SQL work done on behalf of one HTTP request"""
+    
+    def __init__(self):
+        self.sql_statements = 0
+        self.db_seconds = 0.0
+        # Threads that ran SQL for this request (sync endpoints run in the threadpool)
+        self.threads: Set[int] = {threading.get_ident()}
+
+# Copied into threadpool workers, so sync endpoints update the same stats object
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements and time spent in SQL against the current request"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.sql_statements += 1
+            stats.db_seconds += time.perf_counter() - started
+            stats.threads.add(threading.get_ident())
+    
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+def _folded_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """Samples every thread's stack on an interval into a rolling buffer.
+    
+    Slow requests dump the samples taken on their threads while they ran, in
+    the folded format that flamegraph.pl and speedscope read. Async endpoints
+    share the event loop thread, so their dumps include whatever else the loop
+    was doing concurrently.
+    """
+    
+    def __init__(self, interval_ms: float = 5, max_samples: int = 200000):
+        self.interval = interval_ms / 1000
+        self.samples: Deque[Tuple[float, int, str]] = deque(maxlen=max_samples)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+    
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._running = False
+    
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while self._running:
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                # Skip ourselves and an event loop parked in select()
+                if thread_id == own or os.path.basename(frame.f_code.co_filename) == "selectors.py":
+                    continue
+                self.samples.append((now, thread_id, _folded_stack(frame)))
+            time.sleep(self.interval)
+    
+    def collapse(self, started: float, finished: float, threads: Set[int]) -> Counter:
+        """Folded stacks sampled on the given threads between two perf_counter readings"""
+        return Counter(
+            stack for at, thread_id, stack in list(self.samples)
+            if started <= at <= finished and thread_id in threads
+        )
+    
+    def dump(self, label: str, started: float, finished: float, threads: Set[int]) -> Optional[str]:
+        stacks = self.collapse(started, finished, threads)
+        if not stacks:
+            return None
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        path = os.path.join(
+            settings.PROFILING_OUTPUT_DIR,
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{slug}_{(finished - started) * 1000:.0f}ms.folded"
+        )
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+# Global sampling profiler; only started when PROFILING_ENABLED is set
+sampling_profiler = SamplingProfiler(settings.PROFILING_SAMPLE_INTERVAL_MS)
+
+def _route_template(request: Request) -> str:
+    # Templates rather than raw paths keep label cardinality bounded
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+async def profiling_middleware(request: Request, call_next):
+    """Record latency, status and SQL work per route, and dump profiles of slow requests"""
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        finished = time.perf_counter()
+        _request_stats.reset(token)
+        route = _route_template(request)
+        method = request.method
+        elapsed = finished - started
+        
+        http_requests_total.inc(method=method, route=route, status=str(status_code))
+        http_request_duration_seconds.observe(elapsed, method=method, route=route)
+        http_request_sql_statements.observe(stats.sql_statements, method=method, route=route)
+        http_request_db_seconds.observe(stats.db_seconds, method=method, route=route)
+        
+        if settings.PROFILING_ENABLED and elapsed * 1000 >= settings.PROFILING_SLOW_REQUEST_MS:
+            path = sampling_profiler.dump(f"{method} {route}", started, finished, stats.threads)
+            logger.warning(
+                f"Slow request {method} {route}: {elapsed * 1000:.0f}ms, "
+                f"{stats.sql_statements} SQL statements ({stats.db_seconds * 1000:.0f}ms), profile: {path}"
+            )
\ No newline at end of file
@@ -0,0 +1,237 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds behind the primary; 0 on a caught-up standby or on a database that is not a standby at all
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+# Users whose recent writes are remembered before expired ones are pruned
+MAX_STICKY_USERS = 10000
+# Seconds to stop calling Redis after it fails, so an outage costs one timeout, not one per request
+REDIS_RETRY_SECONDS = 30
+
+db_read_sessions_total = metrics.counter(
+    "db_read_sessions_total",
+    "Read-only sessions by route (replica, or read_your_writes and no_healthy_replica on the primary)",
+    ("route",)
+)
+
+class Replica:
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.healthy = True
+        self.lag_seconds = 0.0
+
+class ReplicaRouter:
+    """Sends read-only sessions to healthy read replicas in turn.
+    
+    Replicas are health checked every health_check_seconds and left out of
+    rotation while they are unreachable or more than max_lag_seconds behind;
+    a replica that fails when a session is opened is left out immediately.
+    A user who wrote in the last sticky_seconds reads from the primary, so
+    they see their own writes. Writes are remembered in memory and, with
+    Redis, under a per-user key that expires after sticky_seconds, so a
+    write through one process pins the user's reads in every process. With
+    no replicas, or none healthy, every session goes to the primary.
+    """
+    
+    def __init__(
+        self,
+        urls: List[str],
+        health_check_seconds: float,
+        max_lag_seconds: float,
+        sticky_seconds: float,
+        redis_url: Optional[str] = None
+    ):
+        self.health_check_seconds = health_check_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.sticky_seconds = sticky_seconds
+        self.redis_url = redis_url
+        
+        self.replicas = [
+            Replica(f"replica{i}", create_engine(url, pool_pre_ping=True))
+            for i, url in enumerate(urls)
+        ]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._last_writes: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+        self._redis_retry_at = 0.0
+    
+    @property
+    def engines(self) -> List[Engine]:
+        return [replica.engine for replica in self.replicas]
+    
+    def read_session(self, user_id: Optional[int] = None) -> Session:
+        """A session for queries that only read, on a replica unless the user has just written"""
+        if not self.replicas:
+            return SessionLocal()
+        if user_id is not None and self._wrote_recently(user_id):
+            db_read_sessions_total.inc(route="read_your_writes")
+            return SessionLocal()
+        
+        for replica in self._rotation():
+            db = replica.session_factory()
+            try:
+                # Check out a connection now, so a dead replica fails over here rather than mid-request
+                db.connection()
+            except SQLAlchemyError as e:
+                db.close()
+                self._mark_unhealthy(replica, e)
+                continue
+            db_read_sessions_total.inc(route="replica")
+            return db
+        
+        db_read_sessions_total.inc(route="no_healthy_replica")
+        return SessionLocal()
+    
+    def record_write(self, user_id: int) -> None:
+        """Remember that a user just wrote, so their reads stay on the primary for a while"""
+        if not self.replicas or self.sticky_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_writes[user_id] = now
+            if len(self._last_writes) > MAX_STICKY_USERS:
+                cutoff = now - self.sticky_seconds
+                self._last_writes = {uid: at for uid, at in self._last_writes.items() if at > cutoff}
+        
+        try:
+            client = self._redis_client()
+            if client is not None:
+                client.set(self._redis_key(user_id), 1, px=max(1, int(self.sticky_seconds * 1000)))
+        except Exception as e:
+            self._redis_failed(e)
+    
+    def check_health(self) -> None:
+        """Probe every replica and update whether it is in rotation"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    lag = float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+            except SQLAlchemyError as e:
+                self._mark_unhealthy(replica, e)
+                continue
+            
+            replica.lag_seconds = lag
+            healthy = lag <= self.max_lag_seconds
+            if healthy != replica.healthy:
+                logger.warning(f"Read replica {replica.name} {'back in' if healthy else 'out of'} rotation (lag {lag:.1f}s)")
+            replica.healthy = healthy
+    
+    async def start(self):
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._health_check_loop())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _health_check_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.check_health)
+            except Exception as e:
+                logger.error(f"Error checking read replicas: {e}")
+            await asyncio.sleep(self.health_check_seconds)
+    
+    def _rotation(self) -> List[Replica]:
+        """Healthy replicas, starting from the next one in round-robin order"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return []
+        start = next(self._next) % len(healthy)
+        return healthy[start:] + healthy[:start]
+    
+    def _mark_unhealthy(self, replica: Replica, error: Exception) -> None:
+        if replica.healthy:
+            logger.warning(f"Read replica {replica.name} out of rotation: {str(error).splitlines()[0]}")
+        replica.healthy = False
+    
+    def _wrote_recently(self, user_id: int) -> bool:
+        with self._lock:
+            written_at = self._last_writes.get(user_id)
+        if written_at is not None and time.monotonic() - written_at < self.sticky_seconds:
+            return True
+        
+        # A write through another process
+        try:
+            client = self._redis_client()
+            if client is not None:
+                return bool(client.exists(self._redis_key(user_id)))
+        except Exception as e:
+            self._redis_failed(e)
+        return False
+    
+    def _redis_key(self, user_id: int) -> str:
+        return f"wrote:{user_id}"
+    
+    def _redis_client(self):
+        if not self.redis_url or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        return self._redis
+    
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"Read-your-writes Redis keys unavailable, only this process's writes count for {REDIS_RETRY_SECONDS}s: {error}")
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+# Global replica router instance
+replica_router = ReplicaRouter(
+    urls=settings.DATABASE_REPLICA_URLS,
+    health_check_seconds=settings.DATABASE_REPLICA_HEALTH_CHECK_SECONDS,
+    max_lag_seconds=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    sticky_seconds=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    redis_url=settings.REDIS_URL if settings.DATABASE_READ_YOUR_WRITES_REDIS_ENABLED else None
+)
+
+metrics.gauge(
+    "db_replicas_healthy", "Read replicas in rotation",
+    collect=lambda: {(): sum(1 for replica in replica_router.replicas if replica.healthy)}
+)
+
+# Primary sessions whose info carries a user_id (set by get_current_user and the generation
+# workers) report committed writes, which pins that user's reads to the primary for a while
+@event.listens_for(SessionLocal, "after_flush")
+def _flagged_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flagged_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _recorded_write(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        replica_router.record_write(session.info["user_id"])
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discarded_write(session):
+    session.info.pop("wrote", None)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import json
+import re
+from typing import Any, List, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+M = TypeVar("M", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+# Truncated replies are cut back one element at a time; give up on hopeless ones
+MAX_REPAIR_CUTS = 200
+
+class StructuredOutputError(ValueError):
+    """An LLM reply had no usable structure, even after repair and re-asking"""
+
+def response_payload(response: Any) -> Any:
+    """The structured part of a chat model reply: the function call's arguments if it made one, else its text"""
+    function_call = (getattr(response, "additional_kwargs", None) or {}).get("function_call")
+    if function_call:
+        # A JSON string, parsed (and repaired if it was cut off) by the caller
+        return function_call.get("arguments") or ""
+    return response.content
+
+def _cut_points(text: str) -> List[Tuple[int, str]]:
+    """(end, closing brackets) for every prefix of text that ends after a complete element or value"""
+    stack: List[str] = []
+    points = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            # Not a cut point: closing here would invent an empty structure
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]" and stack:
+            stack.pop()
+            points.append((i + 1, "".join(reversed(stack))))
+            if not stack:
+                break
+        elif ch == "," and stack:
+            points.append((i, "".join(reversed(stack))))
+    return points
+
+def repair_json(text: str) -> Tuple[Any, bool]:
+    """Parse JSON from an LLM reply, repairing trailing commas and truncation.
+    
+    Code fences and prose around the JSON are ignored. A reply that was cut
+    off is closed after its last complete element, so a truncated list loses
+    only the item that was being written. Returns the value and whether it
+    needed repair, or raises StructuredOutputError.
+    """
+    text = text or ""
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise StructuredOutputError("No JSON object in the reply")
+    text = text[min(starts):]
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(text)[0], False
+    except ValueError:
+        pass
+    
+    text = _TRAILING_COMMA.sub(r"\1", text)
+    for end, closers in reversed(_cut_points(text)[-MAX_REPAIR_CUTS:]):
+        try:
+            return decoder.raw_decode(_TRAILING_COMMA.sub(r"\1", text[:end].rstrip() + closers))[0], True
+        except ValueError:
+            continue
+    raise StructuredOutputError("Could not repair the JSON in the reply")
+
+def parse_payload(payload: Any) -> Tuple[Any, bool]:
+    """Parsed tool arguments or reply text, and whether it needed repair"""
+    if isinstance(payload, (dict, list)):
+        return payload, False
+    return repair_json(payload)
+
+def validation_errors(error: ValidationError, limit: int = 5) -> List[str]:
+    """Short descriptions of a validation error's first few problems"""
+    return [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'value'}: {detail['msg']}"
+        for detail in error.errors()[:limit]
+    ]
+
+def validate_items(items: Any, model: Type[M], label: str = "item") -> Tuple[List[M], List[str]]:
+    """Validate each item of a list on its own, keeping the valid ones and describing the rest"""
+    if not isinstance(items, list):
+        return [], [f"expected a list of {label}s"]
+    valid, errors = [], []
+    for i, item in enumerate(items):
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError as e:
+            errors.extend(f"{label} {i + 1} {problem}" for problem in validation_errors(e, limit=2))
+    return valid, errors
\ No newline at end of file
@@ -0,0 +1,49 @@
+from typing import Any, Optional
+
+_UNLOADED = object()
+_encoding: Any = _UNLOADED
+
+def _get_encoding():
+    # Loaded on first use: the BPE tables take a while to read (or download)
+    global _encoding
+    if _encoding is _UNLOADED:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # tiktoken is optional; fall back to a character-based estimate
+            _encoding = None
+    return _encoding
+
+def count_tokens(text: Optional[str]) -> int:
+    """Count (or estimate) the number of LLM tokens in a piece of text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+def truncate_to_tokens(text: Optional[str], max_tokens: int) -> str:
+    """Truncate text so that it fits within a token budget"""
+    if not text or max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+def usage_from_response(response: Any) -> Optional[int]:
+    """Total tokens reported by a LangChain chat model response, if any"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    metadata = getattr(response, "response_metadata", None) or {}
+    # OpenAI reports "token_usage", Gemini reports "usage_metadata"
+    token_usage = metadata.get("token_usage") or metadata.get("usage_metadata") or {}
+    total = token_usage.get("total_tokens") or token_usage.get("total_token_count")
+    return int(total) if total else None
\ No newline at end of file
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Index
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import enum
@@ -26,15 +26,29 @@ class Curriculum(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped whenever the curriculum or anything in it changes; part of its ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Set when the learner deletes it; the rows are purged in the background
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
-    modules = relationship("CurriculumModule", back_populates="curriculum")
+    modules = relationship(
+        "CurriculumModule", back_populates="curriculum", order_by="(CurriculumModule.order, CurriculumModule.id)",
+        cascade="all, delete-orphan", passive_deletes=True
+    )
+    
+    __table_args__ = (
+        # Keyset pagination of a user's curriculums, newest first
+        Index("ix_curriculums_user_id_created_at", "user_id", "created_at", "id"),
+        # Lets the purge sweep find deleted curriculums without scanning live ones
+        Index("ix_curriculums_deleted_at", "deleted_at", postgresql_where=text("deleted_at IS NOT NULL")),
+    )
 
 class CurriculumModule(Base):
     __tablename__ = "curriculum_modules"
     
     id = Column(Integer, primary_key=True, index=True)
-    curriculum_id = Column(Integer, ForeignKey("curriculums.id"), nullable=False)
+    curriculum_id = Column(Integer, ForeignKey("curriculums.id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     order = Column(Integer, nullable=False)
@@ -43,21 +57,40 @@ class CurriculumModule(Base):
     
     # Relationships
     curriculum = relationship("Curriculum", back_populates="modules")
-    resources = relationship("LearningResource", back_populates="module")
+    resources = relationship(
+        "LearningResource", back_populates="module", order_by="(LearningResource.order, LearningResource.id)",
+        cascade="all, delete-orphan", passive_deletes=True
+    )
+    
+    __table_args__ = (
+        Index("ix_curriculum_modules_curriculum_id_order", "curriculum_id", "order"),
+    )
 
 class LearningResource(Base):
     __tablename__ = "learning_resources"
     
     id = Column(Integer, primary_key=True, index=True)
-    module_id = Column(Integer, ForeignKey("curriculum_modules.id"), nullable=False)
+    module_id = Column(Integer, ForeignKey("curriculum_modules.id", ondelete="CASCADE"), nullable=False)
+    # Owner of the curriculum, copied down so ownership checks and summaries need no joins
+    user_id = Column(Integer, nullable=False)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     url = Column(String, nullable=False)
+    # Result of the link check when the resource was generated: "ok", "dead" or "unknown"; null if never checked
+    link_status = Column(String, nullable=True)
     resource_type = Column(Enum(ResourceType), nullable=False)
     status = Column(Enum(ResourceStatus), default=ResourceStatus.PENDING)
+    # When the learner set the status, by the client's clock for synced updates; last writer wins
+    status_changed_at = Column(DateTime(timezone=True), nullable=True)
     order = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
-    module = relationship("CurriculumModule", back_populates="resources") 
\ No newline at end of file
+    module = relationship("CurriculumModule", back_populates="resources")
+    
+    __table_args__ = (
+        Index("ix_learning_resources_module_id_order", "module_id", "order"),
+        # Ownership checks, per-status counts and recent progress for one user
+        Index("ix_learning_resources_user_id_status", "user_id", "status"),
+    ) 
\ No newline at end of file
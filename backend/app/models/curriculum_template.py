@@ -0,0 +1,21 @@
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# A pre-generated curriculum for a popular topic, served (adapted to the learner) instead of a fresh generation
+class CurriculumTemplate(Base):
+    __tablename__ = "curriculum_templates"
+    
+    id = Column(Integer, primary_key=True)
+    # Normalized title; building the library again replaces the template for a topic
+    topic = Column(String, nullable=False, unique=True)
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    # {"modules": [{"title", "description", "resources": [{"title", "description", "url", "type", "link_status"}]}]}
+    structure = Column(JSON, nullable=False)
+    # Embedding of the title and description, and the model that made it; only the current model's are searched
+    embedding = Column(JSON, nullable=False)
+    embedding_model = Column(String, nullable=False)
+    times_used = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# An FCM registration token for one of a user's devices
+class DeviceToken(Base):
+    __tablename__ = "device_tokens"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    # A token belongs to one install; registering it again moves it to the new user
+    token = Column(String, nullable=False, unique=True)
+    platform = Column(String, nullable=True)  # ios, android or web
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
\ No newline at end of file
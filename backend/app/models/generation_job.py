@@ -0,0 +1,35 @@
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+class GenerationJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+# A curriculum generation request, run by the generation workers
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    status = Column(Enum(GenerationJobStatus), nullable=False, default=GenerationJobStatus.QUEUED)
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    # Set once the job succeeds
+    curriculum_id = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    # Runs started, including ones whose worker died; requeues after an LLM overload do not count
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Queued jobs are not claimed before this (set when backing off from an overloaded LLM)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_generation_jobs_status_run_after", "status", "run_after"),
+        Index("ix_generation_jobs_user_id_status", "user_id", "status"),
+    )
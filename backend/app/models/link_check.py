@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# Last check of a resource URL, shared by every worker until it expires
+class LinkCheck(Base):
+    __tablename__ = "link_checks"
+    
+    url = Column(String, primary_key=True)
+    status = Column(String, nullable=False)  # "ok", "dead" or "unknown" (timed out or the server erred)
+    http_status = Column(Integer, nullable=True)
+    # Where redirects ended up
+    final_url = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    content_type = Column(String, nullable=True)
+    checked_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
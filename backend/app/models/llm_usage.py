@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, Date, DateTime, Integer, String
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# LLM tokens a user's calls used on a (UTC) day, by kind of call; written in batches by the token quota store
+class LLMTokenUsage(Base):
+    __tablename__ = "llm_token_usage"
+    
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    kind = Column(String, primary_key=True)
+    tokens = Column(BigInteger, nullable=False, default=0)
+    calls = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,40 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Enum, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+class OutboxChannel(str, enum.Enum):
+    EMAIL = "email"
+    PUSH = "push"
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+# A notification waiting for (or done with) delivery by the outbox workers
+class OutboxMessage(Base):
+    __tablename__ = "notification_outbox"
+    
+    id = Column(BigInteger, primary_key=True)
+    channel = Column(Enum(OutboxChannel), nullable=False)
+    # Names the notification, e.g. "weekly_digest:42:2026-W42"; enqueueing the same one again is a no-op
+    idempotency_key = Column(String, nullable=False, unique=True)
+    user_id = Column(Integer, nullable=True)
+    # Email: to, subject, body, substitutions. Push: token, title, body, data
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    # Deliveries started, including ones whose worker died
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Pending messages are not claimed before this (pushed back after a failed attempt)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # When a worker claimed it; a SENDING message claimed long ago is handed to another worker
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_notification_outbox_status_available_at", "status", "available_at"),
+    )
\ No newline at end of file
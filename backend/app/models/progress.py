@@ -0,0 +1,34 @@
+from sqlalchemy import BigInteger, Column, Date, DateTime, Enum, Index, Integer
+from sqlalchemy.sql import func
+from app.core.database import Base
+from app.models.curriculum import ResourceStatus
+
+# One resource status change; rows are only ever appended
+class ProgressEvent(Base):
+    __tablename__ = "progress_events"
+    
+    id = Column(BigInteger, primary_key=True)
+    # No foreign keys: history outlives the curriculums and resources it mentions
+    user_id = Column(Integer, nullable=False)
+    curriculum_id = Column(Integer, nullable=False)
+    resource_id = Column(Integer, nullable=False)
+    previous_status = Column(Enum(ResourceStatus), nullable=True)
+    status = Column(Enum(ResourceStatus), nullable=False)
+    # When the change happened (the client's clock for synced updates)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_progress_events_user_id_occurred_at", "user_id", "occurred_at"),
+    )
+
+# Per-user, per-UTC-day counts of status changes, updated in the same transaction as the events
+class DailyProgress(Base):
+    __tablename__ = "progress_daily"
+    
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    started = Column(Integer, nullable=False, default=0, server_default="0")
+    skipped = Column(Integer, nullable=False, default=0, server_default="0")
+    events = Column(Integer, nullable=False, default=0, server_default="0")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ARRAY
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text, ARRAY
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -8,6 +8,9 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     password_hash = Column(String, nullable=False)
+    # Picks the daily LLM token budget from LLM_DAILY_TOKEN_QUOTAS
+    tier = Column(String, nullable=False, default="free", server_default="free")
+    llm_daily_token_quota = Column(BigInteger, nullable=True)  # overrides the tier's budget
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -15,7 +18,7 @@ class UserProfile(Base):
     __tablename__ = "user_profiles"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, unique=True, index=True, nullable=False)
     learning_style = Column(String, nullable=True)  # visual, auditory, kinesthetic
     pace = Column(String, nullable=True)  # slow, moderate, fast
     interests = Column(ARRAY(String), nullable=True)
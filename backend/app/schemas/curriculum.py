@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from app.models.curriculum import ResourceType, ResourceStatus
+from app.models.generation_job import GenerationJobStatus
 
 class CurriculumBase(BaseModel):
     title: str
@@ -15,6 +16,7 @@ class CurriculumResponse(CurriculumBase):
     user_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 1
     
     class Config:
         from_attributes = True
@@ -53,6 +55,8 @@ class ResourceResponse(ResourceBase):
     id: int
     module_id: int
     status: ResourceStatus
+    link_status: Optional[str] = None  # "ok", "dead" or "unknown" when the link was checked at generation
+    status_changed_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -70,4 +74,76 @@ class CurriculumComplete(CurriculumResponse):
 
 class ProgressUpdate(BaseModel):
     resource_id: int
-    status: ResourceStatus 
\ No newline at end of file
+    status: ResourceStatus
+
+class ProgressSyncItem(BaseModel):
+    resource_id: int
+    status: ResourceStatus
+    # When the change was made on the device; naive timestamps are taken as UTC
+    client_timestamp: datetime
+
+class ProgressBatchUpdate(BaseModel):
+    updates: List[ProgressSyncItem] = Field(..., min_length=1, max_length=500)
+
+class ProgressSyncResult(BaseModel):
+    resource_id: int
+    result: str  # "applied", "stale", "superseded" or "not_found"
+    status: Optional[ResourceStatus] = None
+    status_changed_at: Optional[datetime] = None
+
+class ProgressBatchResponse(BaseModel):
+    applied: int
+    results: List[ProgressSyncResult]
+
+class GenerationJobResponse(BaseModel):
+    id: int
+    status: GenerationJobStatus
+    title: str
+    description: Optional[str] = None
+    # Set once the job has succeeded
+    curriculum_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Structures the LLM is asked to return when generating a curriculum. Each is
+# also the schema of the tool the model is made to call where the provider
+# supports function calling.
+
+class GeneratedResource(BaseModel):
+    """A learning resource chosen for a curriculum module"""
+    title: str = Field(..., min_length=1)
+    description: str = ""
+    url: str = Field(..., pattern=r"^https?://\S+$")
+    type: ResourceType
+    
+    @field_validator("type", mode="before")
+    @classmethod
+    def normalize_type(cls, value):
+        # Models write "Video" or "Article " as often as "video"
+        return value.strip().lower() if isinstance(value, str) else value
+
+class ModuleOutline(BaseModel):
+    """A curriculum module and its learning objectives"""
+    title: str = Field(..., min_length=1)
+    description: str = ""
+
+class CurriculumOutline(BaseModel):
+    """The modules of a curriculum, in learning order"""
+    modules: List[ModuleOutline] = Field(..., min_length=1)
+
+class ModuleResources(BaseModel):
+    """The learning resources for one curriculum module"""
+    resources: List[GeneratedResource] = Field(..., min_length=1)
+
+class GeneratedModule(ModuleOutline):
+    """A curriculum module with its learning resources"""
+    resources: List[GeneratedResource] = []
+
+class GeneratedCurriculum(BaseModel):
+    """A whole curriculum: its modules in learning order, each with its resources"""
+    modules: List[GeneratedModule] = Field(..., min_length=1)
\ No newline at end of file
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List
+from datetime import date, datetime
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -40,6 +40,34 @@ class UserProfileResponse(UserProfileBase):
     class Config:
         from_attributes = True
 
+class DeviceTokenCreate(BaseModel):
+    token: str = Field(..., min_length=1, max_length=4096)
+    platform: Optional[str] = None  # ios, android or web
+
+class DeviceTokenResponse(BaseModel):
+    id: int
+    token: str
+    platform: Optional[str] = None
+    created_at: datetime
+    last_seen_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class TokenUsageDay(BaseModel):
+    day: date
+    tokens: int
+    calls: int
+    by_kind: Dict[str, int]  # tokens by kind of LLM call, e.g. chat or generate_module
+
+class TokenUsageResponse(BaseModel):
+    tier: str
+    daily_limit: Optional[int] = None  # None when the tier is unlimited
+    used_today: int
+    remaining_today: Optional[int] = None
+    resets_at: datetime
+    days: List[TokenUsageDay]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -1,56 +1,116 @@
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_community.vectorstores import Weaviate
-from langchain_core.documents import Document
-from langchain_mcp_adapters import MCPAdapter
 from app.core.config import settings
 from app.services.curriculum_service import CurriculumService
-from app.services.vector_service import VectorService
-from app.schemas.curriculum import CurriculumCreate
+from app.services.conversation_memory import conversation_memory
+from app.services.profile_cache import profile_cache
+from app.services.token_quota import token_quota
+from app.services.curriculum_library import (
+    adapt_modules, curriculum_generation_seconds, curriculum_library, curriculum_library_lookups_total
+)
+from app.services.llm_provider import get_chat_model, get_llm_router
+from app.services.llm_scheduler import llm_scheduler, Priority, LLMOverloadedError
+from app.core.tokens import count_tokens, usage_from_response
+from app.core.metrics import (
+    llm_calls_total, llm_tokens_total, llm_call_duration_seconds,
+    llm_structured_outputs_total, llm_retries_total, llm_wasted_tokens_total
+)
+from app.core.structured_output import (
+    StructuredOutputError, parse_payload, response_payload, validate_items, validation_errors
+)
+from app.schemas.curriculum import (
+    CurriculumCreate, CurriculumOutline, GeneratedCurriculum, GeneratedResource, ModuleOutline, ModuleResources
+)
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Dict, Any, Callable, List, Tuple
+import asyncio
 import json
-import weaviate
+import logging
+import time
+from functools import cached_property
+
+logger = logging.getLogger(__name__)
 
 class AgentService:
     def __init__(self):
-        # Initialize AI provider based on configuration
-        if settings.AI_PROVIDER.lower() == "gemini":
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-pro",
-                temperature=0.7,
-                google_api_key=settings.GEMINI_API_KEY
-            )
-        else:
-            # Default to OpenAI
-            self.llm = ChatOpenAI(
-                model="gpt-4",
-                temperature=0.7,
-                api_key=settings.OPENAI_API_KEY
-            )
-        
-        self.search_tool = DuckDuckGoSearchRun()
-        self.vector_service = VectorService()
-        self.mcp_adapter = MCPAdapter()
-        
-        # Initialize tools
-        self.tools = [
+        # Shared chat model for the configured AI provider and the multi-provider router
+        self.llm = get_chat_model()
+        self.llm_router = get_llm_router()
+    
+    # Search, vector and MCP clients are heavy to import and connect to external
+    # services, so they are built on first use rather than at startup
+    @cached_property
+    def search_tool(self):
+        from langchain_community.tools import DuckDuckGoSearchRun
+        return DuckDuckGoSearchRun()
+    
+    @cached_property
+    def vector_service(self):
+        from app.services.vector_service import VectorService
+        return VectorService()
+    
+    @cached_property
+    def mcp_adapter(self):
+        from langchain_mcp_adapters import MCPAdapter
+        return MCPAdapter()
+    
+    @cached_property
+    def tools(self) -> List[Any]:
+        return [
             self.search_tool,
             self.vector_service.search_tool,
             self.mcp_adapter.get_tool("send_email"),
             self.mcp_adapter.get_tool("send_push_notification")
         ]
     
-    async def generate_curriculum(self, user_id: int, curriculum_data: CurriculumCreate, db: Session) -> Dict[str, Any]:
+    async def generate_curriculum(
+        self,
+        user_id: int,
+        curriculum_data: CurriculumCreate,
+        db: Session,
+        mode: str = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> Dict[str, Any]:
         """Generate a personalized curriculum using AI agent"""
         
         # Get user profile
-        from app.models.user import UserProfile
-        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        profile = profile_cache.get(user_id, db)
         
+        # Prepare context
+        context = {
+            "learning_style": profile.learning_style if profile else "visual",
+            "pace": profile.pace if profile else "moderate",
+            "interests": profile.interests if profile else [],
+            "goals": profile.goals if profile else [],
+            "title": curriculum_data.title,
+            "description": curriculum_data.description
+        }
+        # Return the connection to the pool rather than hold it idle in a transaction through the LLM call
+        db.rollback()
+        started = time.perf_counter()
+        
+        if settings.CURRICULUM_LIBRARY_ENABLED:
+            curriculum = await self._generate_from_library(user_id, curriculum_data, context, db, priority)
+            if curriculum is not None:
+                curriculum_generation_seconds.observe(time.perf_counter() - started, source="library")
+                return curriculum
+        
+        if (mode or settings.CURRICULUM_GENERATION_MODE) == "outline":
+            curriculum = await self._generate_outlined_curriculum(user_id, curriculum_data, context, db, priority)
+        else:
+            curriculum = await self._generate_whole_curriculum(user_id, curriculum_data, context, db, priority)
+        curriculum_generation_seconds.observe(time.perf_counter() - started, source="llm")
+        return curriculum
+    
+    async def _generate_whole_curriculum(
+        self,
+        user_id: int,
+        curriculum_data: CurriculumCreate,
+        context: Dict[str, Any],
+        db: Session,
+        priority: Priority = Priority.INTERACTIVE
+    ):
+        """Generate every module and its resources in one call, re-asking only for modules that came back short"""
         # Create curriculum generation prompt
         prompt = ChatPromptTemplate.from_template("""
         You are an AI curriculum architect. Generate a personalized learning curriculum based on the user's profile and goals.
@@ -71,48 +131,408 @@ class AgentService:
         3. Resources should be diverse and high-quality
         4. Consider the user's learning style and pace
         
-        Return the curriculum as a JSON structure with modules and resources.
+        Return the curriculum as a JSON structure with modules, each with a title, a description and its resources.
+        Each resource has a title, description, url and type (video, article, interactive, quiz or simulation).
         """)
         
-        # Prepare context
+        # Generate curriculum structure
+        modules = await self._invoke_structured(
+            prompt, context, GeneratedCurriculum, kind="generate", completion_tokens=3000, parse=self._parse_modules,
+            user_id=user_id, priority=priority
+        )
+        outline = self._outline_text([module for module, _, _ in modules])
+        
+        async def complete(i: int, module: ModuleOutline, resources: List[Dict[str, Any]], tokens: int):
+            if len(resources) < settings.CURRICULUM_MIN_RESOURCES_PER_MODULE:
+                # Ask again for just this module's resources rather than the whole curriculum
+                llm_wasted_tokens_total.inc(tokens, kind="generate")
+                resources = await self._generate_module_resources(
+                    context, outline, i, len(modules), module, user_id, priority
+                )
+            return await self._validate_links(resources)
+        
+        resources = await asyncio.gather(*(complete(i, *module) for i, module in enumerate(modules)))
+        
+        # Create curriculum in database
+        curriculum_service = CurriculumService(db)
+        curriculum = curriculum_service.create_curriculum(user_id, curriculum_data)
+        curriculum_id = curriculum.id
+        
+        # Create modules with their resources
+        try:
+            for i, (module, _, _) in enumerate(modules):
+                curriculum_service.create_module_with_resources(
+                    curriculum_id=curriculum_id,
+                    user_id=user_id,
+                    title=module.title,
+                    description=module.description,
+                    order=i,
+                    resources=resources[i]
+                )
+        except BaseException:
+            self._discard_curriculum(db, curriculum_id, user_id)
+            raise
+        
+        return curriculum
+    
+    async def _generate_outlined_curriculum(
+        self,
+        user_id: int,
+        curriculum_data: CurriculumCreate,
+        context: Dict[str, Any],
+        db: Session,
+        priority: Priority = Priority.INTERACTIVE
+    ):
+        """Outline the modules in one short call, then expand them concurrently, saving each as it arrives"""
+        modules = await self._outline_modules(context, user_id, priority)
+        
+        curriculum_service = CurriculumService(db)
+        curriculum = curriculum_service.create_curriculum(user_id, curriculum_data)
+        curriculum_id = curriculum.id
+        outline = self._outline_text(modules)
+        semaphore = asyncio.Semaphore(settings.CURRICULUM_EXPANSION_CONCURRENCY)
+        
+        async def expand(i: int, module: ModuleOutline):
+            async with semaphore:
+                resources = await self._generate_module_resources(
+                    context, outline, i, len(modules), module, user_id, priority
+                )
+            resources = await self._validate_links(resources)
+            # Synchronous, so concurrent expansions never interleave on the shared session
+            curriculum_service.create_module_with_resources(
+                curriculum_id=curriculum_id,
+                user_id=user_id,
+                title=module.title,
+                description=module.description,
+                order=i,
+                resources=resources
+            )
+        
+        tasks = [asyncio.ensure_future(expand(i, module)) for i, module in enumerate(modules)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            self._discard_curriculum(db, curriculum_id, user_id)
+            raise
+        
+        return curriculum
+    
+    @staticmethod
+    def _discard_curriculum(db: Session, curriculum_id: int, user_id: int):
+        """Soft-delete a half-built curriculum after a failure; the purge sweep removes its rows"""
+        try:
+            # A failed flush leaves the session unusable until it is rolled back
+            db.rollback()
+            CurriculumService(db).delete_curriculum(curriculum_id, user_id)
+        except Exception as e:
+            # Never hide the failure that got us here
+            db.rollback()
+            logger.error(f"Failed to discard curriculum {curriculum_id}: {e}")
+    
+    async def _outline_modules(
+        self,
+        context: Dict[str, Any],
+        user_id: int = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> List[ModuleOutline]:
+        """Plan the modules of a curriculum in one short call"""
+        outline_prompt = ChatPromptTemplate.from_template("""
+        You are an AI curriculum architect. Outline a personalized learning curriculum based on the user's profile and goals.
+        
+        User Profile:
+        - Learning Style: {learning_style}
+        - Pace: {pace}
+        - Interests: {interests}
+        - Goals: {goals}
+        
+        Curriculum Request:
+        - Title: {title}
+        - Description: {description}
+        
+        Plan 3-5 modules that build on each other, suited to the user's learning style and pace.
+        Do not choose resources yet.
+        
+        Return the curriculum outline as a JSON structure with modules, each with a title and a description of its learning objectives.
+        """)
+        return await self._invoke_structured(
+            outline_prompt, context, CurriculumOutline, kind="generate_outline", completion_tokens=400,
+            parse=self._parse_outline, user_id=user_id, priority=priority
+        )
+    
+    async def generate_template(self, title: str, description: str = None) -> List[Dict[str, Any]]:
+        """Generate a curriculum library template: modules with their resources, for no learner in particular and not saved"""
         context = {
-            "learning_style": profile.learning_style if profile else "visual",
-            "pace": profile.pace if profile else "moderate",
-            "interests": profile.interests if profile else [],
-            "goals": profile.goals if profile else [],
-            "title": curriculum_data.title,
-            "description": curriculum_data.description
+            "learning_style": "any",
+            "pace": "any",
+            "interests": [],
+            "goals": [],
+            "title": title,
+            "description": description
         }
+        modules = await self._outline_modules(context, priority=Priority.BACKGROUND)
+        outline = self._outline_text(modules)
         
-        # Generate curriculum structure
-        chain = prompt | self.llm | JsonOutputParser()
-        curriculum_structure = await chain.ainvoke(context)
+        async def expand(i: int, module: ModuleOutline) -> Dict[str, Any]:
+            resources = await self._generate_module_resources(
+                context, outline, i, len(modules), module, priority=Priority.BACKGROUND
+            )
+            resources = await self._validate_links(resources)
+            return {"title": module.title, "description": module.description, "resources": resources}
+        
+        return list(await asyncio.gather(*(expand(i, module) for i, module in enumerate(modules))))
+    
+    async def _generate_from_library(
+        self,
+        user_id: int,
+        curriculum_data: CurriculumCreate,
+        context: Dict[str, Any],
+        db: Session,
+        priority: Priority = Priority.INTERACTIVE
+    ):
+        """Save the closest library curriculum, adapted to the learner, if one is close enough to the request; else None"""
+        try:
+            # One short embeddings request; it is not charged to the token quota or scheduled like chat calls
+            match = await curriculum_library.find(
+                self.vector_service.embeddings, curriculum_data.title, curriculum_data.description
+            )
+        except Exception as e:
+            # The library only saves time; a failed search falls through to generating
+            curriculum_library_lookups_total.inc(result="error")
+            logger.warning(f"Curriculum library search failed, generating instead: {e}")
+            return None
+        if match is None:
+            return None
+        
+        modules = adapt_modules(match.modules, context["learning_style"], context["pace"])
+        if settings.CURRICULUM_LIBRARY_ADAPTATION == "llm":
+            modules = await self._adapt_template(context, modules, user_id, priority)
+        # Links were checked when the template was built and may have died since; recent checks come from link_checks
+        resources = await asyncio.gather(*(self._validate_links(module["resources"]) for module in modules))
         
-        # Create curriculum in database
         curriculum_service = CurriculumService(db)
         curriculum = curriculum_service.create_curriculum(user_id, curriculum_data)
+        curriculum_id = curriculum.id
+        try:
+            for i, module in enumerate(modules):
+                curriculum_service.create_module_with_resources(
+                    curriculum_id=curriculum_id,
+                    user_id=user_id,
+                    title=module["title"],
+                    description=module["description"],
+                    order=i,
+                    resources=resources[i]
+                )
+        except BaseException:
+            self._discard_curriculum(db, curriculum_id, user_id)
+            raise
+        return curriculum
+    
+    async def _adapt_template(
+        self,
+        context: Dict[str, Any],
+        modules: List[Dict[str, Any]],
+        user_id: int = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> List[Dict[str, Any]]:
+        """Rewrite a library curriculum's module titles and objectives for the learner in one short call"""
+        adapt_prompt = ChatPromptTemplate.from_template("""
+        You are an AI curriculum architect. Adapt an existing curriculum outline to the user's profile and goals.
         
-        # Create modules and resources
-        for i, module_data in enumerate(curriculum_structure.get("modules", [])):
-            module = curriculum_service.create_module(
-                curriculum_id=curriculum.id,
-                title=module_data["title"],
-                description=module_data.get("description", ""),
-                order=i
+        User Profile:
+        - Learning Style: {learning_style}
+        - Pace: {pace}
+        - Interests: {interests}
+        - Goals: {goals}
+        
+        Curriculum Request:
+        - Title: {title}
+        - Description: {description}
+        
+        Existing Curriculum Outline:
+        {outline}
+        
+        Keep the same {module_count} modules in the same order, covering the same material.
+        Rewrite each module's title and learning objectives to suit the user's learning style, pace, interests and goals.
+        
+        Return the curriculum outline as a JSON structure with modules, each with a title and a description of its learning objectives.
+        """)
+        inputs = {
+            **context,
+            "outline": self._outline_text([ModuleOutline.model_validate(module) for module in modules]),
+            "module_count": len(modules)
+        }
+        try:
+            outlines = await self._invoke_structured(
+                adapt_prompt, inputs, CurriculumOutline, kind="adapt_template", completion_tokens=400,
+                parse=self._parse_outline, minimum=len(modules), user_id=user_id, priority=priority
+            )
+        except StructuredOutputError as e:
+            logger.info(f"Keeping the library curriculum's own modules: {e}")
+            return modules
+        if len(outlines) != len(modules):
+            # The resources belong to the template's modules; don't guess which rewrite goes with which
+            return modules
+        return [
+            {**module, "title": outline.title, "description": outline.description}
+            for module, outline in zip(modules, outlines)
+        ]
+    
+    async def _generate_module_resources(
+        self,
+        context: Dict[str, Any],
+        outline: str,
+        i: int,
+        module_count: int,
+        module: ModuleOutline,
+        user_id: int = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> List[Dict[str, Any]]:
+        """Choose the resources for module i (from 0) of an outlined curriculum"""
+        module_prompt = ChatPromptTemplate.from_template("""
+        You are an AI curriculum architect. Choose the learning resources for one module of a personalized curriculum.
+        
+        User Profile:
+        - Learning Style: {learning_style}
+        - Pace: {pace}
+        - Interests: {interests}
+        - Goals: {goals}
+        
+        Curriculum Request:
+        - Title: {title}
+        - Description: {description}
+        
+        Curriculum Outline:
+        {outline}
+        
+        This is module {position} of {module_count}: {module_title}
+        Learning objectives: {module_description}
+        
+        Choose 5-8 diverse, high-quality learning resources for this module only (mix of videos, articles, interactive content).
+        
+        Return a JSON structure with the module's resources, each with a title, description, url and type
+        (video, article, interactive, quiz or simulation).
+        """)
+        inputs = {
+            **context,
+            "outline": outline,
+            "position": i + 1,
+            "module_count": module_count,
+            "module_title": module.title,
+            "module_description": module.description
+        }
+        return await self._invoke_structured(
+            module_prompt, inputs, ModuleResources, kind="generate_module", completion_tokens=800,
+            parse=self._parse_resources, minimum=settings.CURRICULUM_MIN_RESOURCES_PER_MODULE, user_id=user_id,
+            priority=priority
+        )
+    
+    @staticmethod
+    def _outline_text(modules: List[ModuleOutline]) -> str:
+        return "\n".join(f"{i + 1}. {module.title}: {module.description}" for i, module in enumerate(modules))
+    
+    @staticmethod
+    def _parse_outline(data: Any) -> Tuple[List[ModuleOutline], List[str]]:
+        items = data.get("modules") if isinstance(data, dict) else data
+        return validate_items(items, ModuleOutline, "module")
+    
+    @staticmethod
+    def _parse_resources(data: Any) -> Tuple[List[Dict[str, Any]], List[str]]:
+        items = data.get("resources") if isinstance(data, dict) else data
+        resources, problems = validate_items(items, GeneratedResource, "resource")
+        return [resource.model_dump(mode="json") for resource in resources], problems
+    
+    @classmethod
+    def _parse_modules(cls, data: Any) -> Tuple[List[Tuple[ModuleOutline, List[Dict[str, Any]], int]], List[str]]:
+        """(module, valid resources, tokens the module took) for each module of a whole curriculum"""
+        items = data.get("modules") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return [], ["expected a list of modules"]
+        modules, problems = [], []
+        for i, item in enumerate(items):
+            try:
+                module = ModuleOutline.model_validate(item)
+            except ValidationError as e:
+                problems.extend(f"module {i + 1} {problem}" for problem in validation_errors(e, limit=2))
+                continue
+            resources, resource_problems = cls._parse_resources(item.get("resources"))
+            problems.extend(f"module {i + 1} {problem}" for problem in resource_problems)
+            modules.append((module, resources, count_tokens(json.dumps(item))))
+        return modules, problems
+    
+    async def _invoke_structured(
+        self,
+        prompt: ChatPromptTemplate,
+        inputs: Dict[str, Any],
+        schema: type,
+        kind: str,
+        completion_tokens: int,
+        parse: Callable[[Any], Tuple[List[Any], List[str]]],
+        minimum: int = 1,
+        user_id: int = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> List[Any]:
+        """Ask for a structure and parse its items, re-asking only when too few of them are valid.
+        
+        The provider is made to answer with schema where it can. Replies that
+        are cut off or slightly malformed are repaired locally; parse keeps the
+        valid items and describes the invalid ones, and those problems go back
+        to the model when it is asked again. The last attempt settles for any
+        valid item at all.
+        """
+        retry_prompt = prompt + ChatPromptTemplate.from_template("""
+        Your previous answer could not be used:
+        {problems}
+        
+        Answer again with the complete JSON structure described above, and nothing else.
+        """)
+        max_attempts = settings.LLM_STRUCTURED_MAX_RETRIES + 1
+        problems: List[str] = []
+        for attempt in range(max_attempts):
+            if attempt:
+                llm_retries_total.inc(kind=kind)
+            response = await self._invoke_llm(
+                retry_prompt if attempt else prompt,
+                {**inputs, "problems": "\n".join(f"- {problem}" for problem in problems[:10])} if attempt else inputs,
+                kind=kind,
+                priority=priority,
+                completion_tokens=completion_tokens,
+                schema=schema,
+                user_id=user_id
             )
+            try:
+                data, repaired = parse_payload(response_payload(response))
+                items, problems = parse(data)
+            except StructuredOutputError as e:
+                items, problems, repaired = [], [str(e)], False
             
-            # Create resources for this module
-            for j, resource_data in enumerate(module_data.get("resources", [])):
-                curriculum_service.create_resource(
-                    module_id=module.id,
-                    title=resource_data["title"],
-                    url=resource_data["url"],
-                    resource_type=resource_data["type"],
-                    description=resource_data.get("description", ""),
-                    order=j
-                )
+            if len(items) >= (minimum if attempt < max_attempts - 1 else 1):
+                outcome = "partial" if problems else "repaired" if repaired else "valid"
+                llm_structured_outputs_total.inc(kind=kind, outcome=outcome)
+                return items
+            llm_structured_outputs_total.inc(kind=kind, outcome="invalid")
+            llm_wasted_tokens_total.inc(usage_from_response(response) or count_tokens(str(response_payload(response))), kind=kind)
+            logger.info(f"Unusable {kind} reply on attempt {attempt + 1}: {'; '.join(problems[:3])}")
+        raise StructuredOutputError(f"No usable {kind} reply after {max_attempts} attempts: {'; '.join(problems[:3])}")
+    
+    async def _validate_links(self, resources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Check generated resource URLs, swapping dead ones for live matches from the vector store"""
+        if not settings.LINK_VALIDATION_ENABLED or not resources:
+            return resources
+        from app.services.link_validator import link_validator
         
-        return curriculum
+        try:
+            vector_service = self.vector_service
+        except Exception as e:
+            logger.warning(f"Vector store unavailable, dead links will not be replaced: {e}")
+            vector_service = None
+        try:
+            return await link_validator.validate_resources(resources, vector_service)
+        except Exception as e:
+            # Unchecked links are better than no curriculum
+            logger.warning(f"Link validation failed, keeping generated links: {e}")
+            return resources
     
     async def chat(self, user_id: int, message: str, curriculum_id: int = None, db: Session = None) -> str:
         """Chat with the AI agent"""
@@ -121,6 +541,15 @@ class AgentService:
         prompt = ChatPromptTemplate.from_template("""
         You are an AI learning companion. Help the user with their learning journey.
         
+        Learner Context:
+        {learner_context}
+        
+        Summary of Earlier Conversation:
+        {summary}
+        
+        Recent Conversation:
+        {history}
+        
         User Message: {message}
         
         If the user is asking about their curriculum or progress, provide helpful guidance.
@@ -130,23 +559,142 @@ class AgentService:
         Be encouraging, helpful, and personalized in your response.
         """)
         
-        # Get user context if database is available
-        context = {"message": message}
+        # Build a bounded prompt from server-side memory instead of client-sent history
+        context = {"message": message, "learner_context": "(not available)"}
         if db:
-            from app.models.user import UserProfile
-            profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-            if profile:
-                context["learning_style"] = profile.learning_style
-                context["pace"] = profile.pace
-                context["interests"] = profile.interests
-                context["goals"] = profile.goals
+            context["learner_context"] = conversation_memory.get_context_block(
+                user_id,
+                curriculum_id,
+                lambda: self._build_learner_context(user_id, curriculum_id, db)
+            )
+        context.update(conversation_memory.prompt_inputs(user_id, curriculum_id))
         
         # Generate response
-        chain = prompt | self.llm
-        response = await chain.ainvoke(context)
+        response = await self._invoke_llm(prompt, context, user_id=user_id)
+        
+        conversation_memory.add_turn(
+            user_id,
+            curriculum_id,
+            message,
+            response.content,
+            summarizer=self._summarize_conversation
+        )
+        
+        return response.content
+    
+    def _build_learner_context(self, user_id: int, curriculum_id: int, db: Session) -> str:
+        """Build the profile/curriculum context block for chat prompts"""
+        from app.models.curriculum import Curriculum, CurriculumModule
         
+        lines = []
+        profile = profile_cache.get(user_id, db)
+        if profile:
+            lines.append(f"- Learning Style: {profile.learning_style or 'unknown'}")
+            lines.append(f"- Pace: {profile.pace or 'unknown'}")
+            lines.append(f"- Interests: {', '.join(profile.interests or [])}")
+            lines.append(f"- Goals: {', '.join(profile.goals or [])}")
+        
+        if curriculum_id:
+            curriculum = db.query(Curriculum).filter(
+                Curriculum.id == curriculum_id,
+                Curriculum.user_id == user_id,
+                Curriculum.deleted_at.is_(None)
+            ).first()
+            if curriculum:
+                lines.append(f"- Curriculum: {curriculum.title}")
+                if curriculum.description:
+                    lines.append(f"- Curriculum Description: {curriculum.description}")
+                module_titles = [
+                    title for (title,) in db.query(CurriculumModule.title).filter(
+                        CurriculumModule.curriculum_id == curriculum.id
+                    ).order_by(CurriculumModule.order).all()
+                ]
+                if module_titles:
+                    lines.append(f"- Modules: {'; '.join(module_titles)}")
+        
+        return "\n".join(lines) or "(no profile information)"
+    
+    async def _summarize_conversation(self, summary: str, transcript: str) -> str:
+        """Fold older conversation turns into the rolling summary"""
+        prompt = ChatPromptTemplate.from_template("""
+        Update the running summary of a conversation between a learner and their AI learning companion.
+        Keep facts about the learner's goals, difficulties and decisions. Be concise.
+        
+        Current Summary:
+        {summary}
+        
+        New Conversation Turns:
+        {transcript}
+        
+        Return only the updated summary.
+        """)
+        
+        response = await self._invoke_llm(
+            prompt,
+            {"summary": summary or "(empty)", "transcript": transcript},
+            kind="summary",
+            priority=Priority.BACKGROUND
+        )
         return response.content
     
+    async def _invoke_llm(
+        self,
+        prompt: ChatPromptTemplate,
+        inputs: Dict[str, Any],
+        kind: str = "chat",
+        priority: Priority = Priority.INTERACTIVE,
+        completion_tokens: int = None,
+        schema: type = None,
+        user_id: int = None
+    ):
+        """Render a prompt and send it to the LLM via the router, scheduler and batching dispatcher"""
+        prompt_value = await prompt.ainvoke(inputs)
+        estimated_tokens = count_tokens(prompt_value.to_string()) + (
+            completion_tokens or settings.LLM_COMPLETION_TOKEN_ESTIMATE
+        )
+        reservation = None
+        if user_id is not None:
+            # Refused before it takes any of the shared provider throughput; concurrent calls each reserve their share
+            reservation = await token_quota.areserve(user_id, estimated_tokens)
+        
+        def dispatch(provider, call):
+            return llm_scheduler.submit(
+                call,
+                priority=priority,
+                estimated_tokens=estimated_tokens,
+                provider=provider
+            )
+        
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            # Hedging doubles cost, so only spend it on calls a user is waiting for
+            response = await self.llm_router.ainvoke(
+                prompt_value,
+                kind=kind,
+                hedge=settings.LLM_HEDGING_ENABLED and priority == Priority.INTERACTIVE,
+                dispatch=dispatch,
+                schema=schema if settings.LLM_STRUCTURED_OUTPUT_ENABLED else None
+            )
+            outcome = "success"
+        except BaseException as e:
+            if isinstance(e, LLMOverloadedError):
+                outcome = "overloaded"
+            if reservation is not None:
+                token_quota.release_soon(reservation)
+            raise
+        finally:
+            llm_calls_total.inc(kind=kind, outcome=outcome)
+            llm_call_duration_seconds.observe(time.perf_counter() - started, kind=kind)
+        
+        tokens = usage_from_response(response)
+        if tokens is None:
+            tokens = estimated_tokens
+        llm_tokens_total.inc(tokens, kind=kind)
+        if user_id is not None:
+            await token_quota.arecord(user_id, kind, tokens, reservation)
+        return response
+    
     async def search_resources(self, query: str) -> List[Dict[str, Any]]:
         """Search for learning resources using web search and vector search"""
         
@@ -177,60 +725,21 @@ class AgentService:
         
         return results
     
-    async def send_progress_email(self, user_id: int, user_email: str) -> bool:
-        """Send weekly progress digest email"""
-        try:
-            # Get progress summary
-            if db:
-                progress_service = ProgressService(db)
-                summary = progress_service.get_progress_summary(user_id)
-                
-                # Generate email content
-                email_content = f"""
-                Weekly Learning Progress Digest
-                
-                Hello! Here's your learning progress summary:
-                
-                - Total Resources: {summary['total_resources']}
-                - Completed: {summary['completed_resources']}
-                - In Progress: {summary['in_progress_resources']}
-                - Completion Rate: {summary['completion_percentage']}%
-                
-                Keep up the great work! Continue with your learning journey.
-                """
-                
-                # Send email using MCP adapter
-                await self.mcp_adapter.send_email(
-                    to_email=user_email,
-                    subject="Weekly Learning Progress",
-                    content=email_content
-                )
-                
-                return True
-        except Exception as e:
-            print(f"Failed to send progress email: {e}")
-            return False
-    
-    async def send_daily_notification(self, user_id: int) -> bool:
-        """Send daily learning prompt notification"""
-        try:
-            # Generate daily learning prompt
-            prompt = ChatPromptTemplate.from_template("""
-            Generate a daily learning prompt or vocabulary word that would be relevant for a learner.
-            Make it encouraging and educational. Keep it short and engaging.
-            """)
-            
-            chain = prompt | self.llm
-            response = await chain.ainvoke({})
-            
-            # Send push notification using MCP adapter
-            await self.mcp_adapter.send_push_notification(
-                user_id=user_id,
-                title="Daily Learning Prompt",
-                message=response.content
-            )
-            
-            return True
-        except Exception as e:
-            print(f"Failed to send daily notification: {e}")
-            return False 
\ No newline at end of file
+    async def generate_daily_prompt(self) -> str:
+        """Generate today's learning prompt; it is the same for every learner"""
+        prompt = ChatPromptTemplate.from_template("""
+        Generate a daily learning prompt or vocabulary word that would be relevant for a learner.
+        Make it encouraging and educational. Keep it short and engaging.
+        """)
+        
+        response = await self._invoke_llm(prompt, {}, kind="notification", priority=Priority.BACKGROUND)
+        return response.content
+
+_agent_service = None
+
+def get_agent_service() -> AgentService:
+    """Get the shared agent service, building it on first use"""
+    global _agent_service
+    if _agent_service is None:
+        _agent_service = AgentService()
+    return _agent_service
\ No newline at end of file
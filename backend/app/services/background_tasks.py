@@ -2,18 +2,31 @@ import asyncio
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
-from app.services.agent_service import AgentService
+from app.core.replicas import replica_router
 from app.models.user import User
+from app.services.curriculum_service import CurriculumService
+from app.models.outbox import OutboxChannel
+from app.services.email_service import DIGEST_SUBJECT, digest_renderer, weekly_digest_key
+from app.services.outbox import email_payload, enqueue_batch, outbox_dispatcher, push_payload
+from app.services.profile_cache import profile_cache
+from app.services.progress_service import ProgressService
+from app.services.push_service import DAILY_PROMPT_TITLE, DeviceTokenService, daily_prompt_key
 from app.core.config import settings
+from app.core.metrics import time_job
 import logging
 
 logger = logging.getLogger(__name__)
 
 class BackgroundTaskService:
     def __init__(self):
-        self.agent_service = AgentService()
         self.running = False
     
+    @property
+    def agent_service(self):
+        # Imported on first use so LangChain stays out of app startup
+        from app.services.agent_service import get_agent_service
+        return get_agent_service()
+    
     async def start_background_tasks(self):
         """Start background tasks for email and push notifications"""
         if not settings.ENABLE_BACKGROUND_TASKS:
@@ -25,6 +38,8 @@ class BackgroundTaskService:
         # Start tasks in separate coroutines
         asyncio.create_task(self._weekly_email_task())
         asyncio.create_task(self._daily_notification_task())
+        asyncio.create_task(self._curriculum_purge_task())
+        asyncio.create_task(self._outbox_purge_task())
         
         logger.info("Background tasks started")
     
@@ -40,7 +55,8 @@ class BackgroundTaskService:
                 # Check if it's time to send weekly emails (every Sunday at 9 AM)
                 now = datetime.now()
                 if now.weekday() == 6 and now.hour == 9:  # Sunday at 9 AM
-                    await self._send_weekly_emails()
+                    with time_job("weekly_emails"):
+                        await self._send_weekly_emails()
                 
                 # Wait for 1 hour before checking again
                 await asyncio.sleep(3600)
@@ -55,7 +71,8 @@ class BackgroundTaskService:
                 # Check if it's time to send daily notifications (every day at 8 AM)
                 now = datetime.now()
                 if now.hour == 8 and now.minute == 0:
-                    await self._send_daily_notifications()
+                    with time_job("daily_notifications"):
+                        await self._send_daily_notifications()
                 
                 # Wait for 1 minute before checking again
                 await asyncio.sleep(60)
@@ -63,56 +80,116 @@ class BackgroundTaskService:
                 logger.error(f"Error in daily notification task: {e}")
                 await asyncio.sleep(60)
     
-    async def _send_weekly_emails(self):
-        """Send weekly progress digest emails to all users"""
+    async def _curriculum_purge_task(self):
+        """Purge deleted curriculums whose purge did not finish (e.g. the worker restarted)"""
+        while self.running:
+            try:
+                with time_job("curriculum_purge_sweep"):
+                    await asyncio.to_thread(self.purge_deleted_curriculums)
+            except Exception as e:
+                logger.error(f"Error in curriculum purge task: {e}")
+            await asyncio.sleep(settings.CURRICULUM_PURGE_INTERVAL_SECONDS)
+    
+    def purge_curriculum(self, curriculum_id: int):
+        """Remove a deleted curriculum's rows and vector entries"""
         db = SessionLocal()
         try:
-            users = db.query(User).all()
-            
-            for user in users:
-                try:
-                    success = await self.agent_service.send_progress_email(
-                        user_id=user.id,
-                        user_email=user.email
-                    )
-                    
-                    if success:
-                        logger.info(f"Sent weekly email to {user.email}")
-                    else:
-                        logger.warning(f"Failed to send weekly email to {user.email}")
-                        
-                except Exception as e:
-                    logger.error(f"Error sending weekly email to {user.email}: {e}")
-                    
-        except Exception as e:
-            logger.error(f"Error in weekly email batch: {e}")
+            with time_job("curriculum_purge"):
+                rows = CurriculumService(db).purge_curriculum(curriculum_id, settings.CURRICULUM_PURGE_CHUNK_SIZE)
+            logger.info(f"Purged curriculum {curriculum_id} ({rows} rows)")
         finally:
             db.close()
+        
+        try:
+            self.agent_service.vector_service.delete_curriculum_resources(curriculum_id)
+        except Exception as e:
+            logger.warning(f"Failed to remove vector entries for curriculum {curriculum_id}: {e}")
     
-    async def _send_daily_notifications(self):
-        """Send daily learning prompt notifications to all users"""
+    def purge_deleted_curriculums(self):
+        """Purge every curriculum still marked deleted"""
         db = SessionLocal()
+        try:
+            curriculum_ids = CurriculumService(db).get_deleted_curriculum_ids()
+        finally:
+            db.close()
+        
+        for curriculum_id in curriculum_ids:
+            try:
+                self.purge_curriculum(curriculum_id)
+            except Exception as e:
+                logger.error(f"Error purging curriculum {curriculum_id}: {e}")
+    
+    async def _send_weekly_emails(self):
+        """Queue this week's progress digest for every user; the outbox workers send them"""
+        queued = await asyncio.to_thread(self.queue_weekly_digests)
+        logger.info(f"Weekly digest: {queued} queued")
+    
+    def queue_weekly_digests(self) -> int:
+        """Queue every user's weekly digest in the outbox, skipping any already queued this week"""
+        # Only reads, so it runs on a replica when one is configured
+        db = replica_router.read_session()
         try:
             users = db.query(User).all()
+            # One query for every profile the digests read, instead of one per user
+            profiles = profile_cache.get_many((user.id for user in users), db)
+            progress_service = ProgressService(db)
             
+            messages = []
             for user in users:
                 try:
-                    success = await self.agent_service.send_daily_notification(
-                        user_id=user.id
-                    )
-                    
-                    if success:
-                        logger.info(f"Sent daily notification to user {user.id}")
-                    else:
-                        logger.warning(f"Failed to send daily notification to user {user.id}")
-                        
+                    history = progress_service.get_progress_history(user.id, days=7)
+                    substitutions = digest_renderer.substitutions(history, profiles[user.id])
+                    messages.append((
+                        weekly_digest_key(user.id),
+                        email_payload(user.email, DIGEST_SUBJECT, digest_renderer.body, substitutions),
+                        user.id
+                    ))
                 except Exception as e:
-                    logger.error(f"Error sending daily notification to user {user.id}: {e}")
-                    
-        except Exception as e:
-            logger.error(f"Error in daily notification batch: {e}")
+                    logger.error(f"Error building weekly digest for {user.email}: {e}")
+                    db.rollback()
         finally:
             db.close()
+        
+        # One transaction on the primary: a rerun after a crash queues only what is missing
+        return enqueue_batch(OutboxChannel.EMAIL, messages)
+    
+    async def _send_daily_notifications(self):
+        """Queue the daily learning prompt for every registered device; the outbox workers send them"""
+        # The prompt is the same for everyone, so it takes one LLM call however many devices there are
+        message = await self.agent_service.generate_daily_prompt()
+        
+        queued = 0
+        after_id = 0
+        while True:
+            page = await asyncio.to_thread(self.get_device_token_page, after_id)
+            if not page:
+                break
+            after_id = page[-1][0]
+            queued += await asyncio.to_thread(enqueue_batch, OutboxChannel.PUSH, [
+                (daily_prompt_key(device_id), push_payload(token, DAILY_PROMPT_TITLE, message), user_id)
+                for device_id, user_id, token in page
+            ])
+        
+        logger.info(f"Daily notifications: {queued} queued")
+    
+    def get_device_token_page(self, after_id: int):
+        db = replica_router.read_session()
+        try:
+            return DeviceTokenService(db).get_token_page(after_id)
+        finally:
+            db.close()
+    
+    async def _outbox_purge_task(self):
+        """Delete sent outbox messages past their retention"""
+        while self.running:
+            try:
+                with time_job("outbox_purge"):
+                    purged = await asyncio.to_thread(outbox_dispatcher.purge_sent, settings.OUTBOX_RETENTION_DAYS)
+                if purged:
+                    logger.info(f"Purged {purged} sent outbox messages")
+            except Exception as e:
+                logger.error(f"Error in outbox purge task: {e}")
+            await asyncio.sleep(3600)
 
 # Global background task service instance
 background_task_service = BackgroundTaskService()
@@ -0,0 +1,44 @@
+import logging
+from typing import Dict, List
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+class ConnectionManager:
+    """Open agent WebSockets in this process, grouped by user"""
+    
+    def __init__(self):
+        self.active_connections: Dict[int, List[WebSocket]] = {}
+    
+    async def connect(self, websocket: WebSocket, user_id: int):
+        await websocket.accept()
+        self.active_connections.setdefault(user_id, []).append(websocket)
+    
+    def disconnect(self, websocket: WebSocket, user_id: int):
+        connections = self.active_connections.get(user_id, [])
+        if websocket in connections:
+            connections.remove(websocket)
+        if not connections:
+            self.active_connections.pop(user_id, None)
+    
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        await websocket.send_text(message)
+    
+    async def send_to_user(self, user_id: int, message: str) -> int:
+        """Send a message to every socket the user has open here; returns how many got it"""
+        sent = 0
+        for websocket in list(self.active_connections.get(user_id, [])):
+            try:
+                await websocket.send_text(message)
+                sent += 1
+            except Exception as e:
+                logger.debug(f"Dropping closed WebSocket for user {user_id}: {e}")
+                self.disconnect(websocket, user_id)
+        return sent
+    
+    async def broadcast(self, message: str):
+        for user_id in list(self.active_connections):
+            await self.send_to_user(user_id, message)
+
+# Global connection manager instance
+manager = ConnectionManager()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+ConversationKey = Tuple[int, Optional[int]]
+
+# Called as summarizer(previous_summary, transcript) -> new_summary
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+@dataclass
+class Turn:
+    role: str
+    content: str
+    tokens: int
+
+class Conversation:
+    """Recent turns kept verbatim plus a rolling summary of older turns"""
+    
+    def __init__(self):
+        self.summary: str = ""
+        self.turns: List[Turn] = []
+        self.history_tokens: int = 0
+        # Turns pushed out of the window that are not yet folded into the summary
+        self.pending: List[Turn] = []
+        self.summarizing: bool = False
+    
+    def format_history(self) -> str:
+        if not self.turns:
+            return "(no previous messages)"
+        return format_turns(self.turns)
+
+def format_turns(turns: List[Turn]) -> str:
+    return "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+
+class ConversationMemory:
+    """Server-side chat memory per (user, curriculum) with a strict token budget.
+    
+    The prompt only ever contains the cached learner context block, the rolling
+    summary and the most recent turns, each capped by its own budget, so prompt
+    size stays constant however long the conversation runs. Turns that fall out
+    of the window are summarized asynchronously, off the request path.
+    """
+    
+    def __init__(
+        self,
+        history_token_budget: int,
+        summary_token_budget: int,
+        context_token_budget: int,
+        context_ttl_seconds: int,
+        max_conversations: int
+    ):
+        self.history_token_budget = history_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.context_token_budget = context_token_budget
+        self.context_ttl_seconds = context_ttl_seconds
+        self.max_conversations = max_conversations
+        
+        self._conversations: "OrderedDict[ConversationKey, Conversation]" = OrderedDict()
+        self._context_cache: Dict[ConversationKey, Tuple[float, str]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def get(self, user_id: int, curriculum_id: Optional[int] = None) -> Conversation:
+        """Get (or start) the conversation for a user and curriculum"""
+        key = (user_id, curriculum_id)
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            conversation = Conversation()
+            self._conversations[key] = conversation
+            # Evict the least recently used conversations to bound memory
+            while len(self._conversations) > self.max_conversations:
+                evicted_key, _ = self._conversations.popitem(last=False)
+                self._context_cache.pop(evicted_key, None)
+        else:
+            self._conversations.move_to_end(key)
+        return conversation
+    
+    def prompt_inputs(self, user_id: int, curriculum_id: Optional[int] = None) -> Dict[str, str]:
+        """Get the summary and history prompt variables for a conversation"""
+        conversation = self.get(user_id, curriculum_id)
+        return {
+            "summary": conversation.summary or "(none yet)",
+            "history": conversation.format_history()
+        }
+    
+    def add_turn(
+        self,
+        user_id: int,
+        curriculum_id: Optional[int],
+        message: str,
+        response: str,
+        summarizer: Optional[Summarizer] = None
+    ) -> None:
+        """Record a user message and the agent's reply, trimming to the budget"""
+        conversation = self.get(user_id, curriculum_id)
+        
+        # A single oversized message must not blow the whole window on its own
+        per_turn_budget = max(1, self.history_token_budget // 2)
+        for role, content in (("User", message), ("Assistant", response)):
+            content = truncate_to_tokens(content, per_turn_budget)
+            turn = Turn(role=role, content=content, tokens=count_tokens(content))
+            conversation.turns.append(turn)
+            conversation.history_tokens += turn.tokens
+        
+        while conversation.history_tokens > self.history_token_budget and conversation.turns:
+            evicted = conversation.turns.pop(0)
+            conversation.history_tokens -= evicted.tokens
+            conversation.pending.append(evicted)
+        
+        if conversation.pending:
+            if summarizer is None:
+                conversation.pending.clear()
+            elif not conversation.summarizing:
+                self._schedule_summary(conversation, summarizer)
+    
+    def _schedule_summary(self, conversation: Conversation, summarizer: Summarizer) -> None:
+        conversation.summarizing = True
+        task = asyncio.create_task(self._summarize(conversation, summarizer))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _summarize(self, conversation: Conversation, summarizer: Summarizer) -> None:
+        try:
+            # Turns evicted while a summary was running are picked up by the next pass
+            while conversation.pending:
+                turns = conversation.pending
+                conversation.pending = []
+                try:
+                    summary = await summarizer(conversation.summary, format_turns(turns))
+                    conversation.summary = truncate_to_tokens(summary, self.summary_token_budget)
+                except Exception as e:
+                    # Losing detail from old turns is preferable to an unbounded prompt
+                    logger.warning(f"Failed to summarize conversation turns: {e}")
+        finally:
+            conversation.summarizing = False
+    
+    def get_context_block(
+        self,
+        user_id: int,
+        curriculum_id: Optional[int],
+        loader: Callable[[], str]
+    ) -> str:
+        """Get the cached learner context block, rebuilding it with loader when stale"""
+        key = (user_id, curriculum_id)
+        cached = self._context_cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.context_ttl_seconds:
+            return cached[1]
+        
+        block = truncate_to_tokens(loader(), self.context_token_budget)
+        self._context_cache[key] = (now, block)
+        return block
+    
+    def invalidate_context(self, user_id: int, curriculum_id: Optional[int] = None) -> None:
+        """Drop cached context blocks for a user (all curriculums when curriculum_id is None)"""
+        for key in list(self._context_cache):
+            if key[0] == user_id and (curriculum_id is None or key[1] == curriculum_id):
+                self._context_cache.pop(key, None)
+    
+    def clear(self, user_id: int, curriculum_id: Optional[int] = None) -> None:
+        """Forget a conversation"""
+        self._conversations.pop((user_id, curriculum_id), None)
+        self._context_cache.pop((user_id, curriculum_id), None)
+
+# Global conversation memory instance
+conversation_memory = ConversationMemory(
+    history_token_budget=settings.CHAT_HISTORY_TOKEN_BUDGET,
+    summary_token_budget=settings.CHAT_SUMMARY_TOKEN_BUDGET,
+    context_token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+    context_ttl_seconds=settings.CHAT_CONTEXT_CACHE_TTL_SECONDS,
+    max_conversations=settings.CHAT_MAX_CONVERSATIONS
+)
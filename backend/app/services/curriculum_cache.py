@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.curriculum import ResourceStatus
+from app.schemas.curriculum import CurriculumComplete
+
+logger = logging.getLogger(__name__)
+
+# Seconds to stop calling Redis after it fails, so an outage costs one timeout, not one per request
+REDIS_RETRY_SECONDS = 30
+
+curriculum_cache_lookups_total = metrics.counter(
+    "curriculum_cache_lookups_total",
+    "Curriculum tree cache lookups by result (memory_hit, redis_hit, coalesced or miss)",
+    ("result",)
+)
+curriculum_cache_invalidations_total = metrics.counter(
+    "curriculum_cache_invalidations_total", "Cached curriculum trees patched in place or dropped", ("reason",)
+)
+
+class CurriculumTreeCache:
+    """Read-through cache of serialized CurriculumComplete trees keyed by curriculum id.
+    
+    Every entry carries the curriculum version it was built from and is only
+    served when that still matches the row, so a write this process never saw
+    (another worker, a migration) costs a miss rather than a stale read. Writes
+    that go through the services patch or drop entries so the next read hits.
+    Concurrent misses for one curriculum wait for a single load.
+    """
+    
+    def __init__(self, max_entries: int, redis_url: Optional[str] = None, redis_ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self.redis_ttl_seconds = redis_ttl_seconds
+        
+        self._entries: "OrderedDict[int, Tuple[int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-curriculum load locks with a count of threads holding or waiting on each
+        self._inflight: Dict[int, Tuple[threading.Lock, int]] = {}
+        self._redis = None
+        self._redis_retry_at = 0.0
+    
+    def get_or_load(self, curriculum_id: int, version: int, loader: Callable[[], str]) -> str:
+        """Get the serialized tree for a curriculum version, building it with loader on a miss"""
+        body = self._get_memory(curriculum_id, version)
+        if body is not None:
+            curriculum_cache_lookups_total.inc(result="memory_hit")
+            return body
+        
+        with self._single_flight(curriculum_id):
+            # Another thread may have loaded it while we waited
+            body = self._get_memory(curriculum_id, version)
+            if body is not None:
+                curriculum_cache_lookups_total.inc(result="coalesced")
+                return body
+            
+            body = self._get_redis(curriculum_id, version)
+            if body is not None:
+                curriculum_cache_lookups_total.inc(result="redis_hit")
+                self._set_memory(curriculum_id, version, body)
+                return body
+            
+            curriculum_cache_lookups_total.inc(result="miss")
+            body = loader()
+            self._set_memory(curriculum_id, version, body)
+            self._set_redis(curriculum_id, version, body)
+            return body
+    
+    def patch_resources(
+        self,
+        curriculum_id: int,
+        version: int,
+        updated_at: datetime,
+        changes: Dict[int, Tuple[ResourceStatus, datetime]]
+    ) -> None:
+        """Apply resource status changes to the cached tree they moved from version - 1 to version.
+        
+        changes maps resource id to its new status and status_changed_at.
+        """
+        previous = version - 1
+        body = self._get_memory(curriculum_id, previous) or self._get_redis(curriculum_id, previous)
+        if body is None:
+            # Nothing cached, or an entry some other write already made stale
+            self.evict(curriculum_id, reason="invalidated")
+            return
+        
+        tree = CurriculumComplete.model_validate_json(body)
+        resources = {r.id: r for m in tree.modules for r in m.resources}
+        if not all(resource_id in resources for resource_id in changes):
+            self.evict(curriculum_id, reason="invalidated")
+            return
+        
+        # The curriculum and resource rows were updated in one transaction, so share its now()
+        for resource_id, (status, status_changed_at) in changes.items():
+            resource = resources[resource_id]
+            resource.status = status
+            resource.status_changed_at = status_changed_at
+            resource.updated_at = updated_at
+        tree.version = version
+        tree.updated_at = updated_at
+        body = tree.model_dump_json()
+        self._set_memory(curriculum_id, version, body)
+        self._set_redis(curriculum_id, version, body)
+        curriculum_cache_invalidations_total.inc(reason="patched")
+    
+    def evict(self, curriculum_id: int, reason: str = "evicted") -> None:
+        """Drop a curriculum's cached tree from every tier"""
+        with self._lock:
+            self._entries.pop(curriculum_id, None)
+        client = self._redis_client()
+        if client is not None:
+            try:
+                client.delete(self._redis_key(curriculum_id))
+            except Exception as e:
+                self._redis_failed(e)
+        curriculum_cache_invalidations_total.inc(reason=reason)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @contextmanager
+    def _single_flight(self, curriculum_id: int) -> Iterator[None]:
+        with self._lock:
+            lock, holders = self._inflight.get(curriculum_id, (threading.Lock(), 0))
+            self._inflight[curriculum_id] = (lock, holders + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, holders = self._inflight[curriculum_id]
+                if holders == 1:
+                    del self._inflight[curriculum_id]
+                else:
+                    self._inflight[curriculum_id] = (lock, holders - 1)
+    
+    def _get_memory(self, curriculum_id: int, version: int) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(curriculum_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(curriculum_id)
+            return entry[1]
+    
+    def _set_memory(self, curriculum_id: int, version: int, body: str) -> None:
+        with self._lock:
+            entry = self._entries.get(curriculum_id)
+            # A slow load must not replace a tree a later write already patched in
+            if entry is not None and entry[0] > version:
+                return
+            self._entries[curriculum_id] = (version, body)
+            self._entries.move_to_end(curriculum_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _redis_key(self, curriculum_id: int) -> str:
+        return f"curriculum-tree:{curriculum_id}"
+    
+    def _redis_client(self):
+        if not self.redis_url or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        return self._redis
+    
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"Curriculum cache Redis tier unavailable, skipping it for {REDIS_RETRY_SECONDS}s: {error}")
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    
+    def _get_redis(self, curriculum_id: int, version: int) -> Optional[str]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            value = client.get(self._redis_key(curriculum_id))
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        if value is None:
+            return None
+        cached_version, _, body = value.decode().partition(":")
+        return body if cached_version == str(version) else None
+    
+    def _set_redis(self, curriculum_id: int, version: int, body: str) -> None:
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            client.set(self._redis_key(curriculum_id), f"{version}:{body}", ex=self.redis_ttl_seconds)
+        except Exception as e:
+            self._redis_failed(e)
+
+# Global curriculum tree cache instance
+curriculum_cache = CurriculumTreeCache(
+    max_entries=settings.CURRICULUM_CACHE_MAX_ENTRIES,
+    redis_url=settings.REDIS_URL if settings.CURRICULUM_CACHE_REDIS_ENABLED else None,
+    redis_ttl_seconds=settings.CURRICULUM_CACHE_REDIS_TTL_SECONDS
+)
+
+metrics.gauge(
+    "curriculum_cache_entries", "Curriculum trees held in the in-process cache",
+    collect=lambda: {(): len(curriculum_cache)}
+)
\ No newline at end of file
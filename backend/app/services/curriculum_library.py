@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import logging
+import math
+import operator
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import SLOW_BUCKETS, metrics
+from app.models.curriculum_template import CurriculumTemplate
+from app.models.generation_job import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+# Resource types each learning style gets first when a template's resources are trimmed
+STYLE_PREFERENCES = {
+    "visual": ["video", "simulation", "interactive"],
+    "auditory": ["video", "article"],
+    "reading": ["article", "quiz"],
+    "kinesthetic": ["interactive", "simulation", "quiz"]
+}
+# Resources kept per module for each pace
+PACE_RESOURCES = {"slow": 5, "moderate": 6, "fast": 8}
+
+curriculum_library_lookups_total = metrics.counter(
+    "curriculum_library_lookups_total", "Curriculum library searches by result (hit, miss or error)", ("result",)
+)
+curriculum_generation_seconds = metrics.histogram(
+    "curriculum_generation_seconds", "Time to generate and save a curriculum by source (library or llm)",
+    ("source",), SLOW_BUCKETS
+)
+
+def topic_key(title: str) -> str:
+    """Normalized title; one template per key"""
+    return " ".join(title.lower().split())
+
+def topic_text(title: str, description: Optional[str]) -> str:
+    """The text embedded for a template or a request"""
+    return f"{title}\n{description}" if description else title
+
+def embedding_model_name(embeddings: Any) -> str:
+    """Identify an embeddings client, so vectors from another model are never compared"""
+    model = getattr(embeddings, "model", None)
+    if model:
+        return str(model)
+    return f"{type(embeddings).__name__}-{getattr(embeddings, 'dimensions', '')}"
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def adapt_modules(modules: List[Dict[str, Any]], learning_style: str, pace: str) -> List[Dict[str, Any]]:
+    """Fit a template's modules to a learner without an LLM call.
+    
+    Each module keeps as many resources as the pace calls for, choosing the
+    learning style's preferred types first, and the kept ones stay in the
+    template's order.
+    """
+    preferred = STYLE_PREFERENCES.get(learning_style, [])
+    keep = PACE_RESOURCES.get(pace, PACE_RESOURCES["moderate"])
+    
+    def rank(resource: Dict[str, Any]) -> int:
+        return preferred.index(resource["type"]) if resource["type"] in preferred else len(preferred)
+    
+    adapted = []
+    for module in modules:
+        resources = module.get("resources", [])
+        kept = sorted(sorted(range(len(resources)), key=lambda i: rank(resources[i]))[:keep])
+        adapted.append({**module, "resources": [resources[i] for i in kept]})
+    return adapted
+
+@dataclass
+class LibraryMatch:
+    template_id: int
+    title: str
+    similarity: float
+    modules: List[Dict[str, Any]]
+
+class CurriculumLibrary:
+    """Nearest-neighbour search over the pre-generated curriculum templates.
+    
+    The embeddings of every template made with the current embedding model
+    are held in memory at unit length and searched by brute force: the
+    library is a few hundred topics, so a search is one pass of dot products
+    and its only remote call embeds the request. The index is re-read every
+    refresh_seconds, so a rebuilt library is picked up without a restart.
+    """
+    
+    def __init__(self, min_similarity: float, refresh_seconds: int):
+        self.min_similarity = min_similarity
+        self.refresh_seconds = refresh_seconds
+        
+        # (template ids, unit vectors), replaced whole on each load
+        self._index: Tuple[List[int], List[List[float]]] = ([], [])
+        self._model: Optional[str] = None
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+    
+    async def find(self, embeddings: Any, title: str, description: Optional[str] = None) -> Optional[LibraryMatch]:
+        """The template closest to a request if it is at least min_similarity, else None"""
+        model = embedding_model_name(embeddings)
+        if model != self._model or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            await asyncio.to_thread(self._load, model)
+        ids, vectors = self._index
+        if not ids:
+            # Nothing to compare against; don't pay for the embedding
+            curriculum_library_lookups_total.inc(result="miss")
+            return None
+        
+        query = _unit(await embeddings.aembed_query(topic_text(title, description)))
+        similarities = [sum(map(operator.mul, query, vector)) for vector in vectors]
+        best = max(range(len(ids)), key=similarities.__getitem__)
+        if similarities[best] < self.min_similarity:
+            curriculum_library_lookups_total.inc(result="miss")
+            return None
+        
+        template = await asyncio.to_thread(self._use, ids[best])
+        if template is None:
+            # Deleted since the index was loaded
+            curriculum_library_lookups_total.inc(result="miss")
+            return None
+        curriculum_library_lookups_total.inc(result="hit")
+        return LibraryMatch(
+            template_id=ids[best],
+            title=template.title,
+            similarity=similarities[best],
+            modules=template.structure["modules"]
+        )
+    
+    def _load(self, model: str) -> None:
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            if model == self._model and time.monotonic() - self._loaded_at <= self.refresh_seconds:
+                return
+            with SessionLocal() as db:
+                rows = db.execute(
+                    select(CurriculumTemplate.id, CurriculumTemplate.embedding)
+                    .where(CurriculumTemplate.embedding_model == model)
+                ).all()
+            self._index = ([row.id for row in rows], [_unit(row.embedding) for row in rows])
+            self._model = model
+            self._loaded_at = time.monotonic()
+    
+    def _use(self, template_id: int):
+        """Count a use of a template and return its title and structure in one round trip"""
+        with SessionLocal() as db:
+            template = db.execute(
+                update(CurriculumTemplate)
+                .where(CurriculumTemplate.id == template_id)
+                .values(times_used=CurriculumTemplate.times_used + 1)
+                .returning(CurriculumTemplate.title, CurriculumTemplate.structure)
+            ).first()
+            db.commit()
+            return template
+    
+    def invalidate(self) -> None:
+        """Re-read the library on the next search"""
+        self._loaded_at = float("-inf")
+    
+    def size(self) -> int:
+        return len(self._index[0])
+
+# Global curriculum library instance
+curriculum_library = CurriculumLibrary(
+    min_similarity=settings.CURRICULUM_LIBRARY_MIN_SIMILARITY,
+    refresh_seconds=settings.CURRICULUM_LIBRARY_REFRESH_SECONDS
+)
+
+metrics.gauge(
+    "curriculum_library_templates", "Curriculum templates in this process's library index",
+    collect=lambda: {(): curriculum_library.size()}
+)
+
+def popular_topics(limit: int, min_requests: int = 3) -> List[Tuple[str, Optional[str]]]:
+    """The most requested curriculum titles, as (title, None), from the generation job history"""
+    key = func.lower(func.regexp_replace(func.trim(GenerationJob.title), r"\s+", " ", "g"))
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(func.min(GenerationJob.title))
+            .group_by(key)
+            .having(func.count() >= min_requests)
+            .order_by(func.count().desc())
+            .limit(limit)
+        ).scalars().all()
+    return [(title.strip(), None) for title in rows]
+
+def _library_topics(model: str) -> Set[str]:
+    with SessionLocal() as db:
+        return set(db.execute(
+            select(CurriculumTemplate.topic).where(CurriculumTemplate.embedding_model == model)
+        ).scalars().all())
+
+def _save_template(
+    title: str, description: Optional[str], modules: List[Dict[str, Any]], embedding: List[float], model: str
+) -> None:
+    values = {
+        "topic": topic_key(title),
+        "title": title,
+        "description": description,
+        "structure": {"modules": modules},
+        "embedding": embedding,
+        "embedding_model": model
+    }
+    statement = pg_insert(CurriculumTemplate).values(**values)
+    with SessionLocal() as db:
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[CurriculumTemplate.topic],
+            set_={**{name: statement.excluded[name] for name in values if name != "topic"}, "updated_at": func.now()}
+        ))
+        db.commit()
+
+async def build_library(
+    agent_service: Any,
+    topics: List[Tuple[str, Optional[str]]],
+    concurrency: int = 4,
+    refresh: bool = False
+) -> Tuple[int, int]:
+    """Generate and store templates for topics not in the library yet (every topic with refresh).
+    
+    Returns how many were built and how many failed.
+    """
+    embeddings = agent_service.vector_service.embeddings
+    model = embedding_model_name(embeddings)
+    existing = set() if refresh else await asyncio.to_thread(_library_topics, model)
+    todo: Dict[str, Tuple[str, Optional[str]]] = {}
+    for title, description in topics:
+        if topic_key(title) not in existing:
+            todo.setdefault(topic_key(title), (title, description))
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def build(title: str, description: Optional[str]) -> None:
+        async with semaphore:
+            modules = await agent_service.generate_template(title, description)
+        embedding = await embeddings.aembed_query(topic_text(title, description))
+        await asyncio.to_thread(_save_template, title, description, modules, embedding, model)
+    
+    results = await asyncio.gather(*(build(*topic) for topic in todo.values()), return_exceptions=True)
+    failed = 0
+    for (title, _), result in zip(todo.values(), results):
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.warning(f"Could not build a library curriculum for {title!r}: {result}")
+    curriculum_library.invalidate()
+    return len(results) - failed, failed
+
+def _read_topics(path: str) -> List[Tuple[str, Optional[str]]]:
+    topics = []
+    with open(path) as f:
+        for line in f:
+            title, _, description = line.partition("|")
+            if title.strip():
+                topics.append((title.strip(), description.strip() or None))
+    return topics
+
+async def _main() -> int:
+    parser = argparse.ArgumentParser(description="Build the pre-generated curriculum library")
+    parser.add_argument("--topics", help="file with one topic per line, as title or title | description")
+    parser.add_argument("--popular", type=int, default=0, help="also build the N most requested titles")
+    parser.add_argument("--min-requests", type=int, default=3, help="requests a title needs to count as popular")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--refresh", action="store_true", help="regenerate topics already in the library")
+    args = parser.parse_args()
+    
+    from app.services.agent_service import get_agent_service
+    
+    topics = _read_topics(args.topics) if args.topics else []
+    if args.popular:
+        topics += popular_topics(args.popular, args.min_requests)
+    if not topics:
+        parser.error("no topics; pass --topics and/or --popular")
+    
+    built, failed = await build_library(get_agent_service(), topics, args.concurrency, args.refresh)
+    logger.info(f"Curriculum library: {built} built, {failed} failed, {len(topics) - built - failed} already present")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main()))
\ No newline at end of file
@@ -1,23 +1,60 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.orm import Session, selectinload
+from app.core.pagination import encode_cursor, decode_cursor
 from app.models.curriculum import Curriculum, CurriculumModule, LearningResource
 from app.schemas.curriculum import CurriculumCreate, CurriculumResponse, CurriculumComplete
-from typing import List, Optional
+from app.services.conversation_memory import conversation_memory
+from app.services.curriculum_cache import curriculum_cache
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 class CurriculumService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_user_curriculums(self, user_id: int) -> List[Curriculum]:
-        """Get all curriculums for a user"""
-        return self.db.query(Curriculum).filter(Curriculum.user_id == user_id).all()
+    def get_user_curriculums(self, user_id: int, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Curriculum], Optional[str]]:
+        """Get a page of a user's curriculums, newest first, and the cursor for the next page"""
+        query = self.db.query(Curriculum).filter(Curriculum.user_id == user_id, Curriculum.deleted_at.is_(None))
+        if cursor:
+            created_at, curriculum_id = decode_cursor(cursor)
+            query = query.filter(tuple_(Curriculum.created_at, Curriculum.id) < (created_at, curriculum_id))
+        
+        # One extra row tells us whether there is a next page; id breaks created_at ties
+        curriculums = query.order_by(Curriculum.created_at.desc(), Curriculum.id.desc()).limit(limit + 1).all()
+        if len(curriculums) <= limit:
+            return curriculums, None
+        curriculums = curriculums[:limit]
+        return curriculums, encode_cursor(curriculums[-1].created_at, curriculums[-1].id)
     
     def get_curriculum_with_modules(self, curriculum_id: int, user_id: int) -> Optional[Curriculum]:
         """Get a curriculum with all its modules and resources"""
         return self.db.query(Curriculum).filter(
             Curriculum.id == curriculum_id,
-            Curriculum.user_id == user_id
+            Curriculum.user_id == user_id,
+            Curriculum.deleted_at.is_(None)
+        ).first()
+    
+    def get_curriculum_tree(self, curriculum_id: int) -> Optional[Curriculum]:
+        """Get a curriculum with its modules and resources loaded in three queries"""
+        return self.db.query(Curriculum).options(
+            selectinload(Curriculum.modules).selectinload(CurriculumModule.resources)
+        ).filter(
+            Curriculum.id == curriculum_id
         ).first()
     
+    def serialize_curriculum_tree(self, curriculum_id: int) -> str:
+        """The CurriculumComplete JSON for a curriculum, as cached and served"""
+        return CurriculumComplete.model_validate(self.get_curriculum_tree(curriculum_id)).model_dump_json()
+    
+    def touch_curriculum(self, curriculum_id) -> Tuple[int, datetime]:
+        """Bump a curriculum's version so ETags (and anything cached from it) change"""
+        return tuple(self.db.execute(
+            update(Curriculum)
+            .where(Curriculum.id == curriculum_id)
+            .values(version=Curriculum.version + 1, updated_at=func.now())
+            .returning(Curriculum.version, Curriculum.updated_at)
+        ).one())
+    
     def create_curriculum(self, user_id: int, curriculum_data: CurriculumCreate) -> Curriculum:
         """Create a new curriculum"""
         curriculum = Curriculum(
@@ -39,6 +76,7 @@ class CurriculumService:
             order=order
         )
         self.db.add(module)
+        self.touch_curriculum(curriculum_id)
         self.db.commit()
         self.db.refresh(module)
         return module
@@ -47,6 +85,7 @@ class CurriculumService:
         """Create a new learning resource"""
         resource = LearningResource(
             module_id=module_id,
+            user_id=select(Curriculum.user_id).join(CurriculumModule).where(CurriculumModule.id == module_id).scalar_subquery(),
             title=title,
             description=description,
             url=url,
@@ -54,19 +93,98 @@ class CurriculumService:
             order=order
         )
         self.db.add(resource)
+        self.touch_curriculum(
+            select(CurriculumModule.curriculum_id).where(CurriculumModule.id == module_id).scalar_subquery()
+        )
         self.db.commit()
         self.db.refresh(resource)
         return resource
     
+    def create_module_with_resources(
+        self,
+        curriculum_id: int,
+        user_id: int,
+        title: str,
+        description: str = None,
+        order: int = 0,
+        resources: List[Dict[str, Any]] = ()
+    ) -> CurriculumModule:
+        """Create a module and its resources (dicts with title, url, type, description and optionally link_status) in one transaction"""
+        module = CurriculumModule(
+            curriculum_id=curriculum_id,
+            title=title,
+            description=description,
+            order=order
+        )
+        self.db.add(module)
+        self.db.flush()
+        self.db.add_all([
+            LearningResource(
+                module_id=module.id,
+                user_id=user_id,
+                title=resource_data["title"],
+                description=resource_data.get("description", ""),
+                url=resource_data["url"],
+                link_status=resource_data.get("link_status"),
+                resource_type=resource_data["type"],
+                order=i
+            )
+            for i, resource_data in enumerate(resources)
+        ])
+        self.touch_curriculum(curriculum_id)
+        self.db.commit()
+        return module
+    
     def delete_curriculum(self, curriculum_id: int, user_id: int) -> bool:
-        """Delete a curriculum"""
-        curriculum = self.db.query(Curriculum).filter(
-            Curriculum.id == curriculum_id,
-            Curriculum.user_id == user_id
+        """Soft-delete a curriculum; its rows are removed later by purge_curriculum"""
+        deleted = self.db.execute(
+            update(Curriculum)
+            .where(Curriculum.id == curriculum_id, Curriculum.user_id == user_id, Curriculum.deleted_at.is_(None))
+            .values(deleted_at=func.now(), version=Curriculum.version + 1)
+            .returning(Curriculum.id)
         ).first()
+        self.db.commit()
         
-        if curriculum:
-            self.db.delete(curriculum)
-            self.db.commit()
+        if deleted:
+            curriculum_cache.evict(curriculum_id)
+            conversation_memory.clear(user_id, curriculum_id)
             return True
-        return False 
\ No newline at end of file
+        return False
+    
+    def get_deleted_curriculum_ids(self, limit: int = 100) -> List[int]:
+        """Soft-deleted curriculums still waiting to be purged, oldest first"""
+        return self.db.execute(
+            select(Curriculum.id)
+            .where(Curriculum.deleted_at.is_not(None))
+            .order_by(Curriculum.deleted_at)
+            .limit(limit)
+        ).scalars().all()
+    
+    def purge_curriculum(self, curriculum_id: int, chunk_size: int = 1000) -> int:
+        """Delete a soft-deleted curriculum's resources, modules and row in short chunked transactions"""
+        if not self.db.query(Curriculum.id).filter(Curriculum.id == curriculum_id, Curriculum.deleted_at.is_not(None)).first():
+            return 0
+        
+        module_ids = select(CurriculumModule.id).where(CurriculumModule.curriculum_id == curriculum_id)
+        chunks = [
+            (LearningResource, select(LearningResource.id).where(LearningResource.module_id.in_(module_ids))),
+            (CurriculumModule, module_ids)
+        ]
+        deleted = 0
+        for model, ids in chunks:
+            while True:
+                result = self.db.execute(
+                    delete(model).where(model.id.in_(ids.limit(chunk_size).scalar_subquery())),
+                    execution_options={"synchronize_session": False}
+                )
+                self.db.commit()
+                deleted += result.rowcount
+                if result.rowcount < chunk_size:
+                    break
+        
+        result = self.db.execute(
+            delete(Curriculum).where(Curriculum.id == curriculum_id),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.commit()
+        return deleted + result.rowcount
\ No newline at end of file
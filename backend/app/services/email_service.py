@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-recipient substitutions, keyed by the tags in the pre-rendered body
+Recipient = Tuple[str, Dict[str, str]]
+
+DIGEST_SUBJECT = "Weekly Learning Progress"
+DIGEST_TEMPLATE = """Weekly Learning Progress Digest
+
+Hello! Here's your learning progress this week:
+
+- Completed: {completed} (last week: {completed_previous})
+- Days Active: {active_days} of 7
+- Current Streak: {streak} days
+{goals}
+Keep up the great work! Continue with your learning journey."""
+
+def weekly_digest_key(user_id: int, day: date = None) -> str:
+    """Outbox idempotency key of a user's digest for the ISO week of day (default today)"""
+    year, week, _ = (day or date.today()).isocalendar()
+    return f"weekly_digest:{user_id}:{year}-W{week:02d}"
+
+# Statuses worth another attempt of the same batch
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# SendGrid names rejected recipients by position, e.g. "personalizations.12.to.0.email"
+PERSONALIZATION_FIELD_RE = re.compile(r"^personalizations\.(\d+)\.")
+
+email_recipients_total = metrics.counter(
+    "email_recipients_total", "Email recipients by outcome (sent, rejected or failed)", ("outcome",)
+)
+email_requests_total = metrics.counter(
+    "email_requests_total", "Email provider requests by HTTP status (or error)", ("status",)
+)
+
+class DigestRenderer:
+    """Weekly digest body rendered once per send, with SendGrid substitution tags for each recipient's numbers"""
+    
+    FIELDS = ("completed", "completed_previous", "active_days", "streak", "goals")
+    
+    def __init__(self, template: str = DIGEST_TEMPLATE):
+        self.body = template.format(**{name: self.tag(name) for name in self.FIELDS})
+    
+    @staticmethod
+    def tag(name: str) -> str:
+        return f"-{name}-"
+    
+    def substitutions(self, history: Dict[str, Any], profile=None) -> Dict[str, str]:
+        """Tag values for one recipient from their progress history and (cached) profile"""
+        goals = f"\nYour goals: {', '.join(profile.goals)}\n" if profile and profile.goals else ""
+        values = {
+            "completed": history["completed_last_7_days"],
+            "completed_previous": history["completed_previous_7_days"],
+            "active_days": history["active_days"],
+            "streak": history["current_streak"],
+            "goals": goals
+        }
+        # SendGrid only substitutes strings
+        return {self.tag(name): str(value) for name, value in values.items()}
+    
+    def render(self, substitutions: Dict[str, str]) -> str:
+        """The body one recipient will receive, as SendGrid substitutes it"""
+        body = self.body
+        for tag, value in substitutions.items():
+            body = body.replace(tag, value)
+        return body
+
+@dataclass
+class DeliveryReport:
+    sent: int = 0
+    rejected: int = 0  # addresses the provider refused; the rest of their batch was still sent
+    failed: int = 0  # recipients in batches that could not be delivered
+    requests: int = 0
+    retries: int = 0
+    failed_batches: int = 0
+    rejected_emails: List[str] = field(default_factory=list)
+    failed_emails: List[str] = field(default_factory=list)
+    
+    def add(self, other: "DeliveryReport") -> None:
+        self.sent += other.sent
+        self.rejected += other.rejected
+        self.failed += other.failed
+        self.requests += other.requests
+        self.retries += other.retries
+        self.failed_batches += other.failed_batches
+        self.rejected_emails.extend(other.rejected_emails)
+        self.failed_emails.extend(other.failed_emails)
+
+class SendGridClient:
+    """Bulk email through SendGrid's v3 mail/send API.
+    
+    One pooled aiohttp session sends every request. Recipients share one
+    body and differ only in substitutions, so each request carries up to
+    batch_size personalizations. Batches are sent concurrently and retried
+    with backoff on rate limits and server errors. Addresses SendGrid
+    rejects are dropped from their batch and the rest is sent again.
+    """
+    
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str,
+        from_email: str,
+        batch_size: int,
+        max_concurrency: int,
+        max_retries: int,
+        retry_backoff_seconds: float,
+        timeout_seconds: float
+    ):
+        self.api_key = api_key
+        self.api_url = api_url.rstrip("/")
+        self.from_email = from_email
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        
+        self._session = None
+    
+    def _get_session(self):
+        # Imported and built on first use, inside the event loop it will run on
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        return self._session
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def send_bulk(
+        self,
+        subject: str,
+        body: str,
+        recipients: List[Recipient],
+        content_type: str = "text/plain"
+    ) -> DeliveryReport:
+        """Send one body to many recipients, each with their own substitutions"""
+        report = DeliveryReport()
+        if not recipients:
+            return report
+        if not self.api_key:
+            logger.warning(f"SENDGRID_API_KEY is not set; not sending {len(recipients)} emails")
+            report.failed = len(recipients)
+            report.failed_emails = [email for email, _ in recipients]
+            email_recipients_total.inc(len(recipients), outcome="failed")
+            return report
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        content = {"subject": subject, "content": [{"type": content_type, "value": body}]}
+        
+        async def send(batch: List[Recipient]):
+            async with semaphore:
+                return await self._send_batch(content, batch)
+        
+        batches = [recipients[i:i + self.batch_size] for i in range(0, len(recipients), self.batch_size)]
+        for batch_report in await asyncio.gather(*(send(batch) for batch in batches)):
+            report.add(batch_report)
+        return report
+    
+    async def _send_batch(self, content: Dict[str, Any], batch: List[Recipient]) -> DeliveryReport:
+        import aiohttp
+        report = DeliveryReport()
+        attempt = 0
+        while batch:
+            payload = {
+                "from": {"email": self.from_email},
+                "personalizations": [
+                    {"to": [{"email": email}], "substitutions": substitutions}
+                    for email, substitutions in batch
+                ],
+                **content
+            }
+            retry_after = None
+            report.requests += 1
+            try:
+                async with self._get_session().post(f"{self.api_url}/v3/mail/send", json=payload) as response:
+                    email_requests_total.inc(status=str(response.status))
+                    if response.status < 300:
+                        report.sent += len(batch)
+                        email_recipients_total.inc(len(batch), outcome="sent")
+                        return report
+                    
+                    if response.status == 400:
+                        rejected = self._rejected_positions(await response.json(content_type=None), len(batch))
+                        if rejected:
+                            # Drop the bad addresses and send the rest straight away
+                            report.rejected += len(rejected)
+                            report.rejected_emails.extend(batch[i][0] for i in sorted(rejected))
+                            email_recipients_total.inc(len(rejected), outcome="rejected")
+                            batch = [recipient for i, recipient in enumerate(batch) if i not in rejected]
+                            continue
+                    if response.status not in RETRY_STATUSES:
+                        logger.error(f"Email batch of {len(batch)} rejected with {response.status}: {await response.text()}")
+                        break
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                email_requests_total.inc(status="error")
+                logger.warning(f"Email batch of {len(batch)} failed: {e}")
+            
+            if attempt >= self.max_retries:
+                break
+            attempt += 1
+            report.retries += 1
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        
+        if batch:
+            report.failed += len(batch)
+            report.failed_batches += 1
+            report.failed_emails.extend(email for email, _ in batch)
+            email_recipients_total.inc(len(batch), outcome="failed")
+        return report
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        try:
+            return max(0.0, float(retry_after))
+        except (TypeError, ValueError):
+            return self.retry_backoff_seconds * 2 ** (attempt - 1)
+    
+    @staticmethod
+    def _rejected_positions(body: Any, batch_size: int) -> set:
+        """Positions of the personalizations a 400 response blames"""
+        positions = set()
+        for error in (body or {}).get("errors", []) if isinstance(body, dict) else []:
+            match = PERSONALIZATION_FIELD_RE.match(error.get("field") or "")
+            if match and int(match.group(1)) < batch_size:
+                positions.add(int(match.group(1)))
+        return positions
+
+# Global instances
+digest_renderer = DigestRenderer()
+email_client = SendGridClient(
+    api_key=settings.SENDGRID_API_KEY,
+    api_url=settings.SENDGRID_API_URL,
+    from_email=settings.FROM_EMAIL,
+    batch_size=settings.EMAIL_BATCH_SIZE,
+    max_concurrency=settings.EMAIL_MAX_CONCURRENT_REQUESTS,
+    max_retries=settings.EMAIL_MAX_RETRIES,
+    retry_backoff_seconds=settings.EMAIL_RETRY_BACKOFF_SECONDS,
+    timeout_seconds=settings.EMAIL_TIMEOUT_SECONDS
+)
\ No newline at end of file
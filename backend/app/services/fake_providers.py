@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.core.config import settings
+from app.core.tokens import count_tokens
+
+# Shared so a run with a fixed seed replays the same latency sequence
+_rng = random.Random(settings.FAKE_LLM_SEED)
+
+RESOURCE_TYPES = ["video", "article", "interactive", "quiz", "simulation"]
+
+def sample_latency(mean_ms: float, jitter_ms: float, distribution: str) -> float:
+    """Draw a latency in seconds from the configured distribution"""
+    if distribution == "fixed" or jitter_ms <= 0:
+        value = mean_ms
+    elif distribution == "uniform":
+        value = _rng.uniform(mean_ms - jitter_ms, mean_ms + jitter_ms)
+    elif distribution == "lognormal":
+        # Long right tail, like real provider latencies; jitter is the standard deviation
+        sigma = math.sqrt(math.log(1 + (jitter_ms / mean_ms) ** 2))
+        value = _rng.lognormvariate(math.log(mean_ms) - sigma ** 2 / 2, sigma)
+    else:
+        value = _rng.gauss(mean_ms, jitter_ms)
+    return max(0.0, value) / 1000
+
+def _slug(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-") or "topic"
+
+def canned_resources(title: str, module: int, count: int = 6) -> List[Dict[str, Any]]:
+    """Deterministic resources for module number module (from 1) of a curriculum"""
+    return [
+        {
+            "title": f"{title} {module}.{r + 1}",
+            "description": f"Resource {r + 1} for part {module}",
+            "url": f"https://example.com/{_slug(title)}/{module}/{r + 1}",
+            "type": RESOURCE_TYPES[(module - 1 + r) % len(RESOURCE_TYPES)]
+        }
+        for r in range(count)
+    ]
+
+def canned_outline(title: str, modules: int = 4) -> Dict[str, Any]:
+    """A deterministic outline in the shape the outline phase of generate_curriculum expects"""
+    return {
+        "modules": [
+            {"title": f"{title}: Part {m + 1}", "description": f"Learning objectives for part {m + 1} of {title}"}
+            for m in range(modules)
+        ]
+    }
+
+def canned_curriculum(title: str, modules: int = 4, resources_per_module: int = 6) -> Dict[str, Any]:
+    """A deterministic curriculum structure in the shape generate_curriculum expects"""
+    outline = canned_outline(title, modules)
+    for m, module in enumerate(outline["modules"]):
+        module["resources"] = canned_resources(title, m + 1, resources_per_module)
+    return outline
+
+def malform(content: str) -> str:
+    """Break a JSON reply the way models do: cut it off, or drop a resource's url or type"""
+    data = json.loads(content)
+    resources = [r for m in data.get("modules", [data]) for r in m.get("resources", [])]
+    if resources and _rng.random() < 0.5:
+        _rng.choice(resources).pop(_rng.choice(["url", "type"]))
+        return json.dumps(data)
+    return content[:int(len(content) * _rng.uniform(0.4, 0.95))]
+
+def canned_response(prompt: str) -> str:
+    """Pick a canned reply for the kind of prompt the agent sent"""
+    lowered = prompt.lower()
+    if "curriculum architect" in lowered:
+        match = re.search(r"title:\s*(.+)", prompt, re.IGNORECASE)
+        title = match.group(1).strip() if match else "Learning Path"
+        # Module prompts include the outline, so check for them first
+        module = re.search(r"module (\d+) of \d+", lowered)
+        if module:
+            return json.dumps({"resources": canned_resources(title, int(module.group(1)))})
+        if "curriculum outline" in lowered:
+            return json.dumps(canned_outline(title))
+        return json.dumps(canned_curriculum(title))
+    if "running summary" in lowered:
+        return "The learner is working through their curriculum and asked for guidance."
+    digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+    return (
+        f"Great question! [{digest}] Start with the fundamentals in your current module, "
+        "practice with the interactive resources, and review your notes before moving on."
+    )
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with configurable latency and canned, deterministic output"""
+    
+    latency_ms: float = 800
+    latency_jitter_ms: float = 200
+    latency_distribution: str = "normal"  # fixed, uniform, normal or lognormal
+    tokens_per_second: float = 0  # generation pace; 0 returns or streams everything at once
+    malformed_rate: float = 0  # share of JSON replies broken by malform
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+    
+    def bind_functions(self, functions: List[Any], function_call: Optional[str] = None, **kwargs: Any):
+        """Answer with a call to the (first) function, as ChatOpenAI does with a forced function_call"""
+        from langchain_core.utils.function_calling import convert_to_openai_function
+        functions = [convert_to_openai_function(function) for function in functions]
+        if function_call:
+            kwargs["function_call"] = {"name": function_call}
+        return self.bind(functions=functions, **kwargs)
+    
+    def _respond(self, messages: List[BaseMessage]) -> Tuple[str, float, Dict[str, int]]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = canned_response(prompt)
+        if self.malformed_rate > 0 and content.startswith("{") and _rng.random() < self.malformed_rate:
+            content = malform(content)
+        latency = sample_latency(self.latency_ms, self.latency_jitter_ms, self.latency_distribution)
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        return content, latency, usage
+    
+    def _result(self, content: str, usage: Dict[str, int], functions: Optional[List[Dict[str, Any]]] = None) -> ChatResult:
+        if functions:
+            # The reply becomes the function call's arguments, a JSON string as OpenAI sends it
+            function_call = {"name": functions[0]["name"], "arguments": content}
+            message = AIMessage(
+                content="", additional_kwargs={"function_call": function_call}, response_metadata={"token_usage": usage}
+            )
+        else:
+            message = AIMessage(content=content, response_metadata={"token_usage": usage})
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"token_usage": usage})
+    
+    def _generation_seconds(self, usage: Dict[str, int]) -> float:
+        # A whole response takes as long as streaming all of its tokens would
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return usage["completion_tokens"] / self.tokens_per_second
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        content, latency, usage = self._respond(messages)
+        time.sleep(latency + self._generation_seconds(usage))
+        return self._result(content, usage, kwargs.get("functions"))
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        content, latency, usage = self._respond(messages)
+        await asyncio.sleep(latency + self._generation_seconds(usage))
+        return self._result(content, usage, kwargs.get("functions"))
+    
+    def _chunks(self, content: str) -> List[str]:
+        return re.findall(r"\S+\s*", content) or [content]
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content, latency, _ = self._respond(messages)
+        # Latency is time to first token; later chunks are paced by tokens_per_second
+        time.sleep(latency)
+        for chunk in self._chunks(content):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+            if self.tokens_per_second > 0:
+                time.sleep(1 / self.tokens_per_second)
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        content, latency, _ = self._respond(messages)
+        await asyncio.sleep(latency)
+        for chunk in self._chunks(content):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic feature-hashing embeddings; texts sharing words land close together"""
+    
+    def __init__(self, dimensions: int = 256, latency_ms: float = 0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+    
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] % 2 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+class InMemoryVectorStore:
+    """Brute-force cosine similarity store standing in for Weaviate offline"""
+    
+    def __init__(self, embedding: Embeddings):
+        self.embedding = embedding
+        self.documents: List[Document] = []
+        self.vectors: List[List[float]] = []
+    
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        start = len(self.documents)
+        self.vectors.extend(self.embedding.embed_documents([doc.page_content for doc in documents]))
+        self.documents.extend(documents)
+        return [str(i) for i in range(start, len(self.documents))]
+    
+    def delete_where(self, key: str, value: Any) -> None:
+        keep = [i for i, doc in enumerate(self.documents) if doc.metadata.get(key) != value]
+        self.documents = [self.documents[i] for i in keep]
+        self.vectors = [self.vectors[i] for i in keep]
+    
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        query_vector = self.embedding.embed_query(query)
+        scored = [
+            (doc, sum(a * b for a, b in zip(query_vector, vector)))
+            for doc, vector in zip(self.documents, self.vectors)
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+    
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+def build_fake_chat_model() -> FakeChatModel:
+    """Fake chat model configured from settings"""
+    return FakeChatModel(
+        latency_ms=settings.FAKE_LLM_LATENCY_MS,
+        latency_jitter_ms=settings.FAKE_LLM_LATENCY_JITTER_MS,
+        latency_distribution=settings.FAKE_LLM_LATENCY_DISTRIBUTION,
+        tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+        malformed_rate=settings.FAKE_LLM_MALFORMED_RATE
+    )
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import SLOW_BUCKETS, metrics
+from app.models.generation_job import GenerationJob, GenerationJobStatus
+from app.schemas.curriculum import CurriculumCreate, GenerationJobResponse
+from app.services.connection_manager import manager
+from app.services.llm_scheduler import LLMOverloadedError, Priority
+from app.services.token_quota import TokenQuotaExceededError
+
+logger = logging.getLogger(__name__)
+
+# Extra time a RUNNING job gets past its timeout before another worker assumes its worker died
+RECLAIM_GRACE_SECONDS = 60
+
+generation_jobs_total = metrics.counter(
+    "generation_jobs_total",
+    "Curriculum generation jobs by outcome (submitted, rejected, succeeded, failed, timed_out or requeued)",
+    ("outcome",)
+)
+generation_job_wait_seconds = metrics.histogram(
+    "generation_job_wait_seconds", "Time generation jobs spent queued before a worker started them", buckets=SLOW_BUCKETS
+)
+generation_job_duration_seconds = metrics.histogram(
+    "generation_job_duration_seconds", "Generation job run time by outcome", ("outcome",), SLOW_BUCKETS
+)
+
+class GenerationQueueFullError(Exception):
+    """Raised when a user already has the maximum number of unfinished generation jobs"""
+    
+    def __init__(self, message: str, retry_after: float = 30.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class GenerationJobRunner:
+    """Runs queued curriculum generation jobs on a pool of asyncio workers.
+    
+    Jobs are rows in generation_jobs, so they survive restarts and every API
+    process can run workers against the same queue: a worker claims the oldest
+    runnable job with FOR UPDATE SKIP LOCKED, and a RUNNING job whose worker
+    died is claimed again once it is well past the job timeout. Completion is
+    pushed to the user's agent WebSockets open in the process that ran the job;
+    clients on other processes see it by polling the job.
+    """
+    
+    def __init__(self, concurrency: int, poll_interval_seconds: float, timeout_seconds: float, max_attempts: int):
+        self.concurrency = concurrency
+        self.poll_interval_seconds = poll_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_attempts = max_attempts
+        
+        self.running = False
+        self.active = 0
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def agent_service(self):
+        # Imported on first use so LangChain stays out of app startup
+        from app.services.agent_service import get_agent_service
+        return get_agent_service()
+    
+    def submit(self, db: Session, user_id: int, curriculum_data: CurriculumCreate) -> GenerationJob:
+        """Queue a generation job for the user and wake a worker"""
+        unfinished = db.query(func.count(GenerationJob.id)).filter(
+            GenerationJob.user_id == user_id,
+            GenerationJob.status.in_([GenerationJobStatus.QUEUED, GenerationJobStatus.RUNNING])
+        ).scalar()
+        if unfinished >= settings.GENERATION_MAX_ACTIVE_JOBS_PER_USER:
+            generation_jobs_total.inc(outcome="rejected")
+            raise GenerationQueueFullError(
+                f"You already have {unfinished} curriculums being generated; wait for one to finish"
+            )
+        
+        job = GenerationJob(
+            user_id=user_id,
+            status=GenerationJobStatus.QUEUED,
+            title=curriculum_data.title,
+            description=curriculum_data.description
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        generation_jobs_total.inc(outcome="submitted")
+        self._wake()
+        return job
+    
+    def get_job(self, db: Session, job_id: int, user_id: int) -> Optional[GenerationJob]:
+        """Get one of the user's generation jobs"""
+        return db.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.user_id == user_id
+        ).first()
+    
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker, across all processes"""
+        db = SessionLocal()
+        try:
+            return db.query(func.count(GenerationJob.id)).filter(
+                GenerationJob.status == GenerationJobStatus.QUEUED
+            ).scalar()
+        finally:
+            db.close()
+    
+    async def start(self):
+        """Start the worker pool on the running event loop"""
+        if self.running:
+            return
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} generation workers")
+    
+    async def stop(self):
+        """Stop the workers; jobs they were running are reclaimed after the timeout"""
+        self.running = False
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Generation workers stopped")
+    
+    def _wake(self):
+        # submit runs in a threadpool worker, so hand the wakeup to the loop
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    async def _worker(self):
+        while self.running:
+            # Cleared before claiming so a job submitted meanwhile is never missed
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Error claiming generation job: {e}")
+                job = None
+            
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self.active += 1
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Error running generation job {job.id}: {e}")
+            finally:
+                self.active -= 1
+    
+    def _claim(self) -> Optional[GenerationJob]:
+        """Mark the oldest runnable job RUNNING and return it, or None if there is none"""
+        reclaim_before = func.now() - timedelta(seconds=self.timeout_seconds + RECLAIM_GRACE_SECONDS)
+        candidate = (
+            select(GenerationJob.id)
+            .where(or_(
+                and_(GenerationJob.status == GenerationJobStatus.QUEUED, GenerationJob.run_after <= func.now()),
+                and_(GenerationJob.status == GenerationJobStatus.RUNNING, GenerationJob.started_at < reclaim_before)
+            ))
+            .order_by(GenerationJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        db = SessionLocal()
+        try:
+            job = db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == candidate)
+                .values(status=GenerationJobStatus.RUNNING, attempts=GenerationJob.attempts + 1, started_at=func.now())
+                .returning(GenerationJob)
+                .execution_options(synchronize_session=False)
+            ).scalar_one_or_none()
+            # Detached before the commit would expire it; workers only read the claimed values
+            if job is not None:
+                db.expunge(job)
+            db.commit()
+            return job
+        finally:
+            db.close()
+    
+    async def _run(self, job: GenerationJob):
+        if job.attempts > self.max_attempts:
+            # Its workers kept dying (or hanging) mid-run; stop retrying it
+            self._finish(job.id, GenerationJobStatus.FAILED, error="Generation did not complete")
+            generation_jobs_total.inc(outcome="failed")
+            await self._notify(job.id)
+            return
+        
+        generation_job_wait_seconds.observe(max(0.0, (job.started_at - job.created_at).total_seconds()))
+        started = time.perf_counter()
+        db = SessionLocal()
+        # The owner's reads stay on the primary for a while after the curriculum is saved
+        db.info["user_id"] = job.user_id
+        try:
+            curriculum = await asyncio.wait_for(
+                self.agent_service.generate_curriculum(
+                    user_id=job.user_id,
+                    curriculum_data=CurriculumCreate(title=job.title, description=job.description),
+                    db=db,
+                    # Nobody is waiting on the request; leave the reserved capacity to chat
+                    priority=Priority.BACKGROUND
+                ),
+                self.timeout_seconds
+            )
+            outcome = "succeeded"
+            self._finish(job.id, GenerationJobStatus.SUCCEEDED, curriculum_id=curriculum.id)
+        except LLMOverloadedError as e:
+            # Waited LLM_MAX_BACKGROUND_WAIT_SECONDS for capacity, not the job's fault: back off without using up an attempt
+            outcome = "requeued"
+            self._requeue(job.id, e.retry_after)
+        except TokenQuotaExceededError as e:
+            outcome = "failed"
+            self._finish(job.id, GenerationJobStatus.FAILED, error=str(e))
+        except asyncio.TimeoutError:
+            outcome = "timed_out"
+            self._finish(job.id, GenerationJobStatus.FAILED, error="Generation timed out")
+        except Exception as e:
+            # Not retried: a second run would repeat the LLM spend for what is likely the same failure
+            logger.error(f"Generation job {job.id} failed: {e}")
+            outcome = "failed"
+            self._finish(job.id, GenerationJobStatus.FAILED, error=f"Failed to generate curriculum: {str(e)}")
+        finally:
+            db.close()
+        
+        generation_job_duration_seconds.observe(time.perf_counter() - started, outcome=outcome)
+        generation_jobs_total.inc(outcome=outcome)
+        if outcome != "requeued":
+            await self._notify(job.id)
+    
+    def _finish(self, job_id: int, status: GenerationJobStatus, curriculum_id: int = None, error: str = None):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .values(status=status, curriculum_id=curriculum_id, error=error, finished_at=func.now())
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    def _requeue(self, job_id: int, retry_after: float):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .values(
+                    status=GenerationJobStatus.QUEUED,
+                    attempts=GenerationJob.attempts - 1,
+                    run_after=func.now() + timedelta(seconds=retry_after)
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    async def _notify(self, job_id: int):
+        """Push the finished job to the owner's WebSockets in this process"""
+        db = SessionLocal()
+        try:
+            job = db.get(GenerationJob, job_id)
+            payload = GenerationJobResponse.model_validate(job).model_dump(mode="json")
+        finally:
+            db.close()
+        await manager.send_to_user(job.user_id, json.dumps({"type": "generation_job", "job": payload}))
+
+def _queue_depth_sample():
+    # A database hiccup must not take the rest of /metrics down with it
+    try:
+        return {(): generation_job_runner.queue_depth()}
+    except Exception as e:
+        logger.warning(f"Could not count queued generation jobs: {e}")
+        return {}
+
+# Global generation job runner instance
+generation_job_runner = GenerationJobRunner(
+    concurrency=settings.GENERATION_WORKER_CONCURRENCY,
+    poll_interval_seconds=settings.GENERATION_POLL_INTERVAL_SECONDS,
+    timeout_seconds=settings.GENERATION_JOB_TIMEOUT_SECONDS,
+    max_attempts=settings.GENERATION_MAX_ATTEMPTS
+)
+
+metrics.gauge(
+    "generation_jobs_running", "Generation jobs running in this process",
+    collect=lambda: {(): generation_job_runner.active}
+)
+metrics.gauge(
+    "generation_jobs_queued", "Generation jobs waiting for a worker across all processes",
+    collect=_queue_depth_sample
+)
\ No newline at end of file
@@ -0,0 +1,297 @@
+import asyncio
+import html
+import ipaddress
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.curriculum import ResourceType
+from app.models.link_check import LinkCheck
+
+logger = logging.getLogger(__name__)
+
+LINK_OK = "ok"
+LINK_DEAD = "dead"
+LINK_UNKNOWN = "unknown"
+
+# Answers that mean the page is not there; anything else under 400 (and auth walls) counts as alive
+DEAD_HTTP_STATUSES = {404, 410}
+MAX_REDIRECTS = 5
+# Enough of a page to find its <title>
+MAX_BODY_BYTES = 64 * 1024
+TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+USER_AGENT = "CurriculumArchitectLinkChecker/1.0"
+RESOURCE_TYPES = {resource_type.value for resource_type in ResourceType}
+
+link_checks_total = metrics.counter(
+    "link_checks_total", "Resource URL checks by source (cache or fetch) and result", ("source", "status")
+)
+link_replacements_total = metrics.counter(
+    "link_replacements_total", "Dead resource links by whether a replacement was found", ("outcome",)
+)
+
+class BlockedHostError(Exception):
+    """Raised for URLs that resolve to private, loopback or link-local addresses"""
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    return ip.is_global and not ip.is_multicast
+
+def _check_host(host: Optional[str]) -> None:
+    # Literal IPs skip the resolver, so they are checked here
+    if not host:
+        raise BlockedHostError("URL has no host")
+    if settings.LINK_CHECK_ALLOW_PRIVATE_HOSTS:
+        return
+    try:
+        public = _is_public_address(host)
+    except ValueError:
+        return  # a name; checked when it resolves
+    if not public:
+        raise BlockedHostError(f"{host} is not a public address")
+
+def _public_resolver():
+    """aiohttp resolver that refuses names resolving to non-public addresses, so generated URLs cannot reach internal services"""
+    import aiohttp
+    
+    class PublicResolver(aiohttp.ThreadedResolver):
+        async def resolve(self, host: str, port: int = 0, family: int = 0):
+            addresses = await super().resolve(host, port, family)
+            if settings.LINK_CHECK_ALLOW_PRIVATE_HOSTS:
+                return addresses
+            public = [address for address in addresses if _is_public_address(address["host"])]
+            if not public:
+                raise OSError(f"{host} does not resolve to a public address")
+            return public
+    
+    return PublicResolver()
+
+def _page_title(body: bytes) -> Optional[str]:
+    match = TITLE_RE.search(body)
+    if not match:
+        return None
+    title = " ".join(html.unescape(match.group(1).decode("utf-8", errors="replace")).split())
+    return title[:300] or None
+
+class LinkValidator:
+    """Checks resource URLs concurrently and replaces dead ones from the vector store.
+    
+    One pooled aiohttp session serves every check, capped per host so a
+    curriculum full of links to one site does not hammer it. Results go to
+    the link_checks table, so every worker shares them until they expire,
+    and concurrent checks of the same URL share one request.
+    """
+    
+    def __init__(
+        self,
+        timeout_seconds: float,
+        max_connections: int,
+        max_connections_per_host: int,
+        ttl_seconds: int,
+        retry_ttl_seconds: int
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.ttl_seconds = ttl_seconds
+        self.retry_ttl_seconds = retry_ttl_seconds
+        
+        self._session = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    def _get_session(self):
+        # Imported and built on first use, inside the event loop it will run on
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    limit_per_host=self.max_connections_per_host,
+                    ttl_dns_cache=300,
+                    resolver=_public_resolver()
+                ),
+                # Per socket operation rather than total, so time spent queued behind the per-host limit does not count
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=self.timeout_seconds,
+                    sock_read=self.timeout_seconds
+                ),
+                headers={"User-Agent": USER_AGENT}
+            )
+        return self._session
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def check_urls(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Status and metadata for each URL, from the shared cache where fresh, otherwise fetched concurrently"""
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.to_thread(self._get_cached, urls)
+        for result in results.values():
+            link_checks_total.inc(source="cache", status=result["status"])
+        
+        missing = [url for url in urls if url not in results]
+        fetched = await asyncio.gather(*(self._check_once(url) for url in missing))
+        results.update(zip(missing, fetched))
+        return results
+    
+    async def validate_resources(self, resources: List[Dict[str, Any]], vector_service=None) -> List[Dict[str, Any]]:
+        """Check generated resources (dicts with title, url, type and description) and replace dead links.
+        
+        Each resource gets a link_status. A dead link is swapped for the
+        closest vector store match whose link is alive, when there is one.
+        """
+        checks = await self.check_urls(resource["url"] for resource in resources)
+        validated = [{**resource, "link_status": checks[resource["url"]]["status"]} for resource in resources]
+        
+        dead = [i for i, resource in enumerate(validated) if resource["link_status"] == LINK_DEAD]
+        if not dead or vector_service is None:
+            return validated
+        
+        candidates = await asyncio.gather(*(self._live_candidates(validated[i], vector_service) for i in dead))
+        used = {resource["url"] for resource in validated}
+        for i, options in zip(dead, candidates):
+            replacement = next((option for option in options if option["url"] not in used), None)
+            link_replacements_total.inc(outcome="replaced" if replacement else "not_found")
+            if replacement:
+                used.add(replacement["url"])
+                validated[i] = {**validated[i], **replacement}
+        return validated
+    
+    async def _live_candidates(self, resource: Dict[str, Any], vector_service) -> List[Dict[str, Any]]:
+        """Vector store matches for a resource whose links are alive, best first"""
+        query = f"{resource['title']} {resource.get('description', '')}"
+        documents = [doc for doc in await vector_service.search(query, limit=5) if doc.metadata.get("url")]
+        if not documents:
+            return []
+        
+        checks = await self.check_urls(doc.metadata["url"] for doc in documents)
+        candidates = []
+        for doc in documents:
+            if checks[doc.metadata["url"]]["status"] != LINK_OK:
+                continue
+            candidate = {
+                "title": doc.metadata.get("title") or resource["title"],
+                "url": doc.metadata["url"],
+                "description": doc.page_content[:500],
+                "link_status": LINK_OK
+            }
+            if doc.metadata.get("resource_type") in RESOURCE_TYPES:
+                candidate["type"] = doc.metadata["resource_type"]
+            candidates.append(candidate)
+        return candidates
+    
+    async def _check_once(self, url: str) -> Dict[str, Any]:
+        """Fetch a URL, sharing the request with any concurrent check of the same URL"""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # Shielded so one caller giving up does not cancel the check for the others
+        return await asyncio.shield(task)
+    
+    async def _fetch_and_store(self, url: str) -> Dict[str, Any]:
+        result = await self._fetch(url)
+        link_checks_total.inc(source="fetch", status=result["status"])
+        try:
+            await asyncio.to_thread(self._store, url, result)
+        except Exception as e:
+            logger.warning(f"Could not cache link check for {url}: {e}")
+        return result
+    
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        import aiohttp
+        result = {"status": LINK_UNKNOWN, "http_status": None, "final_url": None, "title": None, "content_type": None}
+        session = self._get_session()
+        current = url
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                parts = urlsplit(current)
+                if parts.scheme not in ("http", "https"):
+                    result["status"] = LINK_DEAD
+                    return result
+                _check_host(parts.hostname)
+                
+                # Redirects are followed by hand so every hop's host is checked
+                async with session.get(current, allow_redirects=False) as response:
+                    if response.status in (301, 302, 303, 307, 308) and "Location" in response.headers:
+                        current = urljoin(current, response.headers["Location"])
+                        continue
+                    
+                    result["http_status"] = response.status
+                    result["final_url"] = current if current != url else None
+                    result["content_type"] = response.content_type
+                    if response.status in DEAD_HTTP_STATUSES:
+                        result["status"] = LINK_DEAD
+                    elif response.status < 400 or response.status in (401, 403):
+                        result["status"] = LINK_OK
+                        if response.content_type == "text/html":
+                            result["title"] = _page_title(await response.content.read(MAX_BODY_BYTES))
+                    # 429 and 5xx stay unknown and are retried sooner
+                    return result
+            # Too many redirects
+            result["status"] = LINK_DEAD
+        except BlockedHostError:
+            result["status"] = LINK_DEAD
+        except asyncio.TimeoutError:
+            pass
+        except aiohttp.ClientConnectorError as e:
+            # DNS failures and refused connections: nothing is serving this URL
+            result["status"] = LINK_UNKNOWN if isinstance(e, aiohttp.ClientSSLError) else LINK_DEAD
+        except (aiohttp.ClientError, ValueError) as e:
+            logger.debug(f"Link check for {url} failed: {e}")
+        return result
+    
+    def _get_cached(self, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not urls:
+            return {}
+        db = SessionLocal()
+        try:
+            rows = db.query(LinkCheck).filter(
+                LinkCheck.url.in_(urls),
+                LinkCheck.expires_at > datetime.now(timezone.utc)
+            ).all()
+            return {
+                row.url: {
+                    "status": row.status,
+                    "http_status": row.http_status,
+                    "final_url": row.final_url,
+                    "title": row.title,
+                    "content_type": row.content_type
+                }
+                for row in rows
+            }
+        finally:
+            db.close()
+    
+    def _store(self, url: str, result: Dict[str, Any]) -> None:
+        ttl = self.retry_ttl_seconds if result["status"] == LINK_UNKNOWN else self.ttl_seconds
+        now = datetime.now(timezone.utc)
+        values = {**result, "checked_at": now, "expires_at": now + timedelta(seconds=ttl)}
+        db = SessionLocal()
+        try:
+            db.execute(
+                pg_insert(LinkCheck)
+                .values(url=url, **values)
+                .on_conflict_do_update(index_elements=[LinkCheck.url], set_=values)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+# Global link validator instance
+link_validator = LinkValidator(
+    timeout_seconds=settings.LINK_CHECK_TIMEOUT_SECONDS,
+    max_connections=settings.LINK_CHECK_MAX_CONNECTIONS,
+    max_connections_per_host=settings.LINK_CHECK_MAX_CONNECTIONS_PER_HOST,
+    ttl_seconds=settings.LINK_CHECK_TTL_SECONDS,
+    retry_ttl_seconds=settings.LINK_CHECK_RETRY_TTL_SECONDS
+)
\ No newline at end of file
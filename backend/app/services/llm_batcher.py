@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.metrics import COUNT_BUCKETS, metrics
+
+logger = logging.getLogger(__name__)
+
+llm_batch_requests_total = metrics.counter(
+    "llm_batch_requests_total", "LLM calls through the micro-batching dispatcher by provider and outcome", ("provider", "outcome")
+)
+llm_batch_size = metrics.histogram(
+    "llm_batch_size", "Calls per micro-batch sent to a provider", ("provider",), COUNT_BUCKETS
+)
+llm_batch_queue_wait_seconds = metrics.histogram(
+    "llm_batch_queue_wait_seconds", "Time LLM calls waited for their micro-batch to be sent", ("provider",)
+)
+
+@dataclass
+class BatcherMetrics:
+    """This dispatcher's own totals, for benchmarks; /metrics has the same by provider"""
+    requests: int = 0
+    batches: int = 0
+    failed_requests: int = 0
+    max_batch_size_seen: int = 0
+    total_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+    total_dispatch_time: float = 0.0
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_requests": self.failed_requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_batch_size_seen,
+            "avg_queue_wait_ms": round(self.total_queue_wait / self.requests * 1000, 3) if self.requests else 0,
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+            "avg_dispatch_ms": round(self.total_dispatch_time / self.batches * 1000, 3) if self.batches else 0
+        }
+
+class LLMBatcher:
+    """Micro-batching dispatcher in front of a chat model.
+    
+    Requests are collected for up to window_ms (or until max_batch_size is
+    reached) and sent together through the model's abatch path, which shares
+    the model's pooled HTTP client. Each caller awaits its own future.
+    Calls that pass a schema go to the model bound to call a tool with that
+    schema's arguments, batched with other calls for the same schema.
+    """
+    
+    def __init__(
+        self,
+        llm,
+        window_ms: float = 0,
+        max_batch_size: int = 16,
+        max_concurrency: Optional[int] = None,
+        provider: str = ""
+    ):
+        self.llm = llm
+        self.provider = provider
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_concurrency = max_concurrency
+        self.metrics = BatcherMetrics()
+        
+        self._pending: List[Tuple[Any, asyncio.Future, float, Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._structured: Dict[type, Any] = {}
+    
+    def _runnable(self, schema: Optional[type]) -> Any:
+        """The chat model, bound to call a function taking schema's fields when there is a schema"""
+        if schema is None:
+            return self.llm
+        if schema not in self._structured:
+            try:
+                self._structured[schema] = self.llm.bind_functions([schema], function_call=schema.__name__)
+            except (AttributeError, NotImplementedError, TypeError, ValueError) as e:
+                # E.g. Gemini; the caller parses (and repairs) JSON from the reply text instead
+                logger.info(f"{type(self.llm).__name__} cannot be made to call functions, asking for plain JSON: {e}")
+                self._structured[schema] = self.llm
+        return self._structured[schema]
+    
+    async def ainvoke(self, input: Any, schema: Optional[type] = None) -> Any:
+        """Queue a prompt for the next batch and wait for its result"""
+        runnable = self._runnable(schema)
+        if self.window <= 0 or self.max_batch_size == 1:
+            # Batching disabled: call straight through
+            self.metrics.requests += 1
+            try:
+                result = await runnable.ainvoke(input)
+            except Exception:
+                self.metrics.failed_requests += 1
+                llm_batch_requests_total.inc(provider=self.provider, outcome="failed")
+                raise
+            llm_batch_requests_total.inc(provider=self.provider, outcome="ok")
+            return result
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((input, future, time.perf_counter(), runnable))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            # More than one batch worth queued up; schedule the remainder right away
+            self._timer = asyncio.get_running_loop().call_soon(self._flush)
+        if not batch:
+            return
+        
+        task = asyncio.create_task(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future, float, Any]]) -> None:
+        started = time.perf_counter()
+        # Callers that gave up while queued do not need a provider call
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+        
+        for _, _, queued_at, _ in batch:
+            wait = started - queued_at
+            self.metrics.total_queue_wait += wait
+            self.metrics.max_queue_wait = max(self.metrics.max_queue_wait, wait)
+            llm_batch_queue_wait_seconds.observe(wait, provider=self.provider)
+        llm_batch_size.observe(len(batch), provider=self.provider)
+        self.metrics.requests += len(batch)
+        self.metrics.batches += 1
+        self.metrics.max_batch_size_seen = max(self.metrics.max_batch_size_seen, len(batch))
+        
+        # One abatch per bound model; almost always there is only the one
+        groups: Dict[int, List[Tuple[Any, asyncio.Future, float, Any]]] = {}
+        for item in batch:
+            groups.setdefault(id(item[3]), []).append(item)
+        config = {"max_concurrency": self.max_concurrency} if self.max_concurrency else None
+        
+        async def run(items):
+            try:
+                return await items[0][3].abatch([item[0] for item in items], config=config, return_exceptions=True)
+            except Exception as e:
+                logger.error(f"LLM batch of {len(items)} failed: {e}")
+                return [e] * len(items)
+        
+        try:
+            grouped_results = await asyncio.gather(*(run(items) for items in groups.values()))
+        finally:
+            self.metrics.total_dispatch_time += time.perf_counter() - started
+        
+        for items, results in zip(groups.values(), grouped_results):
+            for (_, future, _, _), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    self.metrics.failed_requests += 1
+                    llm_batch_requests_total.inc(provider=self.provider, outcome="failed")
+                    future.set_exception(result)
+                else:
+                    llm_batch_requests_total.inc(provider=self.provider, outcome="ok")
+                    future.set_result(result)
\ No newline at end of file
@@ -0,0 +1,73 @@
+from app.core.config import settings
+from app.services.llm_batcher import LLMBatcher
+from app.services.llm_router import LLMRouter
+from typing import Dict, Optional
+
+# Shared across AgentService instances so HTTP connections are pooled and reused
+_chat_models: Dict[str, object] = {}
+_llm_batchers: Dict[str, LLMBatcher] = {}
+_llm_router: Optional[LLMRouter] = None
+
+def _build_chat_model(provider: str):
+    if provider == "fake":
+        from app.services.fake_providers import build_fake_chat_model
+        return build_fake_chat_model()
+    # Provider SDKs are slow to import, so only the ones in use are loaded
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model="gemini-pro",
+            temperature=0.7,
+            google_api_key=settings.GEMINI_API_KEY
+        )
+    # Default to OpenAI
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model="gpt-4",
+        temperature=0.7,
+        api_key=settings.OPENAI_API_KEY
+    )
+
+def get_chat_model(provider: str = None):
+    """Get the shared chat model for a provider (the configured AI provider by default)"""
+    provider = (provider or settings.AI_PROVIDER).lower()
+    if provider not in _chat_models:
+        _chat_models[provider] = _build_chat_model(provider)
+    return _chat_models[provider]
+
+def get_llm_batcher(provider: str = None) -> LLMBatcher:
+    """Get the shared micro-batching dispatcher in front of a provider's chat model"""
+    provider = (provider or settings.AI_PROVIDER).lower()
+    if provider not in _llm_batchers:
+        _llm_batchers[provider] = LLMBatcher(
+            get_chat_model(provider),
+            window_ms=settings.LLM_BATCH_WINDOW_MS,
+            max_batch_size=settings.LLM_BATCH_MAX_SIZE,
+            max_concurrency=settings.LLM_BATCH_MAX_CONCURRENCY,
+            provider=provider
+        )
+    return _llm_batchers[provider]
+
+def configured_providers():
+    """Providers to route between, the configured AI provider first"""
+    primary = settings.AI_PROVIDER.lower()
+    providers = [primary]
+    # Never fail over from the offline fake provider to a paid one
+    if settings.LLM_FAILOVER_ENABLED and primary != "fake":
+        api_keys = {"openai": settings.OPENAI_API_KEY, "gemini": settings.GEMINI_API_KEY}
+        providers += [name for name, key in api_keys.items() if key and name != primary]
+    return providers
+
+def get_llm_router() -> LLMRouter:
+    """Get the shared multi-provider router"""
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter(
+            {provider: get_llm_batcher(provider) for provider in configured_providers()},
+            hedge_quantile=settings.LLM_HEDGE_QUANTILE,
+            hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+            hedge_default_delay=settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS,
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_CIRCUIT_RESET_SECONDS
+        )
+    return _llm_router
@@ -0,0 +1,261 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from app.services.llm_scheduler import LLMOverloadedError
+
+logger = logging.getLogger(__name__)
+
+# Wraps each provider call, e.g. to run it through the LLM scheduler
+Dispatch = Callable[[str, Callable[[], Awaitable[Any]]], Awaitable[Any]]
+
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0]
+
+async def _direct(provider: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    return await call()
+
+class LatencyHistogram:
+    """Cumulative bucketed latencies plus a rolling window for quantiles"""
+    
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS, window: int = 500):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+    
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class ProviderUnavailableError(Exception):
+    """A provider's circuit closed to new calls between routing and sending"""
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one trial call through after a cooldown.
+    
+    Routing only asks whether a provider is available; the trial is taken
+    when a call is actually sent, and given back if that call is cancelled
+    before it has an outcome, so a fallback that is never called or a hedge
+    that loses cannot leave the circuit half-open for good.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+    
+    def available(self) -> bool:
+        """Whether a call could be sent now; changes nothing"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return self.state == self.CLOSED
+    
+    def acquire(self, force: bool = False) -> bool:
+        """Claim the right to send a call, taking the trial if the cooldown has passed"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            return True
+        return self.state == self.CLOSED or force
+    
+    def release(self) -> None:
+        """Give back a trial whose call ended without an outcome"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+    
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+    
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit opened for LLM provider {self.name}")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+class LLMRouter:
+    """Routes LLM calls across providers with hedging and failover.
+    
+    The first healthy provider in order is the primary. If it has not answered
+    within its recent latency quantile for the kind of call, a hedged request
+    goes to the next provider and whichever answers first wins; the other is
+    cancelled. A provider that errors triggers immediate failover, and repeated
+    errors trip its circuit breaker so it is skipped until the cooldown ends.
+    """
+    
+    def __init__(
+        self,
+        providers: Dict[str, Any],
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 1.0,
+        hedge_default_delay: float = 15.0,
+        hedge_min_samples: int = 20,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        # Insertion order is preference order; values expose ainvoke(input) and ainvoke(input, schema=...)
+        self.providers = providers
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_samples = hedge_min_samples
+        
+        self.breakers = {name: CircuitBreaker(name, failure_threshold, reset_timeout) for name in providers}
+        self.histograms = {name: LatencyHistogram() for name in providers}
+        # Hedge thresholds are tracked per kind of call; a curriculum is much slower than a chat reply
+        self._kind_latencies: Dict[Tuple[str, str], LatencyHistogram] = {}
+        
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+    
+    async def ainvoke(
+        self,
+        input: Any,
+        kind: str = "default",
+        hedge: bool = True,
+        dispatch: Dispatch = None,
+        schema: Optional[type] = None
+    ) -> Any:
+        """Invoke the preferred healthy provider, hedging and failing over as needed"""
+        dispatch = dispatch or _direct
+        order = [name for name in self.providers if self.breakers[name].available()]
+        force = not order
+        if force:
+            # Every circuit is open; trying the primary beats failing outright
+            order = list(self.providers)[:1]
+        remaining = order[1:]
+        
+        tasks: Dict[asyncio.Task, str] = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+        
+        def launch(name: str) -> None:
+            task = asyncio.create_task(self._call(name, input, kind, dispatch, schema, force))
+            tasks[task] = name
+        
+        launch(order[0])
+        try:
+            while tasks:
+                timeout = None
+                if hedge and remaining and not hedged and len(tasks) == 1:
+                    timeout = self.hedge_delay(next(iter(tasks.values())), kind)
+                
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than usual; race it against the next provider
+                    hedged = True
+                    self.hedges += 1
+                    launch(remaining.pop(0))
+                    continue
+                
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if hedged and name != order[0]:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"LLM provider {name} failed: {last_error}")
+                
+                if not tasks and remaining:
+                    self.failovers += 1
+                    launch(remaining.pop(0))
+            raise last_error
+        finally:
+            # Cancel the loser (or anything still running if the caller was cancelled)
+            for task in tasks:
+                task.cancel()
+    
+    def hedge_delay(self, provider: str, kind: str) -> float:
+        """How long to wait for a provider before sending a hedged request"""
+        latencies = self._kind_latencies.get((provider, kind))
+        if latencies is None or len(latencies.recent) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, latencies.quantile(self.hedge_quantile))
+    
+    async def _call(
+        self,
+        name: str,
+        input: Any,
+        kind: str,
+        dispatch: Dispatch,
+        schema: Optional[type] = None,
+        force: bool = False
+    ) -> Any:
+        breaker = self.breakers[name]
+        provider = self.providers[name]
+        sent = False
+        
+        async def invoke():
+            nonlocal sent
+            # Checked when the scheduler lets the call go, not when it was routed
+            if not breaker.acquire(force):
+                raise ProviderUnavailableError(f"Circuit open for LLM provider {name}")
+            sent = True
+            started = time.monotonic()
+            try:
+                # Each provider enforces the schema its own way (or not at all)
+                result = await (provider.ainvoke(input) if schema is None else provider.ainvoke(input, schema=schema))
+            except asyncio.CancelledError:
+                # A cancelled loser took at least this long; keep the quantile honest
+                self._observe(name, kind, time.monotonic() - started)
+                raise
+            self._observe(name, kind, time.monotonic() - started)
+            return result
+        
+        try:
+            result = await dispatch(name, invoke)
+        except (asyncio.CancelledError, LLMOverloadedError, ProviderUnavailableError):
+            # Local admission control and cancelled calls say nothing about provider health
+            if sent:
+                breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+    
+    def _observe(self, name: str, kind: str, seconds: float) -> None:
+        self.histograms[name].observe(seconds)
+        self._kind_latencies.setdefault((name, kind), LatencyHistogram()).observe(seconds)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-provider circuit state and latency histogram, plus hedging counters"""
+        providers = {}
+        for name, histogram in self.histograms.items():
+            providers[name] = {
+                "circuit": self.breakers[name].state,
+                "count": histogram.count,
+                "sum_seconds": round(histogram.sum, 3),
+                "buckets": dict(zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts)),
+                "p50_seconds": histogram.quantile(0.5),
+                "p95_seconds": histogram.quantile(0.95),
+                "p99_seconds": histogram.quantile(0.99)
+            }
+        return {
+            "providers": providers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers
+        }
@@ -0,0 +1,318 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tokens import usage_from_response
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0  # user-facing requests (/agent/chat)
+    BACKGROUND = 1  # curriculum generation jobs, notification batches, summarization and other deferred work
+
+class LLMOverloadedError(Exception):
+    """Raised when an interactive LLM call is rejected by admission control"""
+    
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute (0 means unlimited)"""
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def time_until(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until amount is available while keeping reserve (a fraction of capacity) untouched"""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        needed = amount + reserve * self.capacity - self.tokens
+        return max(0.0, needed / self.rate)
+    
+    def largest(self, reserve: float = 0.0) -> float:
+        """The most one call can take while keeping reserve untouched; time_until is finite up to this"""
+        return float("inf") if self.unlimited else self.capacity * (1 - reserve)
+    
+    def consume(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        self._refill()
+        # May go negative to account for usage beyond the estimate
+        self.tokens -= amount
+    
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider answered 429"""
+        if not self.unlimited:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+@dataclass
+class PriorityMetrics:
+    admitted: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+class _ProviderLimits:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+    
+    def time_until(self, tokens: int, reserve: float, requests: float = 1) -> float:
+        return max(self.requests.time_until(requests, reserve), self.tokens.time_until(tokens, reserve))
+    
+    def consume(self, tokens: int) -> None:
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+
+class LLMScheduler:
+    """Central admission, prioritization and rate limiting for LLM calls.
+    
+    Each provider has request and token buckets. Waiting calls are granted in
+    priority order, and background calls may not dip into the reserved share
+    of the buckets, so a notification batch cannot starve interactive users.
+    Interactive calls are rejected up front (LLMOverloadedError) when their
+    predicted wait exceeds the configured maximum. Background calls queue
+    longer, but give up with LLMOverloadedError after max_background_wait
+    (0 waits indefinitely) so their callers can back off. Calls that fail with a
+    provider 429 drain the buckets and are retried with exponential backoff.
+    """
+    
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]],
+        default_limits: Tuple[int, int],
+        background_reserve: float = 0.2,
+        max_interactive_wait: float = 10.0,
+        max_interactive_queue: int = 200,
+        max_background_wait: float = 0,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0
+    ):
+        self.limits = limits
+        self.default_limits = default_limits
+        self.background_reserve = background_reserve
+        self.max_interactive_wait = max_interactive_wait
+        self.max_interactive_queue = max_interactive_queue
+        self.max_background_wait = max_background_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        
+        self._providers: Dict[str, _ProviderLimits] = {}
+        self._queues: Dict[str, List[_Waiter]] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._dispatchers: Dict[str, asyncio.Task] = {}
+        self._seq = itertools.count()
+        
+        self.metrics = {priority: PriorityMetrics() for priority in Priority}
+        self.rate_limited = 0
+        self.retries = 0
+    
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.INTERACTIVE,
+        estimated_tokens: int = 0,
+        provider: str = "default"
+    ) -> T:
+        """Run an LLM call once the provider's limits admit it, retrying on 429"""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(provider, priority, estimated_tokens)
+            try:
+                result = await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.rate_limited += 1
+                self.retries += 1
+                limits = self._get_limits(provider)
+                limits.requests.drain()
+                limits.tokens.drain()
+                delay = retry_after_seconds(e) or self.retry_backoff * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"LLM provider {provider} rate limited, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            # Settle the difference between the estimate and the reported usage
+            actual = usage_from_response(result)
+            if actual is not None:
+                self._get_limits(provider).tokens.consume(actual - estimated_tokens)
+            return result
+    
+    def _get_limits(self, provider: str) -> _ProviderLimits:
+        limits = self._providers.get(provider)
+        if limits is None:
+            requests_per_minute, tokens_per_minute = self.limits.get(provider, self.default_limits)
+            limits = _ProviderLimits(requests_per_minute, tokens_per_minute)
+            self._providers[provider] = limits
+        return limits
+    
+    async def _acquire(self, provider: str, priority: Priority, tokens: int) -> None:
+        limits = self._get_limits(provider)
+        queue = self._queues.setdefault(provider, [])
+        stats = self.metrics[priority]
+        # A call larger than the share of the bucket its priority may use could never be granted
+        reserve = self.background_reserve if priority == Priority.BACKGROUND else 0.0
+        largest = limits.tokens.largest(reserve)
+        if tokens > largest:
+            tokens = int(largest)
+        
+        timeout = None
+        if priority == Priority.INTERACTIVE:
+            ahead = [w for w in queue if w.priority <= priority and not w.future.done()]
+            predicted_wait = limits.time_until(tokens + sum(w.tokens for w in ahead), 0.0, requests=len(ahead) + 1)
+            if len(ahead) >= self.max_interactive_queue or predicted_wait > self.max_interactive_wait:
+                stats.rejected += 1
+                raise LLMOverloadedError(
+                    "LLM capacity exhausted, please retry shortly",
+                    retry_after=max(1.0, predicted_wait)
+                )
+            timeout = self.max_interactive_wait
+        elif self.max_background_wait > 0:
+            timeout = self.max_background_wait
+        
+        waiter = _Waiter(
+            priority=int(priority),
+            seq=next(self._seq),
+            tokens=tokens,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic()
+        )
+        heapq.heappush(queue, waiter)
+        self._wake(provider)
+        
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            stats.rejected += 1
+            raise LLMOverloadedError(
+                "Timed out waiting for LLM capacity",
+                retry_after=max(1.0, limits.time_until(tokens, reserve))
+            )
+        
+        wait = time.monotonic() - waiter.enqueued_at
+        stats.admitted += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+    
+    def _wake(self, provider: str) -> None:
+        wakeup = self._wakeups.setdefault(provider, asyncio.Event())
+        wakeup.set()
+        dispatcher = self._dispatchers.get(provider)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[provider] = asyncio.create_task(self._dispatch(provider))
+    
+    async def _dispatch(self, provider: str) -> None:
+        """Grant queued calls in priority order as the provider's buckets allow"""
+        limits = self._get_limits(provider)
+        queue = self._queues[provider]
+        wakeup = self._wakeups[provider]
+        while queue:
+            waiter = queue[0]
+            if waiter.future.done():
+                # Timed out or cancelled while queued
+                heapq.heappop(queue)
+                continue
+            
+            reserve = self.background_reserve if waiter.priority == Priority.BACKGROUND else 0.0
+            # Same for a request bucket smaller than one call plus the reserve
+            wait = limits.time_until(waiter.tokens, reserve, requests=min(1, limits.requests.largest(reserve)))
+            if wait <= 0:
+                heapq.heappop(queue)
+                limits.consume(waiter.tokens)
+                waiter.future.set_result(None)
+                continue
+            
+            # Sleep until capacity refills or a new (possibly higher priority) call arrives
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depth, wait time and rejection metrics per priority class"""
+        result: Dict[str, Any] = {"rate_limited": self.rate_limited, "retries": self.retries}
+        for priority, stats in self.metrics.items():
+            depth = sum(
+                1 for queue in self._queues.values() for w in queue
+                if w.priority == priority and not w.future.done()
+            )
+            result[priority.name.lower()] = {
+                "queue_depth": depth,
+                "admitted": stats.admitted,
+                "rejected": stats.rejected,
+                "avg_wait_ms": round(stats.total_wait / stats.admitted * 1000, 2) if stats.admitted else 0,
+                "max_wait_ms": round(stats.max_wait * 1000, 2)
+            }
+        return result
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an exception raised by a provider client is an HTTP 429"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    # openai.RateLimitError, google.api_core.exceptions.ResourceExhausted
+    return type(error).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The provider's Retry-After hint, if present"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+# Global LLM scheduler instance
+llm_scheduler = LLMScheduler(
+    limits={
+        "openai": (settings.OPENAI_REQUESTS_PER_MINUTE, settings.OPENAI_TOKENS_PER_MINUTE),
+        "gemini": (settings.GEMINI_REQUESTS_PER_MINUTE, settings.GEMINI_TOKENS_PER_MINUTE),
+        "fake": (0, 0)
+    },
+    default_limits=(settings.OPENAI_REQUESTS_PER_MINUTE, settings.OPENAI_TOKENS_PER_MINUTE),
+    background_reserve=settings.LLM_BACKGROUND_RESERVE,
+    max_interactive_wait=settings.LLM_MAX_INTERACTIVE_WAIT_SECONDS,
+    max_interactive_queue=settings.LLM_MAX_INTERACTIVE_QUEUE,
+    max_background_wait=settings.LLM_MAX_BACKGROUND_WAIT_SECONDS,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_backoff=settings.LLM_RETRY_BACKOFF_SECONDS
+)
+
+
+metrics.gauge(
+    "llm_scheduler_queue_depth", "LLM calls waiting for rate-limit capacity", ("priority",),
+    collect=lambda: {(priority.name.lower(),): llm_scheduler.snapshot()[priority.name.lower()]["queue_depth"] for priority in Priority}
+)
\ No newline at end of file
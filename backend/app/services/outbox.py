@@ -0,0 +1,389 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import case, cast, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import SLOW_BUCKETS, metrics
+from app.models.outbox import OutboxChannel, OutboxMessage, OutboxStatus
+from app.services.email_service import email_client
+from app.services.push_service import send_push
+
+logger = logging.getLogger(__name__)
+
+# (idempotency key, payload, user id) of a notification to queue
+QueuedMessage = Tuple[str, Dict[str, Any], Optional[int]]
+
+# How often each process looks for SENDING messages whose worker died
+RECLAIM_INTERVAL_SECONDS = 30
+# Rows per DELETE when purging sent messages
+PURGE_CHUNK_SIZE = 10000
+
+outbox_messages_total = metrics.counter(
+    "outbox_messages_total", "Outbox deliveries by channel and outcome (sent, retried or dead)", ("channel", "outcome")
+)
+outbox_delivery_seconds = metrics.histogram(
+    "outbox_delivery_seconds", "Time from queueing a notification to its delivery", ("channel",), SLOW_BUCKETS
+)
+
+def email_payload(to: str, subject: str, body: str, substitutions: Dict[str, str] = None) -> Dict[str, Any]:
+    return {"to": to, "subject": subject, "body": body, "substitutions": substitutions or {}}
+
+def push_payload(token: str, title: str, body: str, data: Dict[str, str] = None) -> Dict[str, Any]:
+    return {"token": token, "title": title, "body": body, "data": data}
+
+def enqueue(db: Session, channel: OutboxChannel, idempotency_key: str, payload: Dict[str, Any], user_id: int = None) -> bool:
+    """Queue a notification in the caller's transaction; False if its key was queued before"""
+    return enqueue_many(db, channel, [(idempotency_key, payload, user_id)]) == 1
+
+def enqueue_many(db: Session, channel: OutboxChannel, messages: List[QueuedMessage]) -> int:
+    """Queue notifications in the caller's transaction and return how many were new"""
+    if not messages:
+        return 0
+    rows = [
+        {"channel": channel, "idempotency_key": key, "payload": payload, "user_id": user_id, "status": OutboxStatus.PENDING}
+        for key, payload, user_id in messages
+    ]
+    # Sent as multi-row INSERTs; RETURNING counts the rows that were not already queued
+    return len(db.execute(
+        pg_insert(OutboxMessage)
+        .on_conflict_do_nothing(index_elements=[OutboxMessage.idempotency_key])
+        .returning(OutboxMessage.id),
+        rows
+    ).all())
+
+def enqueue_batch(channel: OutboxChannel, messages: List[QueuedMessage]) -> int:
+    """Queue notifications in a transaction of their own and wake this process's workers"""
+    db = SessionLocal()
+    try:
+        queued = enqueue_many(db, channel, messages)
+        db.commit()
+    finally:
+        db.close()
+    outbox_dispatcher.wake()
+    return queued
+
+class OutboxDispatcher:
+    """Delivers the notifications queued in notification_outbox on a pool of asyncio workers.
+    
+    Producers write messages in the same transaction as whatever triggered
+    them, and a message's idempotency key keeps a rerun from queueing it
+    twice. Each worker claims a batch of due messages with FOR UPDATE SKIP
+    LOCKED, so workers in every process drain the queue together, and sends
+    it through the bulk email and push clients. Failed messages are retried
+    with exponential backoff and jitter, then dead-lettered after
+    max_attempts; addresses and tokens the provider rejects are dead-lettered
+    at once. Delivery is at least once: a batch whose worker died mid-send is
+    claimed again after claim_timeout_seconds.
+    """
+    
+    def __init__(
+        self,
+        concurrency: int,
+        batch_size: int,
+        poll_interval_seconds: float,
+        claim_timeout_seconds: float,
+        max_attempts: int,
+        retry_backoff_seconds: float
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        
+        self.running = False
+        self.active = 0
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_reclaim = 0.0
+    
+    async def start(self):
+        """Start the worker pool on the running event loop"""
+        if self.running:
+            return
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} outbox workers")
+    
+    async def stop(self):
+        """Stop the workers; batches they were sending are claimed again after the timeout"""
+        self.running = False
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Outbox workers stopped")
+    
+    def wake(self):
+        """Have idle workers look for messages now; call once the messages are committed"""
+        # Producers run in threadpool workers, so hand the wakeup to the loop
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    async def drain(self) -> int:
+        """Deliver every message that is due with concurrency workers, and return how many were claimed"""
+        claimed = 0
+        
+        async def worker():
+            nonlocal claimed
+            while True:
+                count = await self.dispatch_batch()
+                if not count:
+                    return
+                claimed += count
+        
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return claimed
+    
+    async def dispatch_batch(self) -> int:
+        """Claim a batch of due messages, deliver it and record the outcomes; returns how many were claimed"""
+        messages = await asyncio.to_thread(self._claim)
+        if not messages:
+            return 0
+        
+        self.active += 1
+        try:
+            groups = defaultdict(list)
+            for message in messages:
+                groups[self._group_key(message)].append(message)
+            results = await asyncio.gather(*(self._send_group(group) for group in groups.values()), return_exceptions=True)
+            
+            outcomes = []
+            for group, result in zip(groups.values(), results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error sending {len(group)} outbox messages: {result}")
+                    result = [("retry", f"Delivery error: {result}")] * len(group)
+                outcomes.extend((message, outcome, error) for message, (outcome, error) in zip(group, result))
+            await asyncio.to_thread(self._record, outcomes)
+        finally:
+            self.active -= 1
+        return len(messages)
+    
+    async def _worker(self):
+        while self.running:
+            # Cleared before claiming so a message queued meanwhile is never missed
+            self._wakeup.clear()
+            try:
+                claimed = await self.dispatch_batch()
+            except Exception as e:
+                logger.error(f"Error delivering outbox messages: {e}")
+                claimed = 0
+            
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+    
+    def _claim(self) -> List[OutboxMessage]:
+        """Mark up to batch_size due messages SENDING and return them"""
+        db = SessionLocal()
+        try:
+            if time.monotonic() - self._last_reclaim > RECLAIM_INTERVAL_SECONDS:
+                self._last_reclaim = time.monotonic()
+                self._reclaim(db)
+            
+            due = (
+                select(OutboxMessage.id)
+                .where(OutboxMessage.status == OutboxStatus.PENDING, OutboxMessage.available_at <= func.now())
+                .order_by(OutboxMessage.available_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages = db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(due))
+                .values(status=OutboxStatus.SENDING, attempts=OutboxMessage.attempts + 1, locked_at=func.now())
+                .returning(OutboxMessage)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            # Detached before the commit would expire them; workers only read the claimed values
+            for message in messages:
+                db.expunge(message)
+            db.commit()
+            return messages
+        finally:
+            db.close()
+    
+    def _reclaim(self, db: Session):
+        """Requeue SENDING messages whose worker died, or dead-letter them once out of attempts"""
+        reclaimed = db.execute(
+            update(OutboxMessage)
+            .where(
+                OutboxMessage.status == OutboxStatus.SENDING,
+                OutboxMessage.locked_at < func.now() - timedelta(seconds=self.claim_timeout_seconds)
+            )
+            .values(status=self._status_after_failure(), locked_at=None, last_error="Delivery did not finish")
+        ).rowcount
+        db.commit()
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} outbox messages from workers that did not finish them")
+    
+    def _status_after_failure(self):
+        status_type = OutboxMessage.status.type
+        return cast(case(
+            (OutboxMessage.attempts >= self.max_attempts, literal(OutboxStatus.DEAD, status_type)),
+            else_=literal(OutboxStatus.PENDING, status_type)
+        ), status_type)
+    
+    @staticmethod
+    def _group_key(message: OutboxMessage) -> Tuple:
+        # Messages with the same content go out in one bulk call
+        payload = message.payload
+        if message.channel == OutboxChannel.EMAIL:
+            return message.channel, payload["subject"], payload["body"]
+        return message.channel, payload["title"], payload["body"], json.dumps(payload.get("data"), sort_keys=True)
+    
+    async def _send_group(self, group: List[OutboxMessage]) -> List[Tuple[str, Optional[str]]]:
+        """Outcome (sent, retry or dead) and error for each message of one content"""
+        payload = group[0].payload
+        if group[0].channel == OutboxChannel.EMAIL:
+            report = await email_client.send_bulk(
+                payload["subject"], payload["body"], [(m.payload["to"], m.payload["substitutions"]) for m in group]
+            )
+            recipients = [m.payload["to"] for m in group]
+            rejected, failed = set(report.rejected_emails), set(report.failed_emails)
+            rejected_error, failed_error = "Address rejected by the email provider", "Email delivery failed"
+        else:
+            # Also deletes the device tokens FCM rejected
+            report = await send_push([m.payload["token"] for m in group], payload["title"], payload["body"], payload.get("data"))
+            recipients = [m.payload["token"] for m in group]
+            rejected, failed = set(report.invalid_tokens), set(report.failed_tokens)
+            rejected_error, failed_error = "Device token is no longer registered", "Push delivery failed"
+        
+        outcomes = []
+        for recipient in recipients:
+            if recipient in rejected:
+                outcomes.append(("dead", rejected_error))
+            elif recipient in failed:
+                outcomes.append(("retry", failed_error))
+            else:
+                outcomes.append(("sent", None))
+        return outcomes
+    
+    def _record(self, outcomes: List[Tuple[OutboxMessage, str, Optional[str]]]):
+        """Mark messages sent, back off the ones to retry and dead-letter the rest"""
+        ids = defaultdict(list)
+        for message, outcome, error in outcomes:
+            ids[outcome, error].append(message.id)
+        # Messages reclaimed by another worker after a timeout are that worker's to record now
+        claimed_at = outcomes[0][0].locked_at
+        
+        # Doubles with every attempt, with jitter so a failed batch does not come back all at once
+        backoff = timedelta(seconds=self.retry_backoff_seconds) * func.power(2, OutboxMessage.attempts - 1) * (0.5 + func.random())
+        db = SessionLocal()
+        try:
+            for (outcome, error), message_ids in ids.items():
+                if outcome == "sent":
+                    values = {"status": OutboxStatus.SENT, "sent_at": func.now()}
+                elif outcome == "dead":
+                    values = {"status": OutboxStatus.DEAD}
+                else:
+                    values = {"status": self._status_after_failure(), "available_at": func.now() + backoff}
+                db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(message_ids), OutboxMessage.locked_at == claimed_at)
+                    .values(locked_at=None, last_error=error, **values)
+                )
+            db.commit()
+        finally:
+            db.close()
+        
+        now = datetime.now(timezone.utc)
+        for message, outcome, _ in outcomes:
+            channel = message.channel.value
+            if outcome == "sent":
+                outbox_delivery_seconds.observe((now - message.created_at).total_seconds(), channel=channel)
+            elif outcome == "retry" and message.attempts >= self.max_attempts:
+                outcome = "dead"
+            outbox_messages_total.inc(channel=channel, outcome="retried" if outcome == "retry" else outcome)
+    
+    def purge_sent(self, retention_days: int) -> int:
+        """Delete sent messages older than the retention period, in chunks; dead letters are kept"""
+        purged = 0
+        db = SessionLocal()
+        try:
+            while True:
+                old = (
+                    select(OutboxMessage.id)
+                    .where(
+                        OutboxMessage.status == OutboxStatus.SENT,
+                        OutboxMessage.sent_at < func.now() - timedelta(days=retention_days)
+                    )
+                    .limit(PURGE_CHUNK_SIZE)
+                )
+                deleted = db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(old))).rowcount
+                db.commit()
+                purged += deleted
+                if deleted < PURGE_CHUNK_SIZE:
+                    return purged
+        finally:
+            db.close()
+    
+    def requeue_dead(self, channel: OutboxChannel = None) -> int:
+        """Send dead-lettered messages again, e.g. after fixing provider credentials"""
+        db = SessionLocal()
+        try:
+            query = update(OutboxMessage).where(OutboxMessage.status == OutboxStatus.DEAD)
+            if channel is not None:
+                query = query.where(OutboxMessage.channel == channel)
+            requeued = db.execute(
+                query.values(status=OutboxStatus.PENDING, attempts=0, available_at=func.now(), last_error=None)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        self.wake()
+        return requeued
+    
+    def count_unsent(self) -> Dict[str, int]:
+        """Messages not yet sent by status, across all processes"""
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(OutboxMessage.status, func.count(OutboxMessage.id))
+                .where(OutboxMessage.status != OutboxStatus.SENT)
+                .group_by(OutboxMessage.status)
+            ).all()
+            return {status.value: count for status, count in rows}
+        finally:
+            db.close()
+
+def _unsent_sample():
+    # A database hiccup must not take the rest of /metrics down with it
+    try:
+        counts = outbox_dispatcher.count_unsent()
+    except Exception as e:
+        logger.warning(f"Could not count outbox messages: {e}")
+        return {}
+    return {(status.value,): counts.get(status.value, 0) for status in OutboxStatus if status != OutboxStatus.SENT}
+
+# Global outbox dispatcher instance
+outbox_dispatcher = OutboxDispatcher(
+    concurrency=settings.OUTBOX_WORKER_CONCURRENCY,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval_seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    claim_timeout_seconds=settings.OUTBOX_CLAIM_TIMEOUT_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retry_backoff_seconds=settings.OUTBOX_RETRY_BACKOFF_SECONDS
+)
+
+metrics.gauge(
+    "outbox_batches_active", "Outbox batches being delivered in this process",
+    collect=lambda: {(): outbox_dispatcher.active}
+)
+metrics.gauge(
+    "outbox_messages_unsent", "Outbox messages not yet sent by status (pending, sending or dead) across all processes",
+    ("status",), collect=_unsent_sample
+)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.user import UserProfile
+
+# Key in Session.info for the per-session tier
+SESSION_KEY = "profile_cache"
+# Users per query when loading misses, to keep IN lists bounded for batch jobs
+LOAD_CHUNK_SIZE = 1000
+
+profile_cache_lookups_total = metrics.counter(
+    "profile_cache_lookups_total", "User profile lookups by result (session_hit, hit or miss)", ("result",)
+)
+
+@dataclass(frozen=True)
+class CachedProfile:
+    """A detached, read-only copy of a UserProfile row"""
+    id: int
+    user_id: int
+    learning_style: Optional[str]
+    pace: Optional[str]
+    interests: Optional[List[str]]
+    goals: Optional[List[str]]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    @classmethod
+    def from_row(cls, row: UserProfile) -> "CachedProfile":
+        return cls(
+            id=row.id,
+            user_id=row.user_id,
+            learning_style=row.learning_style,
+            pace=row.pace,
+            interests=list(row.interests) if row.interests is not None else None,
+            goals=list(row.goals) if row.goals is not None else None,
+            created_at=row.created_at,
+            updated_at=row.updated_at
+        )
+
+class ProfileCache:
+    """Read-through cache of user profiles in two tiers.
+    
+    The first tier lives in the Session's info dict, so a request or job
+    reads each profile at most once however many services ask for it. The
+    second is a process-wide LRU whose entries expire after ttl_seconds;
+    profile updates made through this process drop them straight away,
+    other processes see them once they expire. Users without a profile are
+    cached too, as None.
+    """
+    
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        self._entries: "OrderedDict[int, Tuple[float, Optional[CachedProfile]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a load that raced one is not cached
+        self._generation = 0
+    
+    def get(self, user_id: int, db: Session) -> Optional[CachedProfile]:
+        """Get a user's profile, or None if they have not created one"""
+        return self.get_many([user_id], db)[user_id]
+    
+    def get_many(self, user_ids: Iterable[int], db: Session) -> Dict[int, Optional[CachedProfile]]:
+        """Get several users' profiles, loading every miss in one query"""
+        session_tier = db.info.setdefault(SESSION_KEY, {})
+        profiles: Dict[int, Optional[CachedProfile]] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            if user_id in session_tier:
+                profile_cache_lookups_total.inc(result="session_hit")
+                profiles[user_id] = session_tier[user_id]
+                continue
+            found, profile = self._get_shared(user_id)
+            if found:
+                profile_cache_lookups_total.inc(result="hit")
+                profiles[user_id] = session_tier[user_id] = profile
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            profile_cache_lookups_total.inc(len(missing), result="miss")
+            generation = self._generation
+            loaded = {user_id: None for user_id in missing}
+            for start in range(0, len(missing), LOAD_CHUNK_SIZE):
+                rows = db.query(UserProfile).filter(
+                    UserProfile.user_id.in_(missing[start:start + LOAD_CHUNK_SIZE])
+                ).all()
+                loaded.update((row.user_id, CachedProfile.from_row(row)) for row in rows)
+            session_tier.update(loaded)
+            profiles.update(loaded)
+            self._set_shared(loaded, generation)
+        return profiles
+    
+    def invalidate(self, user_id: int, db: Optional[Session] = None) -> None:
+        """Drop a user's cached profile after it changes"""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+        if db is not None:
+            db.info.get(SESSION_KEY, {}).pop(user_id, None)
+    
+    def _get_shared(self, user_id: int) -> Tuple[bool, Optional[CachedProfile]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False, None
+            expires_at, profile = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return False, None
+            self._entries.move_to_end(user_id)
+            return True, profile
+    
+    def _set_shared(self, profiles: Dict[int, Optional[CachedProfile]], generation: int) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            if generation != self._generation:
+                return
+            for user_id, profile in profiles.items():
+                self._entries[user_id] = (expires_at, profile)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+# Global profile cache instance
+profile_cache = ProfileCache(
+    ttl_seconds=settings.PROFILE_CACHE_TTL_SECONDS,
+    max_entries=settings.PROFILE_CACHE_MAX_ENTRIES
+)
\ No newline at end of file
@@ -1,7 +1,25 @@
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from app.models.curriculum import LearningResource, ResourceStatus, Curriculum
-from app.models.user import UserProfile
-from typing import Dict, Any, Optional
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.curriculum import LearningResource, ResourceStatus, CurriculumModule
+from app.models.progress import ProgressEvent, DailyProgress
+from app.schemas.curriculum import ProgressSyncItem
+from app.services.curriculum_cache import curriculum_cache
+from app.services.curriculum_service import CurriculumService
+from app.services.profile_cache import profile_cache
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+# Rollup counter bumped by a change to each status, besides "events"
+ROLLUP_COLUMNS = {
+    ResourceStatus.COMPLETED: "completed",
+    ResourceStatus.IN_PROGRESS: "started",
+    ResourceStatus.SKIPPED: "skipped"
+}
+
+# How far back streaks are followed
+STREAK_LOOKBACK_DAYS = 365
 
 class ProgressService:
     def __init__(self, db: Session):
@@ -10,43 +28,193 @@ class ProgressService:
     def update_resource_status(self, resource_id: int, status: ResourceStatus, user_id: int) -> bool:
         """Update the status of a learning resource"""
         # Verify the resource belongs to the user
-        resource = self.db.query(LearningResource).join(
+        row = self.db.query(LearningResource, CurriculumModule.curriculum_id).join(
             CurriculumModule
-        ).join(
-            Curriculum
         ).filter(
             LearningResource.id == resource_id,
-            Curriculum.user_id == user_id
+            LearningResource.user_id == user_id
         ).first()
         
-        if resource:
+        if row:
+            resource, curriculum_id = row
+            previous_status = resource.status
             resource.status = status
+            resource.status_changed_at = func.now()
+            version, updated_at = CurriculumService(self.db).touch_curriculum(curriculum_id)
+            if previous_status != status:
+                self._record_status_changes(user_id, [{
+                    "curriculum_id": curriculum_id,
+                    "resource_id": resource_id,
+                    "previous_status": previous_status,
+                    "status": status,
+                    "occurred_at": updated_at
+                }])
             self.db.commit()
+            curriculum_cache.patch_resources(curriculum_id, version, updated_at, {resource_id: (status, updated_at)})
             return True
         return False
     
-    def get_progress_summary(self, user_id: int) -> Dict[str, Any]:
-        """Get a summary of the user's learning progress"""
-        # Get all resources for the user's curriculums
-        resources = self.db.query(LearningResource).join(
+    def apply_status_updates(self, user_id: int, updates: List[ProgressSyncItem]) -> Dict[str, Any]:
+        """Apply a batch of client status updates in one transaction, last writer wins by client timestamp"""
+        now = datetime.now(timezone.utc)
+        
+        # Only the newest update per resource in the batch is a candidate
+        latest: Dict[int, Tuple[int, datetime]] = {}
+        for index, update in enumerate(updates):
+            changed_at = update.client_timestamp
+            if changed_at.tzinfo is None:
+                changed_at = changed_at.replace(tzinfo=timezone.utc)
+            # A fast device clock must not lock out every later writer
+            changed_at = min(changed_at, now)
+            if update.resource_id not in latest or changed_at >= latest[update.resource_id][1]:
+                latest[update.resource_id] = (index, changed_at)
+        
+        # One ownership check for the whole batch; the row locks keep concurrent syncs ordered,
+        # and taking them in id order keeps overlapping syncs from deadlocking
+        rows = self.db.query(LearningResource, CurriculumModule.curriculum_id).join(
             CurriculumModule
-        ).join(
-            Curriculum
         ).filter(
-            Curriculum.user_id == user_id
+            LearningResource.id.in_(latest),
+            LearningResource.user_id == user_id
+        ).order_by(LearningResource.id).with_for_update(of=LearningResource).all()
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(updates)
+        changes: Dict[int, Dict[int, Tuple[ResourceStatus, datetime]]] = {}
+        events: List[Dict[str, Any]] = []
+        for resource, curriculum_id in rows:
+            index, changed_at = latest.pop(resource.id)
+            update = updates[index]
+            if resource.status_changed_at is not None and changed_at <= resource.status_changed_at:
+                results[index] = {
+                    "resource_id": resource.id,
+                    "result": "stale",
+                    "status": resource.status,
+                    "status_changed_at": resource.status_changed_at
+                }
+                continue
+            if resource.status != update.status:
+                events.append({
+                    "curriculum_id": curriculum_id,
+                    "resource_id": resource.id,
+                    "previous_status": resource.status,
+                    "status": update.status,
+                    "occurred_at": changed_at
+                })
+            resource.status = update.status
+            resource.status_changed_at = changed_at
+            changes.setdefault(curriculum_id, {})[resource.id] = (update.status, changed_at)
+            results[index] = {
+                "resource_id": resource.id,
+                "result": "applied",
+                "status": update.status,
+                "status_changed_at": changed_at
+            }
+        for index, _ in latest.values():
+            results[index] = {"resource_id": updates[index].resource_id, "result": "not_found"}
+        
+        versions = {}
+        curriculum_service = CurriculumService(self.db)
+        for curriculum_id in changes:
+            versions[curriculum_id] = curriculum_service.touch_curriculum(curriculum_id)
+        self._record_status_changes(user_id, events)
+        self.db.commit()
+        for curriculum_id, (version, updated_at) in versions.items():
+            curriculum_cache.patch_resources(curriculum_id, version, updated_at, changes[curriculum_id])
+        
+        return {
+            "applied": sum(len(resources) for resources in changes.values()),
+            "results": [
+                result or {"resource_id": update.resource_id, "result": "superseded"}
+                for result, update in zip(results, updates)
+            ]
+        }
+    
+    def _record_status_changes(self, user_id: int, changes: List[Dict[str, Any]]) -> None:
+        """Append status change events and fold them into the daily rollups, in the caller's transaction"""
+        if not changes:
+            return
+        self.db.execute(insert(ProgressEvent), [dict(change, user_id=user_id) for change in changes])
+        
+        rollups: Dict[date, Dict[str, int]] = {}
+        for change in changes:
+            day = change["occurred_at"].astimezone(timezone.utc).date()
+            counts = rollups.setdefault(day, {"completed": 0, "started": 0, "skipped": 0, "events": 0})
+            counts["events"] += 1
+            if change["status"] in ROLLUP_COLUMNS:
+                counts[ROLLUP_COLUMNS[change["status"]]] += 1
+        
+        # Days in a fixed order so concurrent syncs lock rollup rows in the same order
+        statement = pg_insert(DailyProgress).values([
+            dict(counts, user_id=user_id, day=day) for day, counts in sorted(rollups.items())
+        ])
+        self.db.execute(statement.on_conflict_do_update(
+            index_elements=[DailyProgress.user_id, DailyProgress.day],
+            set_={
+                column: getattr(DailyProgress, column) + getattr(statement.excluded, column)
+                for column in ("completed", "started", "skipped", "events")
+            }
+        ))
+    
+    def get_progress_history(self, user_id: int, days: int = 30) -> Dict[str, Any]:
+        """Get daily progress counts, the current streak and weekly pace from the rollups alone"""
+        today = datetime.now(timezone.utc).date()
+        lookback = max(days, STREAK_LOOKBACK_DAYS)
+        rows = self.db.query(DailyProgress).filter(
+            DailyProgress.user_id == user_id,
+            DailyProgress.day > today - timedelta(days=lookback)
         ).all()
+        by_day = {row.day: row for row in rows}
+        
+        # A streak survives until the learner misses a whole day, so today may still be empty
+        streak = 0
+        day = today if today in by_day else today - timedelta(days=1)
+        while day in by_day and by_day[day].events > 0:
+            streak += 1
+            day -= timedelta(days=1)
+        
+        def completed_between(start: int, end: int) -> int:
+            return sum(by_day[d].completed for d in by_day if start <= (today - d).days < end)
+        
+        series = []
+        for offset in range(days - 1, -1, -1):
+            day = today - timedelta(days=offset)
+            row = by_day.get(day)
+            series.append({
+                "day": day,
+                "completed": row.completed if row else 0,
+                "started": row.started if row else 0,
+                "skipped": row.skipped if row else 0,
+                "events": row.events if row else 0
+            })
+        
+        return {
+            "days": series,
+            "active_days": sum(1 for entry in series if entry["events"] > 0),
+            "current_streak": streak,
+            "completed_last_7_days": completed_between(0, 7),
+            "completed_previous_7_days": completed_between(7, 14)
+        }
+    
+    def get_progress_summary(self, user_id: int) -> Dict[str, Any]:
+        """Get a summary of the user's learning progress"""
+        # Count the user's resources per status (an index-only scan)
+        counts = dict(self.db.query(LearningResource.status, func.count()).filter(
+            LearningResource.user_id == user_id
+        ).group_by(
+            LearningResource.status
+        ).all())
         
         # Calculate statistics
-        total_resources = len(resources)
-        completed_resources = len([r for r in resources if r.status == ResourceStatus.COMPLETED])
-        in_progress_resources = len([r for r in resources if r.status == ResourceStatus.IN_PROGRESS])
-        pending_resources = len([r for r in resources if r.status == ResourceStatus.PENDING])
+        total_resources = sum(counts.values())
+        completed_resources = counts.get(ResourceStatus.COMPLETED, 0)
+        in_progress_resources = counts.get(ResourceStatus.IN_PROGRESS, 0)
+        pending_resources = counts.get(ResourceStatus.PENDING, 0)
         
         # Calculate completion percentage
         completion_percentage = (completed_resources / total_resources * 100) if total_resources > 0 else 0
         
         # Get user profile for context
-        profile = self.db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        profile = profile_cache.get(user_id, self.db)
         
         return {
             "total_resources": total_resources,
@@ -58,26 +226,36 @@ class ProgressService:
             "pace": profile.pace if profile else None
         }
     
-    def get_recent_progress(self, user_id: int, limit: int = 5) -> list:
-        """Get recent progress updates"""
-        resources = self.db.query(LearningResource).join(
+    def get_recent_progress(self, user_id: int, limit: int = 5, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get a page of recent progress updates, newest first, and the cursor for the next page"""
+        # Resources created with a status may never have been updated
+        changed_at = func.coalesce(LearningResource.updated_at, LearningResource.created_at)
+        query = self.db.query(LearningResource, CurriculumModule.title, changed_at).join(
             CurriculumModule
-        ).join(
-            Curriculum
         ).filter(
-            Curriculum.user_id == user_id,
+            LearningResource.user_id == user_id,
             LearningResource.status.in_([ResourceStatus.COMPLETED, ResourceStatus.IN_PROGRESS])
-        ).order_by(
-            LearningResource.updated_at.desc()
-        ).limit(limit).all()
-        
-        return [
-            {
-                "id": resource.id,
-                "title": resource.title,
-                "status": resource.status,
-                "updated_at": resource.updated_at,
-                "module_title": resource.module.title
-            }
-            for resource in resources
-        ] 
\ No newline at end of file
+        )
+        if cursor:
+            after_changed_at, after_id = decode_cursor(cursor)
+            query = query.filter(tuple_(changed_at, LearningResource.id) < (after_changed_at, after_id))
+        
+        rows = query.order_by(changed_at.desc(), LearningResource.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0].id)
+        
+        return {
+            "items": [
+                {
+                    "id": resource.id,
+                    "title": resource.title,
+                    "status": resource.status,
+                    "updated_at": resource.updated_at,
+                    "module_title": module_title
+                }
+                for resource, module_title, _ in rows
+            ],
+            "next_cursor": next_cursor
+        } 
\ No newline at end of file
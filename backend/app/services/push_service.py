@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.device_token import DeviceToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FCM_URL = "https://fcm.googleapis.com"
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+DAILY_PROMPT_TITLE = "Daily Learning Prompt"
+# Error codes meaning the token will never work again
+INVALID_TOKEN_CODES = {"UNREGISTERED", "SENDER_ID_MISMATCH"}
+# Statuses worth sending the same token again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def daily_prompt_key(device_id: int, day: date = None) -> str:
+    """Outbox idempotency key of a device's daily prompt for day (default today)"""
+    return f"daily_prompt:{device_id}:{(day or date.today()).isoformat()}"
+
+push_notifications_total = metrics.counter(
+    "push_notifications_total", "Push notifications by outcome (sent, invalid_token or failed)", ("outcome",)
+)
+device_tokens_pruned_total = metrics.counter(
+    "device_tokens_pruned_total", "Device tokens removed after FCM reported them invalid"
+)
+
+class DeviceTokenService:
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def register(self, user_id: int, token: str, platform: str = None) -> DeviceToken:
+        """Register a device token for a user, taking it over if another user had it"""
+        values = {"user_id": user_id, "platform": platform, "last_seen_at": func.now()}
+        device = self.db.execute(
+            pg_insert(DeviceToken)
+            .values(token=token, **values)
+            .on_conflict_do_update(index_elements=[DeviceToken.token], set_=values)
+            .returning(DeviceToken)
+        ).scalar_one()
+        self.db.commit()
+        return device
+    
+    def unregister(self, user_id: int, token: str) -> bool:
+        """Remove one of a user's device tokens"""
+        deleted = self.db.execute(
+            delete(DeviceToken).where(DeviceToken.user_id == user_id, DeviceToken.token == token)
+        ).rowcount
+        self.db.commit()
+        return deleted > 0
+    
+    def get_token_page(self, after_id: int = 0, limit: int = 10000) -> List[Tuple[int, int, str]]:
+        """A page of (id, user_id, token) for every registered device, in id order"""
+        return self.db.execute(
+            select(DeviceToken.id, DeviceToken.user_id, DeviceToken.token)
+            .where(DeviceToken.id > after_id)
+            .order_by(DeviceToken.id)
+            .limit(limit)
+        ).all()
+    
+    def delete_tokens(self, tokens: List[str]) -> int:
+        deleted = self.db.execute(delete(DeviceToken).where(DeviceToken.token.in_(tokens))).rowcount
+        self.db.commit()
+        return deleted
+
+@dataclass
+class PushReport:
+    sent: int = 0
+    failed: int = 0
+    requests: int = 0
+    retries: int = 0
+    batches: int = 0
+    invalid_tokens: List[str] = field(default_factory=list)
+    failed_tokens: List[str] = field(default_factory=list)
+    
+    def add(self, other: "PushReport") -> None:
+        self.sent += other.sent
+        self.failed += other.failed
+        self.requests += other.requests
+        self.retries += other.retries
+        self.batches += other.batches
+        self.invalid_tokens.extend(other.invalid_tokens)
+        self.failed_tokens.extend(other.failed_tokens)
+
+class FCMClient:
+    """Sends one notification to many devices through the FCM HTTP v1 API.
+    
+    FCM HTTP v1 has no multicast endpoint, so every token is its own request.
+    Tokens are grouped into batches of batch_size, with at most
+    max_concurrent_batches in flight, which bounds the requests in flight
+    over one pooled aiohttp session. Within a batch, tokens that hit rate limits or server errors are sent
+    again with backoff. Tokens FCM reports as unregistered or invalid are
+    collected in the report so their rows can be deleted.
+    """
+    
+    def __init__(
+        self,
+        api_url: str,
+        project_id: str,
+        credentials_path: str,
+        batch_size: int,
+        max_concurrent_batches: int,
+        max_connections: int,
+        max_retries: int,
+        retry_backoff_seconds: float,
+        timeout_seconds: float
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.project_id = project_id
+        self.credentials_path = credentials_path
+        self.batch_size = batch_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        
+        self._session = None
+        self._access_token: Optional[str] = None
+        self._access_token_expires_at = 0.0
+        self._token_lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def configured(self) -> bool:
+        # Stand-in servers at another URL need no credentials
+        return bool(self.credentials_path) or self.api_url != DEFAULT_FCM_URL
+    
+    def _get_session(self):
+        # Imported and built on first use, inside the event loop it will run on
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)
+            )
+        return self._session
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def send_multicast(
+        self,
+        tokens: List[str],
+        title: str,
+        body: str,
+        data: Optional[Dict[str, str]] = None
+    ) -> PushReport:
+        """Send a notification to every token"""
+        report = PushReport()
+        if not tokens:
+            return report
+        if not self.configured:
+            logger.warning(f"FIREBASE_CREDENTIALS is not set; not sending {len(tokens)} push notifications")
+            report.failed = len(tokens)
+            report.failed_tokens = list(tokens)
+            push_notifications_total.inc(len(tokens), outcome="failed")
+            return report
+        
+        message = {"notification": {"title": title, "body": body}}
+        if data:
+            message["data"] = data
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        
+        async def send(batch: List[str]):
+            async with semaphore:
+                return await self._send_batch(batch, message)
+        
+        batches = [tokens[i:i + self.batch_size] for i in range(0, len(tokens), self.batch_size)]
+        for batch_report in await asyncio.gather(*(send(batch) for batch in batches)):
+            report.add(batch_report)
+        return report
+    
+    async def _send_batch(self, tokens: List[str], message: Dict[str, Any]) -> PushReport:
+        report = PushReport(batches=1)
+        url = f"{self.api_url}/v1/projects/{self._get_project_id()}/messages:send"
+        pending = tokens
+        attempt = 0
+        while pending:
+            headers = await self._auth_headers()
+            # One HTTP request per token
+            report.requests += len(pending)
+            results = await asyncio.gather(*(self._send_one(url, headers, token, message) for token in pending))
+            
+            retry, retry_after = [], None
+            for token, (outcome, after) in zip(pending, results):
+                if outcome == "sent":
+                    report.sent += 1
+                elif outcome == "invalid_token":
+                    report.invalid_tokens.append(token)
+                elif outcome == "retry":
+                    retry.append(token)
+                    retry_after = after or retry_after
+                else:
+                    report.failed += 1
+                    report.failed_tokens.append(token)
+                if outcome != "retry":
+                    push_notifications_total.inc(outcome=outcome)
+            
+            if retry and attempt >= self.max_retries:
+                report.failed += len(retry)
+                report.failed_tokens.extend(retry)
+                push_notifications_total.inc(len(retry), outcome="failed")
+                break
+            if retry:
+                attempt += 1
+                report.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+            pending = retry
+        return report
+    
+    async def _send_one(self, url: str, headers: Dict[str, str], token: str, message: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Outcome for one token (sent, invalid_token, retry or failed) and any Retry-After"""
+        import aiohttp
+        try:
+            async with self._get_session().post(url, json={"message": {**message, "token": token}}, headers=headers) as response:
+                if response.status < 300:
+                    return "sent", None
+                if response.status in RETRY_STATUSES:
+                    return "retry", response.headers.get("Retry-After")
+                if self._is_invalid_token(response.status, await response.json(content_type=None)):
+                    return "invalid_token", None
+                logger.debug(f"Push to a device failed with {response.status}")
+                return "failed", None
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.debug(f"Push to a device failed: {e}")
+            return "retry", None
+    
+    @staticmethod
+    def _is_invalid_token(status: int, body: Any) -> bool:
+        error = body.get("error", {}) if isinstance(body, dict) else {}
+        codes = {detail.get("errorCode") for detail in error.get("details", []) if isinstance(detail, dict)}
+        if codes & INVALID_TOKEN_CODES:
+            return True
+        # The message is the same for every token, so a bad argument means a malformed token
+        return status == 400 and "registration token" in (error.get("message") or "")
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        try:
+            return max(0.0, float(retry_after))
+        except (TypeError, ValueError):
+            return self.retry_backoff_seconds * 2 ** (attempt - 1)
+    
+    def _get_project_id(self) -> str:
+        if not self.project_id and self.credentials_path:
+            with open(self.credentials_path) as f:
+                self.project_id = json.load(f)["project_id"]
+        return self.project_id or "local"
+    
+    async def _auth_headers(self) -> Dict[str, str]:
+        if not self.credentials_path:
+            return {}
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            # Refreshed a minute early so no request goes out with an expiring token
+            if self._access_token is None or time.time() > self._access_token_expires_at - 60:
+                self._access_token, self._access_token_expires_at = await asyncio.to_thread(self._fetch_access_token)
+        return {"Authorization": f"Bearer {self._access_token}"}
+    
+    def _fetch_access_token(self) -> Tuple[str, float]:
+        # google-auth comes with firebase-admin
+        from google.auth.transport.requests import Request
+        from google.oauth2 import service_account
+        credentials = service_account.Credentials.from_service_account_file(self.credentials_path, scopes=[FCM_SCOPE])
+        credentials.refresh(Request())
+        return credentials.token, credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+
+def prune_tokens(tokens: List[str]) -> int:
+    """Delete device tokens FCM reported invalid"""
+    db = SessionLocal()
+    try:
+        deleted = DeviceTokenService(db).delete_tokens(tokens)
+    finally:
+        db.close()
+    device_tokens_pruned_total.inc(deleted)
+    return deleted
+
+async def send_push(tokens: List[str], title: str, body: str, data: Optional[Dict[str, str]] = None) -> PushReport:
+    """Send a notification to devices and delete the tokens FCM rejected"""
+    report = await push_client.send_multicast(tokens, title, body, data)
+    if report.invalid_tokens:
+        try:
+            await asyncio.to_thread(prune_tokens, report.invalid_tokens)
+        except Exception as e:
+            logger.warning(f"Could not prune {len(report.invalid_tokens)} invalid device tokens: {e}")
+    return report
+
+# Global FCM client instance
+push_client = FCMClient(
+    api_url=settings.FCM_API_URL,
+    project_id=settings.FIREBASE_PROJECT_ID,
+    credentials_path=settings.FIREBASE_CREDENTIALS,
+    batch_size=settings.PUSH_BATCH_SIZE,
+    max_concurrent_batches=settings.PUSH_MAX_CONCURRENT_BATCHES,
+    max_connections=settings.PUSH_MAX_CONNECTIONS,
+    max_retries=settings.PUSH_MAX_RETRIES,
+    retry_backoff_seconds=settings.PUSH_RETRY_BACKOFF_SECONDS,
+    timeout_seconds=settings.PUSH_TIMEOUT_SECONDS
+)
\ No newline at end of file
@@ -0,0 +1,445 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.llm_usage import LLMTokenUsage
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Seconds to stop calling Redis after it fails, so an outage costs one timeout, not one per call
+REDIS_RETRY_SECONDS = 30
+# Counters outlive their day a little, for calls that finish after midnight
+REDIS_TTL_SECONDS = 2 * 86400
+
+llm_quota_rejections_total = metrics.counter(
+    "llm_quota_rejections_total", "LLM calls refused because they would go over the user's daily token budget", ("tier",)
+)
+llm_usage_flushes_total = metrics.counter(
+    "llm_usage_flushes_total", "Batched writes of LLM token usage to llm_token_usage by outcome", ("outcome",)
+)
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def seconds_until_reset() -> float:
+    """Seconds until budgets reset at the next UTC midnight"""
+    now = datetime.now(timezone.utc)
+    return (datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc) - now).total_seconds()
+
+class TokenQuotaExceededError(Exception):
+    """Raised when an LLM call would take a user over their daily token budget"""
+    
+    def __init__(self, message: str, retry_after: float = 3600.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@dataclass
+class UserBudget:
+    day: date
+    tier: str
+    limit: Optional[int]  # None is unlimited
+    # Usage any process had flushed when the budget was loaded, plus what this process recorded since
+    used: int
+    loaded_at: float
+
+@dataclass
+class Reservation:
+    """Tokens taken from a user's budget for a call that has not finished yet"""
+    user_id: int
+    day: date
+    tokens: int
+
+class TokenQuota:
+    """Per-user daily LLM token accounting and budgets.
+    
+    reserve runs before a call is dispatched and takes the call's token
+    estimate from the budget at once, so concurrent calls cannot all pass on
+    the same remaining tokens; record then swaps the reservation for the
+    tokens the provider reported, and release gives it back if the call
+    fails. check only reads, for refusing work up front. Usage is
+    counted in memory and written to llm_token_usage every
+    flush_interval_seconds, one upsert per user, day and kind of call. A
+    user's budget (their own override, else their tier's) and the usage
+    already flushed for the day are loaded on first use and re-read after
+    refresh_seconds, so other processes' calls count within about
+    flush_interval_seconds + refresh_seconds. With Redis, every process
+    reserves against one shared counter per user and day with INCRBY, so
+    budgets hold across processes to within what calls use beyond their
+    estimates. The a-prefixed methods keep database and Redis round trips
+    off the event loop.
+    """
+    
+    def __init__(
+        self,
+        quotas: Dict[str, int],
+        flush_interval_seconds: float,
+        refresh_seconds: float,
+        redis_url: Optional[str] = None,
+        enabled: bool = True
+    ):
+        self.quotas = quotas
+        self.flush_interval_seconds = flush_interval_seconds
+        self.refresh_seconds = refresh_seconds
+        self.redis_url = redis_url
+        self.enabled = enabled
+        
+        self._budgets: Dict[int, UserBudget] = {}
+        # Usage not written yet, and the batch being written: (user_id, day, kind) -> [tokens, calls]
+        self._pending: Dict[Tuple[int, date, str], List[int]] = {}
+        self._flushing: Dict[Tuple[int, date, str], List[int]] = {}
+        # Tokens reserved by calls still in flight: (user_id, day) -> tokens
+        self._reserved: Dict[Tuple[int, date], int] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._redis = None
+        self._redis_retry_at = 0.0
+    
+    def budget(self, user_id: int) -> UserBudget:
+        """The user's budget for today, loaded when unknown or stale"""
+        budget = self._budgets.get(user_id)
+        if budget is None or self._stale(budget):
+            budget = self._load(user_id)
+        return budget
+    
+    def check(self, user_id: int, estimated_tokens: int = 0) -> None:
+        """Raise TokenQuotaExceededError unless estimated_tokens fit in what is left of the user's budget"""
+        if not self.enabled:
+            return
+        budget = self.budget(user_id)
+        if budget.limit is None:
+            return
+        used = self.used(user_id, budget)
+        if used >= budget.limit or used + estimated_tokens > budget.limit:
+            self._reject(budget, used)
+    
+    def reserve(self, user_id: int, estimated_tokens: int) -> Optional[Reservation]:
+        """Take estimated_tokens from what is left of the user's budget, or raise TokenQuotaExceededError.
+        
+        Returns None when nothing needs settling (quotas off, or no limit).
+        """
+        if not self.enabled:
+            return None
+        budget = self.budget(user_id)
+        if budget.limit is None:
+            return None
+        
+        client = self._redis_client()
+        if client is not None:
+            try:
+                used = self._redis_incrby(client, user_id, budget.day, estimated_tokens, seed=budget.used) - estimated_tokens
+                if used >= budget.limit or used + estimated_tokens > budget.limit:
+                    client.decrby(self._redis_key(user_id, budget.day), estimated_tokens)
+                    self._reject(budget, used)
+                return self._reserved_locally(budget, user_id, estimated_tokens)
+            except TokenQuotaExceededError:
+                raise
+            except Exception as e:
+                self._redis_failed(e)
+        
+        with self._lock:
+            used = budget.used
+            if used >= budget.limit or used + estimated_tokens > budget.limit:
+                self._reject(budget, used)
+        return self._reserved_locally(budget, user_id, estimated_tokens)
+    
+    def _reserved_locally(self, budget: UserBudget, user_id: int, tokens: int) -> Reservation:
+        with self._lock:
+            budget.used += tokens
+            key = (user_id, budget.day)
+            self._reserved[key] = self._reserved.get(key, 0) + tokens
+        return Reservation(user_id, budget.day, tokens)
+    
+    def record(self, user_id: int, kind: str, tokens: int, reservation: Optional[Reservation] = None) -> None:
+        """Count the tokens one of a user's calls used, in place of its reservation"""
+        day = utc_today()
+        with self._lock:
+            usage = self._pending.setdefault((user_id, day, kind), [0, 0])
+            usage[0] += tokens
+            usage[1] += 1
+        if reservation is not None:
+            self.release(reservation)
+        self._count(user_id, day, tokens)
+    
+    def release(self, reservation: Reservation) -> None:
+        """Give a reservation back to the user's budget"""
+        key = (reservation.user_id, reservation.day)
+        with self._lock:
+            left = self._reserved.get(key, 0) - reservation.tokens
+            if left > 0:
+                self._reserved[key] = left
+            else:
+                self._reserved.pop(key, None)
+        self._count(reservation.user_id, reservation.day, -reservation.tokens)
+    
+    async def acheck(self, user_id: int, estimated_tokens: int = 0) -> None:
+        if self.enabled:
+            await self._off_loop(user_id, self.check, user_id, estimated_tokens)
+    
+    async def areserve(self, user_id: int, estimated_tokens: int) -> Optional[Reservation]:
+        if not self.enabled:
+            return None
+        return await self._off_loop(user_id, self.reserve, user_id, estimated_tokens)
+    
+    async def arecord(self, user_id: int, kind: str, tokens: int, reservation: Optional[Reservation] = None) -> None:
+        await self._off_loop(None, self.record, user_id, kind, tokens, reservation)
+    
+    def release_soon(self, reservation: Reservation) -> None:
+        """release without waiting for Redis, e.g. from a call that was cancelled"""
+        if self._redis_client() is not None:
+            asyncio.get_running_loop().run_in_executor(None, self.release, reservation)
+        else:
+            self.release(reservation)
+    
+    async def _off_loop(self, user_id: Optional[int], method, *args):
+        """Run method in a thread if it will call Redis or load the user's budget, else inline"""
+        budget = self._budgets.get(user_id) if user_id is not None else None
+        if self._redis_client() is not None or (user_id is not None and (budget is None or self._stale(budget))):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+    
+    def _count(self, user_id: int, day: date, tokens: int) -> None:
+        """Add tokens (negative to give some back) to the user's usage for day"""
+        seed = None
+        with self._lock:
+            budget = self._budgets.get(user_id)
+            if budget is not None and budget.day == day:
+                seed = budget.used
+                budget.used += tokens
+        if tokens == 0:
+            return
+        
+        client = self._redis_client()
+        if client is not None:
+            try:
+                self._redis_incrby(client, user_id, day, tokens, seed)
+            except Exception as e:
+                self._redis_failed(e)
+    
+    def _reject(self, budget: UserBudget, used: int) -> None:
+        llm_quota_rejections_total.inc(tier=budget.tier)
+        raise TokenQuotaExceededError(
+            f"Daily LLM token quota of {budget.limit} would be exceeded ({used} used today)",
+            retry_after=seconds_until_reset()
+        )
+    
+    def used(self, user_id: int, budget: UserBudget) -> int:
+        """Tokens the user has used today"""
+        client = self._redis_client()
+        if client is not None:
+            try:
+                value = client.get(self._redis_key(user_id, budget.day))
+                if value is not None:
+                    return int(value)
+            except Exception as e:
+                self._redis_failed(e)
+        return budget.used
+    
+    def usage(self, db: Session, user_id: int, days: int = 7) -> Dict[str, Any]:
+        """The user's budget and daily usage by kind of call for the last days days, newest first"""
+        budget = self.budget(user_id)
+        since = budget.day - timedelta(days=days - 1)
+        totals: Dict[date, Dict[str, List[int]]] = {}
+        rows = db.execute(
+            select(LLMTokenUsage.day, LLMTokenUsage.kind, LLMTokenUsage.tokens, LLMTokenUsage.calls)
+            .where(LLMTokenUsage.user_id == user_id, LLMTokenUsage.day >= since)
+        ).all()
+        for day, kind, tokens, calls in rows + self._unflushed(user_id, since):
+            usage = totals.setdefault(day, {}).setdefault(kind, [0, 0])
+            usage[0] += tokens
+            usage[1] += calls
+        
+        today = sum(tokens for tokens, _ in totals.get(budget.day, {}).values())
+        used = max(self.used(user_id, budget), today)
+        return {
+            "tier": budget.tier,
+            "daily_limit": budget.limit,
+            "used_today": used,
+            "remaining_today": max(0, budget.limit - used) if budget.limit is not None else None,
+            "resets_at": datetime.combine(budget.day + timedelta(days=1), datetime.min.time(), timezone.utc),
+            "days": [
+                {
+                    "day": day,
+                    "tokens": sum(tokens for tokens, _ in kinds.values()),
+                    "calls": sum(calls for _, calls in kinds.values()),
+                    "by_kind": {kind: tokens for kind, (tokens, _) in sorted(kinds.items())}
+                }
+                for day, kinds in sorted(totals.items(), reverse=True)
+            ]
+        }
+    
+    def flush(self) -> int:
+        """Write pending usage to llm_token_usage in one batch; returns the rows written"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            # Budgets past their refresh are loaded again when next needed
+            self._budgets = {user_id: budget for user_id, budget in self._budgets.items() if not self._stale(budget)}
+        if not batch:
+            return 0
+        
+        statement = pg_insert(LLMTokenUsage)
+        statement = statement.on_conflict_do_update(
+            index_elements=[LLMTokenUsage.user_id, LLMTokenUsage.day, LLMTokenUsage.kind],
+            set_={
+                "tokens": LLMTokenUsage.tokens + statement.excluded.tokens,
+                "calls": LLMTokenUsage.calls + statement.excluded.calls,
+                "updated_at": func.now()
+            }
+        )
+        rows = [
+            {"user_id": user_id, "day": day, "kind": kind, "tokens": tokens, "calls": calls}
+            for (user_id, day, kind), (tokens, calls) in batch.items()
+        ]
+        db = SessionLocal()
+        try:
+            db.execute(statement, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # Kept for the next flush rather than lost
+            with self._lock:
+                for key, (tokens, calls) in batch.items():
+                    usage = self._pending.setdefault(key, [0, 0])
+                    usage[0] += tokens
+                    usage[1] += calls
+                self._flushing = {}
+            llm_usage_flushes_total.inc(outcome="failed")
+            logger.warning(f"Could not write LLM usage for {len(rows)} users and kinds, retrying next flush: {e}")
+            return 0
+        finally:
+            db.close()
+        
+        with self._lock:
+            self._flushing = {}
+        llm_usage_flushes_total.inc(outcome="written")
+        return len(rows)
+    
+    async def start(self):
+        """Flush usage every flush_interval_seconds on the running event loop"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+    
+    async def stop(self):
+        """Stop the flusher and write what is still pending"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await asyncio.to_thread(self.flush)
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error flushing LLM usage: {e}")
+    
+    def _stale(self, budget: UserBudget) -> bool:
+        return budget.day != utc_today() or time.monotonic() - budget.loaded_at > self.refresh_seconds
+    
+    def _load(self, user_id: int) -> UserBudget:
+        day = utc_today()
+        db = SessionLocal()
+        try:
+            user = db.execute(select(User.tier, User.llm_daily_token_quota).where(User.id == user_id)).first()
+            flushed = db.execute(
+                select(func.coalesce(func.sum(LLMTokenUsage.tokens), 0))
+                .where(LLMTokenUsage.user_id == user_id, LLMTokenUsage.day == day)
+            ).scalar()
+        finally:
+            db.close()
+        tier, override = user if user is not None else ("free", None)
+        
+        with self._lock:
+            # A batch written between the query and here is counted twice until the next refresh
+            unflushed = sum(tokens for _, _, _, tokens, _ in self._unflushed_rows(user_id, day))
+            unflushed += self._reserved.get((user_id, day), 0)
+            budget = UserBudget(
+                day=day,
+                tier=tier,
+                limit=override if override is not None else self.quotas.get(tier),
+                used=int(flushed) + unflushed,
+                loaded_at=time.monotonic()
+            )
+            self._budgets[user_id] = budget
+        
+        client = self._redis_client()
+        if client is not None:
+            try:
+                # Seeds today's shared counter; a no-op once any process has
+                client.set(self._redis_key(user_id, day), int(flushed), nx=True, ex=REDIS_TTL_SECONDS)
+            except Exception as e:
+                self._redis_failed(e)
+        return budget
+    
+    def _unflushed_rows(self, user_id: int, since: date) -> List[Tuple[int, date, str, int, int]]:
+        # Callers hold the lock
+        return [
+            (uid, day, kind, tokens, calls)
+            for source in (self._pending, self._flushing)
+            for (uid, day, kind), (tokens, calls) in source.items()
+            if uid == user_id and day >= since
+        ]
+    
+    def _unflushed(self, user_id: int, since: date) -> List[Tuple[date, str, int, int]]:
+        """(day, kind, tokens, calls) this process has recorded for a user but not written yet"""
+        with self._lock:
+            return [row[1:] for row in self._unflushed_rows(user_id, since)]
+    
+    def _redis_key(self, user_id: int, day: date) -> str:
+        return f"llm-tokens:{user_id}:{day.isoformat()}"
+    
+    def _redis_incrby(self, client, user_id: int, day: date, tokens: int, seed: Optional[int] = None) -> int:
+        """Add tokens to the user's shared counter for day in one round trip, and return the new count.
+        
+        A counter that expired or was evicted while the budget stayed cached
+        is first seeded with seed (what this process last knew of the day's
+        usage) rather than restarting at 0, and the counter always has a TTL.
+        """
+        key = self._redis_key(user_id, day)
+        pipeline = client.pipeline()
+        if seed is not None:
+            pipeline.set(key, seed, nx=True, ex=REDIS_TTL_SECONDS)
+        pipeline.incrby(key, tokens)
+        pipeline.expire(key, REDIS_TTL_SECONDS)
+        return pipeline.execute()[-2]
+    
+    def _redis_client(self):
+        if not self.redis_url or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        return self._redis
+    
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"LLM usage Redis counters unavailable, using local counts for {REDIS_RETRY_SECONDS}s: {error}")
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    
+    def pending_rows(self) -> int:
+        return len(self._pending)
+
+# Global token quota instance
+token_quota = TokenQuota(
+    quotas=settings.LLM_DAILY_TOKEN_QUOTAS,
+    flush_interval_seconds=settings.LLM_USAGE_FLUSH_INTERVAL_SECONDS,
+    refresh_seconds=settings.LLM_USAGE_REFRESH_SECONDS,
+    redis_url=settings.REDIS_URL if settings.LLM_USAGE_REDIS_ENABLED else None,
+    enabled=settings.LLM_QUOTA_ENABLED
+)
+
+metrics.gauge(
+    "llm_usage_pending_rows", "User, day and kind combinations with LLM usage not yet written",
+    collect=lambda: {(): token_quota.pending_rows()}
+)
\ No newline at end of file
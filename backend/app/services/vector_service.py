@@ -1,14 +1,28 @@
-import weaviate
-from langchain_community.vectorstores import Weaviate
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 from langchain_core.tools import tool
 from app.core.config import settings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class VectorService:
     def __init__(self):
+        if settings.AI_PROVIDER.lower() == "fake":
+            # Offline mode: deterministic embeddings and an in-memory store instead of Weaviate
+            from app.services.fake_providers import FakeEmbeddings, InMemoryVectorStore
+            self.client = None
+            self.embeddings = FakeEmbeddings(
+                dimensions=settings.FAKE_EMBEDDING_DIMENSIONS,
+                latency_ms=settings.FAKE_EMBEDDING_LATENCY_MS
+            )
+            self.vectorstore = InMemoryVectorStore(self.embeddings)
+            return
+        
+        import weaviate
+        from langchain_community.vectorstores import Weaviate
+        from langchain_openai import OpenAIEmbeddings
         self.client = weaviate.Client(settings.WEAVIATE_URL)
         self.embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
         self.vectorstore = Weaviate(
@@ -55,6 +69,11 @@ class VectorService:
                     "name": "difficulty",
                     "dataType": ["text"],
                     "description": "Difficulty level (beginner, intermediate, advanced)"
+                },
+                {
+                    "name": "curriculum_id",
+                    "dataType": ["int"],
+                    "description": "Curriculum the resource was added for, if any"
                 }
             ],
             "vectorizer": "text2vec-openai"
@@ -66,33 +85,43 @@ class VectorService:
             # Schema might already exist
             pass
     
-    async def add_resource(self, title: str, content: str, url: str, resource_type: str, tags: List[str] = None, difficulty: str = "intermediate") -> bool:
+    async def add_resource(self, title: str, content: str, url: str, resource_type: str, tags: List[str] = None, difficulty: str = "intermediate", curriculum_id: Optional[int] = None) -> bool:
         """Add a learning resource to the vector database"""
         try:
-            doc = Document(
-                page_content=content,
-                metadata={
-                    "title": title,
-                    "url": url,
-                    "resource_type": resource_type,
-                    "tags": tags or [],
-                    "difficulty": difficulty
-                }
-            )
+            metadata = {
+                "title": title,
+                "url": url,
+                "resource_type": resource_type,
+                "tags": tags or [],
+                "difficulty": difficulty
+            }
+            if curriculum_id is not None:
+                metadata["curriculum_id"] = curriculum_id
+            doc = Document(page_content=content, metadata=metadata)
             
             self.vectorstore.add_documents([doc])
             return True
         except Exception as e:
-            print(f"Failed to add resource to vector database: {e}")
+            logger.error(f"Failed to add resource to vector database: {e}")
             return False
     
+    def delete_curriculum_resources(self, curriculum_id: int) -> None:
+        """Remove the entries added for a curriculum"""
+        if self.client is None:
+            self.vectorstore.delete_where("curriculum_id", curriculum_id)
+            return
+        self.client.batch.delete_objects(
+            class_name="LearningResource",
+            where={"path": ["curriculum_id"], "operator": "Equal", "valueInt": curriculum_id}
+        )
+    
     async def search(self, query: str, limit: int = 5) -> List[Document]:
         """Search for learning resources using semantic search"""
         try:
             results = self.vectorstore.similarity_search(query, k=limit)
             return results
         except Exception as e:
-            print(f"Failed to search vector database: {e}")
+            logger.error(f"Failed to search vector database: {e}")
             return []
     
     @tool
@@ -134,7 +163,7 @@ class VectorService:
             
             return recommendations
         except Exception as e:
-            print(f"Failed to get recommendations: {e}")
+            logger.error(f"Failed to get recommendations: {e}")
             return []
     
     async def index_existing_resources(self, resources: List[Dict[str, Any]]) -> bool:
@@ -159,5 +188,5 @@ class VectorService:
             
             return True
         except Exception as e:
-            print(f"Failed to index existing resources: {e}")
+            logger.error(f"Failed to index existing resources: {e}")
             return False 
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""Measure how much of curriculum generation the pre-generated library saves.
+
+Builds a library of --topics curricula with the offline build job, then
+sends --requests generation requests, --popular-share of them rephrasing a
+library topic ("Learn ...") and the rest on topics it does not have. The
+same requests run once with the library disabled and once with it enabled,
+and the run reports the share served from the library, latency for popular
+and novel topics, and LLM calls and tokens per request. The fake model's
+bag-of-words embeddings score a rephrasing lower than a real embedding
+model would, hence the lower default --min-similarity. The library and the
+generated curricula are deleted afterwards. Needs a migrated database with
+at least one user (see benchmarks.seed_data).
+
+    python -m benchmarks.bench_curriculum_library --requests 100 --output bench/curriculum_library.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=20, help="curricula in the library")
+    parser.add_argument("--requests", type=int, default=100, help="generations per run")
+    parser.add_argument("--popular-share", type=float, default=0.7, help="share of requests for a library topic")
+    parser.add_argument("--min-similarity", type=float, default=0.8)
+    parser.add_argument("--adaptation", choices=["rules", "llm"], default="rules")
+    parser.add_argument("--concurrency", type=int, default=4, help="generations in flight at once")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="time to first token")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=60, help="fake model generation speed")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must happen before the app (and so Settings) is imported
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    # Canned URLs point nowhere real; link checks would only measure the network
+    os.environ.setdefault("LINK_VALIDATION_ENABLED", "false")
+    # Every request is made as one user, who would soon run out of daily tokens
+    os.environ.setdefault("LLM_QUOTA_ENABLED", "false")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", str(args.llm_jitter_ms))
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", str(args.tokens_per_second))
+    os.environ["CURRICULUM_LIBRARY_MIN_SIMILARITY"] = str(args.min_similarity)
+    os.environ["CURRICULUM_LIBRARY_ADAPTATION"] = args.adaptation
+
+def make_requests(args: argparse.Namespace, topics: List[str], run_id: str) -> List[Tuple[str, str]]:
+    """(kind, title) for each request, popular ones rephrasing a library topic"""
+    rng = random.Random(run_id)
+    requests = []
+    for i in range(args.requests):
+        if rng.random() < args.popular_share:
+            requests.append(("popular", f"Learn {rng.choice(topics).lower()}"))
+        else:
+            requests.append(("novel", f"Benchmark novel {run_id} {i}"))
+    return requests
+
+async def run(args: argparse.Namespace, requests: List[Tuple[str, str]], library: bool, user_id: int) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.core.database import SessionLocal
+    from app.core.metrics import llm_calls_total, llm_tokens_total
+    from app.schemas.curriculum import CurriculumCreate
+    from app.services.agent_service import get_agent_service
+    from app.services.curriculum_library import curriculum_library_lookups_total
+    from benchmarks.common import latency_summary
+    
+    settings.CURRICULUM_LIBRARY_ENABLED = library
+    agent_service = get_agent_service()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: Dict[str, List[float]] = {"popular": [], "novel": []}
+    curriculum_ids: List[int] = []
+    errors = 0
+    calls_before = sum(llm_calls_total.values.values())
+    tokens_before = sum(llm_tokens_total.values.values())
+    hits_before = curriculum_library_lookups_total.values.get(("hit",), 0)
+    
+    async def generate(kind: str, title: str):
+        nonlocal errors
+        async with semaphore:
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                curriculum = await agent_service.generate_curriculum(
+                    user_id=user_id, curriculum_data=CurriculumCreate(title=title), db=db
+                )
+                latencies[kind].append(time.perf_counter() - started)
+                curriculum_ids.append(curriculum.id)
+            except Exception as e:
+                print(f"generation of {title!r} failed: {e}", file=sys.stderr)
+                errors += 1
+            finally:
+                db.close()
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(generate(kind, title) for kind, title in requests))
+    elapsed = time.perf_counter() - started
+    
+    summaries = {kind: latency_summary(samples) for kind, samples in latencies.items()}
+    result = {
+        "library": "on" if library else "off",
+        "rps": round(len(curriculum_ids) / elapsed, 2),
+        "library_share": round((curriculum_library_lookups_total.values.get(("hit",), 0) - hits_before) / len(requests), 2),
+        "popular_p50_ms": summaries["popular"]["p50_ms"],
+        "popular_p95_ms": summaries["popular"]["p95_ms"],
+        "novel_p50_ms": summaries["novel"]["p50_ms"],
+        "novel_p95_ms": summaries["novel"]["p95_ms"],
+        "llm_calls": round((sum(llm_calls_total.values.values()) - calls_before) / len(requests), 1),
+        "llm_tokens": round((sum(llm_tokens_total.values.values()) - tokens_before) / len(requests)),
+        "errors": errors
+    }
+    result.update(latency_summary(latencies["popular"] + latencies["novel"]))
+    result["curriculum_ids"] = curriculum_ids
+    return result
+
+def remove(user_id: int, curriculum_ids: List[int], run_id: str) -> None:
+    from app.core.database import SessionLocal
+    from app.models.curriculum_template import CurriculumTemplate
+    from app.services.curriculum_service import CurriculumService
+    
+    db = SessionLocal()
+    try:
+        service = CurriculumService(db)
+        for curriculum_id in curriculum_ids:
+            service.delete_curriculum(curriculum_id, user_id)
+            service.purge_curriculum(curriculum_id)
+        db.query(CurriculumTemplate).filter(CurriculumTemplate.topic.like(f"%{run_id}%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    
+    from sqlalchemy import text
+    from app.core.database import engine
+    from app.services.agent_service import get_agent_service
+    from app.services.curriculum_library import build_library
+    from benchmarks.common import print_table
+    
+    with engine.connect() as conn:
+        user_id = conn.execute(text("SELECT id FROM users ORDER BY id LIMIT 1")).scalar()
+    if user_id is None:
+        raise SystemExit("No users; run python -m benchmarks.seed_data first")
+    
+    run_id = uuid.uuid4().hex[:8]
+    topics = [f"Benchmark library {run_id}{i}" for i in range(args.topics)]
+    requests = make_requests(args, topics, run_id)
+    rows = []
+    curriculum_ids: List[int] = []
+    try:
+        started = time.perf_counter()
+        built, failed = await build_library(get_agent_service(), [(topic, None) for topic in topics], args.concurrency)
+        build_seconds = time.perf_counter() - started
+        print(f"built {built} library curricula in {build_seconds:.1f}s ({failed} failed)")
+        for library in (False, True):
+            result = await run(args, requests, library, user_id)
+            curriculum_ids += result.pop("curriculum_ids")
+            rows.append(result)
+    finally:
+        remove(user_id, curriculum_ids, run_id)
+    
+    print_table(rows, [
+        "library", "rps", "library_share", "p50_ms", "p95_ms", "popular_p50_ms", "popular_p95_ms",
+        "novel_p50_ms", "novel_p95_ms", "llm_calls", "llm_tokens", "errors"
+    ])
+    off, on = rows
+    if on["popular_p50_ms"]:
+        print(f"popular topics are {off['popular_p50_ms'] / on['popular_p50_ms']:.0f}x faster from the library")
+    if off["llm_tokens"]:
+        print(f"LLM tokens per request down {1 - on['llm_tokens'] / off['llm_tokens']:.0%}")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "library_build": {"built": built, "failed": failed, "seconds": round(build_seconds, 2)},
+                "results": rows
+            }, f, indent=2)
+    return 1 if failed or any(row["errors"] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Measure weekly digest delivery against a local mock SendGrid.
+
+Sends digests to --recipients synthetic users through SendGridClient,
+once with one recipient per request (how each digest used to go out) and
+once batched with up to --batch-size personalizations per request, and
+reports recipients per second for each. The mock adds --latency-ms per
+request, answers every --rate-limit-every'th request with 429 and rejects
+every --invalid-every'th address, so retries and partial failures are
+exercised. Exits 1 if the delivery report does not match what the mock
+received. Needs no database.
+
+    python -m benchmarks.bench_email_digest --recipients 20000 --output bench/email_digest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=20000)
+    parser.add_argument("--per-recipient-sample", type=int, default=400, help="recipients sent one per request")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=100, help="mock provider time per request")
+    parser.add_argument("--rate-limit-every", type=int, default=7, help="0 disables 429s")
+    parser.add_argument("--invalid-every", type=int, default=997, help="0 makes every address valid")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def build_recipients(args: argparse.Namespace, count: int) -> List:
+    from app.services.email_service import digest_renderer
+
+    recipients = []
+    for i in range(count):
+        domain = "invalid.example" if args.invalid_every and i % args.invalid_every == args.invalid_every - 1 else "example.com"
+        history = {
+            "completed_last_7_days": i % 13,
+            "completed_previous_7_days": i % 11,
+            "active_days": i % 8,
+            "current_streak": i % 30
+        }
+        recipients.append((f"learner{i}@{domain}", digest_renderer.substitutions(history)))
+    return recipients
+
+async def run_mode(args: argparse.Namespace, mode: str, count: int) -> Dict[str, Any]:
+    from app.services.email_service import DIGEST_SUBJECT, SendGridClient, digest_renderer
+    from benchmarks.mock_sendgrid import MockSendGrid
+
+    mock = MockSendGrid(latency_ms=args.latency_ms, rate_limit_every=args.rate_limit_every)
+    url = await mock.start()
+    client = SendGridClient(
+        api_key="benchmark",
+        api_url=url,
+        from_email="noreply@example.com",
+        batch_size=1 if mode == "per_recipient" else args.batch_size,
+        max_concurrency=args.concurrency,
+        max_retries=3,
+        retry_backoff_seconds=0,
+        timeout_seconds=30
+    )
+    recipients = build_recipients(args, count)
+    try:
+        started = time.perf_counter()
+        report = await client.send_bulk(DIGEST_SUBJECT, digest_renderer.body, recipients)
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.close()
+        await mock.stop()
+
+    expected_rejected = sum(1 for email, _ in recipients if email.endswith("@invalid.example"))
+    # Every valid recipient delivered once, with their own numbers, and every invalid one accounted for
+    consistent = (
+        report.sent == len(mock.delivered) == count - expected_rejected
+        and report.rejected == expected_rejected
+        and report.failed == 0
+        and all(mock.delivered[email] == substitutions for email, substitutions in recipients if email in mock.delivered)
+    )
+    return {
+        "mode": mode,
+        "recipients": count,
+        "seconds": round(elapsed, 3),
+        "recipients_per_second": round(count / elapsed, 1),
+        "requests": report.requests,
+        "retries": report.retries,
+        "sent": report.sent,
+        "rejected": report.rejected,
+        "failed": report.failed,
+        "consistent": consistent
+    }
+
+async def main() -> int:
+    args = parse_args()
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+
+    from benchmarks.common import print_table
+
+    rows = [
+        await run_mode(args, "per_recipient", min(args.per_recipient_sample, args.recipients)),
+        await run_mode(args, "batched", args.recipients)
+    ]
+    print_table(rows, ["mode", "recipients", "seconds", "recipients_per_second", "requests", "retries", "sent", "rejected", "failed", "consistent"])
+    per_recipient, batched = rows
+    print(f"batched delivery is {batched['recipients_per_second'] / per_recipient['recipients_per_second']:.0f}x faster per recipient")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows
+            }, f, indent=2)
+    return 0 if all(row["consistent"] for row in rows) else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
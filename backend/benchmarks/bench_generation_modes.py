@@ -0,0 +1,157 @@
+"""Compare single-call and outline-then-expand curriculum generation.
+
+Runs AgentService.generate_curriculum against the fake provider in both
+modes and reports wall-clock latency per curriculum. The fake model takes
+--llm-latency-ms to its first token and then generates --tokens-per-second,
+so a long single response costs what it would from a real provider. With
+--malformed-rate, that share of its JSON replies are cut short or lose a
+resource field, and the run also reports how many calls were asked again
+and the tokens thrown away. The generated curricula are deleted afterwards. Needs a migrated database with
+at least one user (see benchmarks.seed_data).
+
+    python -m benchmarks.bench_generation_modes --generations 20 --output bench/generation_modes.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+MODES = ["single", "outline"]
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generations", type=int, default=20, help="curricula generated per mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="generations in flight at once")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="time to first token")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=60, help="fake model generation speed")
+    parser.add_argument("--malformed-rate", type=float, default=0, help="share of replies the fake model breaks")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must happen before the app (and so Settings) is imported
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    # Canned URLs point nowhere real; link checks would only measure the network
+    os.environ.setdefault("LINK_VALIDATION_ENABLED", "false")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", str(args.llm_jitter_ms))
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", str(args.tokens_per_second))
+    os.environ.setdefault("FAKE_LLM_MALFORMED_RATE", str(args.malformed_rate))
+
+async def run_mode(args: argparse.Namespace, mode: str, user_id: int) -> Dict[str, Any]:
+    from app.core.database import SessionLocal
+    from app.core.metrics import llm_calls_total, llm_retries_total, llm_tokens_total, llm_wasted_tokens_total
+    from app.schemas.curriculum import CurriculumCreate
+    from app.services.agent_service import get_agent_service
+    from benchmarks.common import latency_summary
+    
+    agent_service = get_agent_service()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    curriculum_ids: List[int] = []
+    errors = 0
+    calls_before = sum(llm_calls_total.values.values())
+    tokens_before = sum(llm_tokens_total.values.values())
+    retries_before = sum(llm_retries_total.values.values())
+    wasted_before = sum(llm_wasted_tokens_total.values.values())
+    
+    async def generate(i: int):
+        nonlocal errors
+        async with semaphore:
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                curriculum = await agent_service.generate_curriculum(
+                    user_id=user_id,
+                    curriculum_data=CurriculumCreate(title=f"Benchmark Topic {i}", description="Generation mode benchmark"),
+                    db=db,
+                    mode=mode
+                )
+                latencies.append(time.perf_counter() - started)
+                curriculum_ids.append(curriculum.id)
+            except Exception as e:
+                print(f"{mode} generation {i} failed: {e}", file=sys.stderr)
+                errors += 1
+            finally:
+                db.close()
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(generate(i) for i in range(args.generations)))
+    elapsed = time.perf_counter() - started
+    
+    result = {
+        "mode": mode,
+        "rps": round(len(latencies) / elapsed, 2),
+        "llm_calls": round((sum(llm_calls_total.values.values()) - calls_before) / max(1, args.generations), 1),
+        "llm_tokens": round((sum(llm_tokens_total.values.values()) - tokens_before) / max(1, args.generations)),
+        "retries": round((sum(llm_retries_total.values.values()) - retries_before) / max(1, args.generations), 2),
+        "wasted_tokens": round((sum(llm_wasted_tokens_total.values.values()) - wasted_before) / max(1, args.generations)),
+        "errors": errors
+    }
+    result.update(latency_summary(latencies))
+    result["curriculum_ids"] = curriculum_ids
+    return result
+
+def check_and_remove(user_id: int, curriculum_ids: List[int]) -> int:
+    """Resources in the generated curricula, which are then deleted"""
+    from sqlalchemy import func
+    from app.core.database import SessionLocal
+    from app.models.curriculum import CurriculumModule, LearningResource
+    from app.services.curriculum_service import CurriculumService
+    
+    db = SessionLocal()
+    try:
+        resources = db.query(func.count(LearningResource.id)).join(CurriculumModule).filter(
+            CurriculumModule.curriculum_id.in_(curriculum_ids)
+        ).scalar()
+        service = CurriculumService(db)
+        for curriculum_id in curriculum_ids:
+            service.delete_curriculum(curriculum_id, user_id)
+            service.purge_curriculum(curriculum_id)
+        return resources
+    finally:
+        db.close()
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    
+    from sqlalchemy import text
+    from app.core.database import engine
+    from benchmarks.common import print_table
+    
+    with engine.connect() as conn:
+        user_id = conn.execute(text("SELECT id FROM users ORDER BY id LIMIT 1")).scalar()
+    if user_id is None:
+        raise SystemExit("No users; run python -m benchmarks.seed_data first")
+    
+    rows = []
+    for mode in MODES:
+        result = await run_mode(args, mode, user_id)
+        curriculum_ids = result.pop("curriculum_ids")
+        result["resources"] = round(check_and_remove(user_id, curriculum_ids) / max(1, len(curriculum_ids)), 1)
+        rows.append(result)
+    
+    print_table(rows, ["mode", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "llm_calls", "llm_tokens", "retries", "wasted_tokens", "resources", "errors"])
+    single, outline = rows
+    if outline["p50_ms"]:
+        print(f"outline mode p50 is {single['p50_ms'] / outline['p50_ms']:.1f}x faster")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""Exercise the resource link validator against a local stand-in web server.
+
+Starts an aiohttp server on 127.0.0.1 that serves live pages, 404s, 410s,
+redirects, server errors and pages slower than the check timeout, then
+checks --urls links to it twice: cold (every link fetched) and warm (served
+from the link_checks cache). It reports time per pass, the most requests
+the server saw in flight at once, and any link classified differently from
+what the stand-in served. Dead links in a generated module are then
+replaced from a fake vector store. Exits 1 on any misclassification or if
+the per-host connection limit was exceeded. Needs a migrated database.
+
+    python -m benchmarks.bench_link_validation --urls 500 --output bench/link_validation.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+# Stand-in path prefix -> status the validator should report
+KINDS = {
+    "ok": "ok",
+    "missing": "dead",
+    "gone": "dead",
+    "moved": "ok",
+    "error": "unknown",
+    "slow": "unknown"
+}
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", type=int, default=500, help="distinct links to check")
+    parser.add_argument("--latency-ms", type=float, default=50, help="stand-in response time")
+    parser.add_argument("--timeout", type=float, default=1.0, help="link check timeout in seconds")
+    parser.add_argument("--per-host", type=int, default=8, help="connections per host")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must happen before the app (and so Settings) is imported
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    os.environ["LINK_CHECK_ALLOW_PRIVATE_HOSTS"] = "true"
+    os.environ["LINK_CHECK_TIMEOUT_SECONDS"] = str(args.timeout)
+    os.environ["LINK_CHECK_MAX_CONNECTIONS_PER_HOST"] = str(args.per_host)
+
+async def start_stand_in(args: argparse.Namespace) -> Tuple[Any, str, Dict[str, int]]:
+    """The stand-in server, its base URL and its in-flight request counters"""
+    from aiohttp import web
+    
+    stats = {"in_flight": 0, "max_in_flight": 0, "requests": 0}
+    
+    async def handle(request):
+        kind = request.match_info["kind"]
+        stats["requests"] += 1
+        if kind == "slow":
+            # Keeps sleeping after the client gives up, so it is left out of the in-flight count
+            await asyncio.sleep(args.latency_ms / 1000 + args.timeout * 2)
+            return web.Response(status=200)
+        
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(args.latency_ms / 1000)
+            if kind == "missing":
+                return web.Response(status=404)
+            if kind == "gone":
+                return web.Response(status=410)
+            if kind == "error":
+                return web.Response(status=503)
+            if kind == "moved":
+                raise web.HTTPFound(f"/ok/{request.match_info['name']}")
+            return web.Response(
+                text=f"<html><head><title>Page {request.match_info['name']}</title></head><body></body></html>",
+                content_type="text/html"
+            )
+        finally:
+            stats["in_flight"] -= 1
+    
+    app = web.Application()
+    app.router.add_get("/{kind}/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+def expected_links(base_url: str, count: int) -> List[Tuple[str, str]]:
+    run_id = uuid.uuid4().hex[:8]
+    kinds = list(KINDS)
+    return [
+        (f"{base_url}/{kinds[i % len(kinds)]}/{run_id}-{i}", KINDS[kinds[i % len(kinds)]])
+        for i in range(count)
+    ]
+
+async def check_replacement(base_url: str) -> Dict[str, Any]:
+    """Dead links in a module are swapped for live vector store matches"""
+    from langchain_core.documents import Document
+    from app.services.fake_providers import FakeEmbeddings, InMemoryVectorStore
+    from app.services.link_validator import link_validator
+    
+    class StandInVectorService:
+        def __init__(self):
+            self.vectorstore = InMemoryVectorStore(FakeEmbeddings())
+            self.vectorstore.add_documents([
+                Document(page_content="Python decorators explained", metadata={
+                    "title": "Decorators", "url": f"{base_url}/ok/decorators", "resource_type": "article"
+                }),
+                Document(page_content="Python generators tutorial", metadata={
+                    "title": "Generators", "url": f"{base_url}/missing/generators", "resource_type": "video"
+                })
+            ])
+        
+        async def search(self, query: str, limit: int = 5):
+            return self.vectorstore.similarity_search(query, k=limit)
+    
+    resources = [
+        {"title": "Python decorators", "description": "", "url": f"{base_url}/missing/a", "type": "video"},
+        {"title": "Python generators", "description": "", "url": f"{base_url}/gone/b", "type": "video"},
+        {"title": "Python basics", "description": "", "url": f"{base_url}/ok/c", "type": "article"}
+    ]
+    validated = await link_validator.validate_resources(resources, StandInVectorService())
+    return {
+        "replaced": sum(1 for before, after in zip(resources, validated) if before["url"] != after["url"]),
+        "still_dead": sum(1 for resource in validated if resource["link_status"] == "dead"),
+        "urls": [resource["url"].replace(base_url, "") for resource in validated]
+    }
+
+def remove_cached(base_url: str) -> None:
+    from sqlalchemy import text
+    from app.core.database import engine
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM link_checks WHERE url LIKE :prefix"), {"prefix": f"{base_url}/%"})
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    
+    from benchmarks.common import print_table
+    from app.services.link_validator import link_validator
+    
+    runner, base_url, stats = await start_stand_in(args)
+    try:
+        links = expected_links(base_url, args.urls)
+        rows = []
+        for phase in ("cold", "warm"):
+            requests_before = stats["requests"]
+            started = time.perf_counter()
+            results = await link_validator.check_urls(url for url, _ in links)
+            elapsed = time.perf_counter() - started
+            mismatches = [url for url, expected in links if results[url]["status"] != expected]
+            rows.append({
+                "phase": phase,
+                "seconds": round(elapsed, 3),
+                "links_per_second": round(len(links) / elapsed, 1),
+                "fetched": stats["requests"] - requests_before,
+                "max_in_flight": stats["max_in_flight"],
+                "mismatches": len(mismatches)
+            })
+            for url in mismatches[:5]:
+                print(f"MISMATCH {url}: {results[url]['status']}")
+        replacement = await check_replacement(base_url)
+    finally:
+        await link_validator.close()
+        await runner.cleanup()
+        remove_cached(base_url)
+    
+    print_table(rows, ["phase", "seconds", "links_per_second", "fetched", "max_in_flight", "mismatches"])
+    slow = sum(1 for url, _ in links if "/slow/" in url)
+    sequential = (args.urls - slow) * args.latency_ms / 1000 + slow * args.timeout
+    print(f"one at a time the cold pass would take about {sequential:.1f}s")
+    print(
+        f"replacement: {replacement['replaced']} dead link(s) replaced, {replacement['still_dead']} left without "
+        f"a live match, resources now {replacement['urls']}"
+    )
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows,
+                "replacement": replacement
+            }, f, indent=2)
+    
+    # The stand-in store has one live match: the generators link has none, its only candidate is dead
+    failed = (
+        any(row["mismatches"] for row in rows)
+        or rows[0]["max_in_flight"] > args.per_host
+        or replacement["replaced"] != 1
+    )
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
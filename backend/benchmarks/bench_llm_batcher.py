@@ -0,0 +1,78 @@
+"""Throughput vs. added latency of the LLM micro-batching dispatcher.
+
+Uses a fake provider where every HTTP request pays a fixed overhead and only a
+limited number of connections can be in flight. Like the ChatOpenAI and Gemini
+clients, its abatch sends one request per item, so a batch saves no requests
+and the window only adds queueing latency.
+    
+    python -m benchmarks.bench_llm_batcher --requests 2000 --concurrency 400
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, List
+from app.services.llm_batcher import LLMBatcher
+from benchmarks.common import latency_summary, print_table
+
+class FakeBatchProvider:
+    """Fake chat model with per-request overhead and a bounded connection pool"""
+    
+    def __init__(self, request_overhead_ms: float, per_item_ms: float, connections: int):
+        self.request_overhead = request_overhead_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.connections = asyncio.Semaphore(connections)
+        self.http_requests = 0
+    
+    async def ainvoke(self, input: Any) -> str:
+        async with self.connections:
+            self.http_requests += 1
+            await asyncio.sleep(self.request_overhead + self.per_item)
+            return f"response to {input}"
+    
+    async def abatch(self, inputs: List[Any], config=None, return_exceptions: bool = False) -> List[str]:
+        return list(await asyncio.gather(*(self.ainvoke(input) for input in inputs)))
+
+async def run_case(args, window_ms: float) -> dict:
+    provider = FakeBatchProvider(args.overhead_ms, args.per_item_ms, args.connections)
+    batcher = LLMBatcher(provider, window_ms=window_ms, max_batch_size=args.max_batch_size)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    
+    async def one_request(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await batcher.ainvoke(f"prompt {i}")
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    
+    summary = latency_summary(latencies)
+    metrics = batcher.metrics.snapshot()
+    return {
+        "window_ms": window_ms,
+        "rps": round(args.requests / elapsed, 1),
+        "p50_ms": summary["p50_ms"],
+        "p99_ms": summary["p99_ms"],
+        "http_requests": provider.http_requests,
+        "avg_batch": metrics["avg_batch_size"],
+        "avg_queue_wait_ms": metrics["avg_queue_wait_ms"]
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=400)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--overhead-ms", type=float, default=40)
+    parser.add_argument("--per-item-ms", type=float, default=2)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 5, 10, 20])
+    args = parser.parse_args()
+    
+    rows = [await run_case(args, window) for window in args.windows]
+    print_table(rows, ["window_ms", "rps", "p50_ms", "p99_ms", "http_requests", "avg_batch", "avg_queue_wait_ms"])
+
+if __name__ == "__main__":
+    asyncio.run(main())
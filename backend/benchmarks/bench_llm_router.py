@@ -0,0 +1,96 @@
+"""Tail latency of the multi-provider LLM router with scripted fake providers.
+
+The primary provider answers quickly but stalls on a share of calls; the
+secondary is a little slower and steady. Runs the same load without hedging,
+with hedging, and with the primary failing outright (failover + circuit breaker).
+    
+    python -m benchmarks.bench_llm_router --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Iterator
+from app.services.llm_router import LLMRouter
+from benchmarks.common import latency_summary, print_table
+
+class ScriptedProvider:
+    """Fake provider whose latencies (and failures) come from a script"""
+    
+    def __init__(self, name: str, latencies: Iterator[float], fail: bool = False):
+        self.name = name
+        self.latencies = latencies
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+    
+    async def ainvoke(self, input: Any) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(next(self.latencies))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        return f"{self.name}: {input}"
+
+def spiky(base: float, spike: float, spike_rate: float, rng: random.Random) -> Iterator[float]:
+    while True:
+        yield spike if rng.random() < spike_rate else rng.uniform(base * 0.8, base * 1.2)
+
+async def run_case(args, label: str, hedge: bool, primary_fails: bool = False) -> dict:
+    rng = random.Random(args.seed)
+    primary = ScriptedProvider("primary", spiky(args.base, args.spike, args.spike_rate, rng), fail=primary_fails)
+    secondary = ScriptedProvider("secondary", spiky(args.base * 1.5, args.spike, 0.0, rng))
+    router = LLMRouter(
+        {"primary": primary, "secondary": secondary},
+        hedge_quantile=0.95,
+        hedge_min_delay=args.base,
+        hedge_default_delay=args.base * 4
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    
+    async def one_request(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await router.ainvoke(f"prompt {i}", kind="chat", hedge=hedge)
+            latencies.append(time.perf_counter() - started)
+    
+    await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    summary = latency_summary(latencies)
+    snapshot = router.snapshot()
+    return {
+        "case": label,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+        "extra_calls_pct": round((primary.calls + secondary.calls - args.requests) / args.requests * 100, 1),
+        "hedge_wins": snapshot["hedge_wins"],
+        "failovers": snapshot["failovers"],
+        "primary_circuit": snapshot["providers"]["primary"]["circuit"]
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--base", type=float, default=0.05, help="typical primary latency in seconds")
+    parser.add_argument("--spike", type=float, default=1.0, help="latency of a stalled call in seconds")
+    parser.add_argument("--spike-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    # Failover warnings are expected in the "primary down" case
+    logging.getLogger("app.services.llm_router").setLevel(logging.ERROR)
+    
+    rows = [
+        await run_case(args, "no hedging", hedge=False),
+        await run_case(args, "hedging", hedge=True),
+        await run_case(args, "primary down", hedge=True, primary_fails=True)
+    ]
+    print_table(rows, ["case", "p50_ms", "p95_ms", "p99_ms", "extra_calls_pct", "hedge_wins", "failovers", "primary_circuit"])
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,301 @@
+"""Measure notification outbox throughput and latency against local provider stand-ins.
+
+Queues --pushes push notifications and --emails digest emails, then lets
+outbox worker processes deliver them to a mock FCM and a mock SendGrid,
+once for each process count in --processes (each runs --concurrency
+workers, like an API process). The workers compete for batches through
+the database alone. The providers rate-limit every --rate-limit-every'th
+request and every --stale-every'th token is unregistered; the clients do
+not retry, so transient failures go back to the outbox with backoff and
+stale tokens are dead-lettered. A steady phase then queues --rate messages
+per second for --seconds, after a batch was claimed and abandoned as if
+its process died, to show it is reclaimed after --claim-timeout (the
+backlog phases keep the configured timeout, longer than any batch takes).
+Each run reports messages per second and queue-to-delivery latency
+percentiles, and checks that every valid message was delivered exactly
+once and every stale one dead-lettered. Exits 1 if a check fails. Needs a migrated
+database; its rows are removed afterwards.
+
+    python -m benchmarks.bench_outbox --processes 1,2,4 --output bench/outbox.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pushes", type=int, default=10000)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--processes", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--concurrency", type=int, default=4, help="outbox workers per process")
+    parser.add_argument("--batch-size", type=int, default=500, help="messages a worker claims at once")
+    parser.add_argument("--push-latency-ms", type=float, default=200)
+    parser.add_argument("--email-latency-ms", type=float, default=300)
+    parser.add_argument("--rate-limit-every", type=int, default=97, help="0 disables 429s")
+    parser.add_argument("--stale-every", type=int, default=100, help="every Nth token is unregistered")
+    parser.add_argument("--rate", type=float, default=500, help="messages queued per second in the steady phase")
+    parser.add_argument("--seconds", type=float, default=10, help="length of the steady phase")
+    parser.add_argument("--claim-timeout", type=float, default=3, help="seconds before an abandoned batch is reclaimed")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must happen before the app (and so Settings) is imported; worker processes inherit it
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    os.environ["OUTBOX_WORKER_CONCURRENCY"] = str(args.concurrency)
+    os.environ["OUTBOX_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["OUTBOX_POLL_INTERVAL_SECONDS"] = "0.05"
+    os.environ["OUTBOX_MAX_ATTEMPTS"] = "8"
+    os.environ["OUTBOX_RETRY_BACKOFF_SECONDS"] = "0.1"
+    # No client-side retries: transient failures go back to the outbox
+    os.environ["PUSH_MAX_RETRIES"] = "0"
+    os.environ["EMAIL_MAX_RETRIES"] = "0"
+    os.environ["SENDGRID_API_KEY"] = "benchmark"
+
+async def run_worker(args: argparse.Namespace) -> int:
+    """One worker process: run the outbox workers until terminated"""
+    import app.services.outbox as outbox
+    from app.services.email_service import email_client
+    from app.services.push_service import push_client
+    
+    # Look for abandoned batches often enough to see one reclaimed within the run
+    outbox.RECLAIM_INTERVAL_SECONDS = min(outbox.RECLAIM_INTERVAL_SECONDS, outbox.outbox_dispatcher.claim_timeout_seconds)
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    await outbox.outbox_dispatcher.start()
+    print("ready", flush=True)
+    await stopping.wait()
+    await outbox.outbox_dispatcher.stop()
+    await push_client.close()
+    await email_client.close()
+    return 0
+
+class Run:
+    """One batch of benchmark messages, told apart by their idempotency key prefix"""
+    
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.prefix = f"bench-{uuid.uuid4().hex[:8]}:"
+        self.count = 0
+        self.stale = 0
+    
+    def queue(self, pushes: int, emails: int) -> None:
+        """Queue messages in one transaction, so workers see them all at once"""
+        from app.core.database import SessionLocal
+        from app.models.outbox import OutboxChannel
+        from app.services.email_service import DIGEST_SUBJECT, digest_renderer
+        from app.services.outbox import email_payload, enqueue_many, push_payload
+        
+        push_messages, email_messages = [], []
+        for _ in range(pushes):
+            i = self.count
+            self.count += 1
+            stale = self.args.stale_every and i % self.args.stale_every == self.args.stale_every - 1
+            self.stale += bool(stale)
+            token = f"{'stale' if stale else 'ok'}-{self.prefix}{i}"
+            push_messages.append((f"{self.prefix}{i}", push_payload(token, "Daily Learning Prompt", "benchmark"), None))
+        for _ in range(emails):
+            i = self.count
+            self.count += 1
+            substitutions = {digest_renderer.tag(name): str(i) for name in digest_renderer.FIELDS}
+            email = f"learner-{self.prefix.rstrip(':')}-{i}@example.com"
+            email_messages.append((f"{self.prefix}{i}", email_payload(email, DIGEST_SUBJECT, digest_renderer.body, substitutions), None))
+        
+        db = SessionLocal()
+        try:
+            enqueue_many(db, OutboxChannel.PUSH, push_messages)
+            enqueue_many(db, OutboxChannel.EMAIL, email_messages)
+            db.commit()
+        finally:
+            db.close()
+    
+    def status_counts(self) -> Dict[str, int]:
+        from sqlalchemy import text
+        from app.core.database import engine
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT status, count(*) FROM notification_outbox WHERE idempotency_key LIKE :prefix GROUP BY status"),
+                {"prefix": f"{self.prefix}%"}
+            ).all()
+        return {status: count for status, count in rows}
+    
+    def latencies(self) -> List[float]:
+        """Seconds from queueing to delivery of each sent message"""
+        from sqlalchemy import text
+        from app.core.database import engine
+        with engine.begin() as conn:
+            return [float(seconds) for seconds in conn.execute(
+                text(
+                    "SELECT extract(epoch FROM sent_at - created_at) FROM notification_outbox "
+                    "WHERE idempotency_key LIKE :prefix AND status = 'SENT'"
+                ),
+                {"prefix": f"{self.prefix}%"}
+            ).scalars()]
+    
+    async def wait_until_settled(self, timeout: float = 600) -> None:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            counts = await asyncio.to_thread(self.status_counts)
+            if not counts.get("PENDING") and not counts.get("SENDING"):
+                return
+            await asyncio.sleep(0.05)
+        raise SystemExit(f"Outbox did not drain within {timeout}s")
+    
+    def remove(self) -> None:
+        from sqlalchemy import text
+        from app.core.database import engine
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM notification_outbox WHERE idempotency_key LIKE :prefix"), {"prefix": f"{self.prefix}%"})
+
+class Providers:
+    """The mock FCM and SendGrid, served from this process"""
+    
+    def __init__(self, args: argparse.Namespace):
+        from benchmarks.mock_fcm import MockFCM
+        from benchmarks.mock_sendgrid import MockSendGrid
+        
+        self.fcm = MockFCM(latency_ms=args.push_latency_ms, rate_limit_every=args.rate_limit_every)
+        self.sendgrid = MockSendGrid(latency_ms=args.email_latency_ms, rate_limit_every=args.rate_limit_every)
+    
+    async def start(self) -> Dict[str, str]:
+        """Start both and return the environment that points clients at them"""
+        return {"FCM_API_URL": await self.fcm.start(), "SENDGRID_API_URL": await self.sendgrid.start()}
+    
+    async def stop(self):
+        await self.fcm.stop()
+        await self.sendgrid.stop()
+    
+    @property
+    def delivered(self) -> int:
+        return len(self.fcm.delivered) + len(self.sendgrid.delivered)
+    
+    @property
+    def deliveries(self) -> int:
+        return self.fcm.deliveries + self.sendgrid.deliveries
+
+async def start_workers(processes: int, env: Dict[str, str]) -> List[asyncio.subprocess.Process]:
+    """Start worker processes and wait until each is polling the outbox"""
+    workers = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.bench_outbox", "--worker", *sys.argv[1:],
+            stdout=asyncio.subprocess.PIPE, env={**os.environ, **env}
+        )
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        if (await worker.stdout.readline()).strip() != b"ready":
+            raise SystemExit("An outbox worker process failed to start")
+    return workers
+
+async def stop_workers(workers: List[asyncio.subprocess.Process]) -> None:
+    for worker in workers:
+        worker.terminate()
+    await asyncio.gather(*(worker.wait() for worker in workers))
+
+def result(phase: str, processes: int, run: Run, elapsed: float, providers: Providers) -> Dict[str, Any]:
+    from benchmarks.common import latency_summary
+    
+    counts = run.status_counts()
+    latencies = latency_summary(run.latencies())
+    sent, dead = counts.get("SENT", 0), counts.get("DEAD", 0)
+    duplicates = providers.deliveries - providers.delivered
+    return {
+        "phase": phase,
+        "processes": processes,
+        "messages": run.count,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(run.count / elapsed, 1),
+        "p50_ms": latencies["p50_ms"],
+        "p95_ms": latencies["p95_ms"],
+        "p99_ms": latencies["p99_ms"],
+        "sent": sent,
+        "dead": dead,
+        "duplicates": duplicates,
+        # Every valid message delivered once, every stale token dead-lettered
+        "consistent": sent == providers.delivered == run.count - run.stale and dead == run.stale and duplicates == 0
+    }
+
+async def backlog(args: argparse.Namespace, processes: int) -> Dict[str, Any]:
+    """Drain a full queue with this many worker processes"""
+    providers = Providers(args)
+    workers = await start_workers(processes, await providers.start())
+    run = Run(args)
+    try:
+        started = time.perf_counter()
+        await asyncio.to_thread(run.queue, args.pushes, args.emails)
+        await run.wait_until_settled()
+        return result("backlog", processes, run, time.perf_counter() - started, providers)
+    finally:
+        await stop_workers(workers)
+        await providers.stop()
+        run.remove()
+
+async def steady(args: argparse.Namespace, processes: int) -> Dict[str, Any]:
+    """Queue at a fixed rate while workers deliver, after abandoning one claimed batch"""
+    from app.services.outbox import outbox_dispatcher
+    
+    providers = Providers(args)
+    env = await providers.start()
+    # Short enough to see the abandoned batch reclaimed within the phase
+    env["OUTBOX_CLAIM_TIMEOUT_SECONDS"] = str(args.claim_timeout)
+    run = Run(args)
+    # Claimed by a worker whose process then dies, before the others start
+    await asyncio.to_thread(run.queue, 100, 0)
+    abandoned = len(await asyncio.to_thread(outbox_dispatcher._claim))
+    workers = await start_workers(processes, env)
+    try:
+        tick = 0.1
+        per_tick = args.rate * tick
+        email_share = args.emails / max(1, args.pushes + args.emails)
+        started = time.perf_counter()
+        for i in range(int(args.seconds / tick)):
+            emails = int(per_tick * email_share)
+            await asyncio.to_thread(run.queue, int(per_tick) - emails, emails)
+            await asyncio.sleep(max(0.0, started + (i + 1) * tick - time.perf_counter()))
+        await run.wait_until_settled()
+        row = result("steady", processes, run, time.perf_counter() - started, providers)
+        row["abandoned"] = abandoned
+        return row
+    finally:
+        await stop_workers(workers)
+        await providers.stop()
+        run.remove()
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    if args.worker:
+        return await run_worker(args)
+    
+    from benchmarks.common import print_table
+    
+    process_counts = [int(count) for count in args.processes.split(",")]
+    rows = [await backlog(args, processes) for processes in process_counts]
+    rows.append(await steady(args, max(process_counts)))
+    print_table(rows, [
+        "phase", "processes", "messages", "seconds", "messages_per_second",
+        "p50_ms", "p95_ms", "p99_ms", "sent", "dead", "duplicates", "consistent"
+    ])
+    print(f"steady phase: {rows[-1]['abandoned']} messages abandoned mid-send were reclaimed and delivered")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows
+            }, f, indent=2)
+    return 0 if all(row["consistent"] for row in rows) else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Compare syncing a session of progress updates one by one against one batch.
+
+Each sync replays --items status changes for one seeded user, either as that
+many POST /progress/update calls or as a single POST /progress/batch. Per
+mode it records syncs per second, latency percentiles of a whole sync and
+SQL statements per sync. The database must already be seeded (see
+benchmarks.seed_data).
+
+    python -m benchmarks.bench_progress_sync --items 50 --syncs 200 --output bench/progress_sync.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50, help="status changes per sync")
+    parser.add_argument("--syncs", type=int, default=200, help="syncs per mode")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--sample-users", type=int, default=200, help="seeded users to spread syncs across")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def session_updates(rng: random.Random, user: Dict[str, Any], items: int) -> List[Dict[str, Any]]:
+    """A plausible offline session: items status changes a second apart, ending now"""
+    from benchmarks.load_test_read_paths import PROGRESS_STATUSES
+    started = datetime.now(timezone.utc) - timedelta(seconds=items)
+    return [
+        {
+            "resource_id": rng.choice(user["resource_ids"]),
+            "status": rng.choice(PROGRESS_STATUSES),
+            "client_timestamp": (started + timedelta(seconds=i)).isoformat()
+        }
+        for i in range(items)
+    ]
+
+async def run(args: argparse.Namespace, app, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    import httpx
+    from benchmarks.load_test_read_paths import run_endpoint
+    
+    rng = random.Random(0)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://progress-sync", timeout=120) as client:
+        
+        async def sync_single(i: int) -> bool:
+            user = users[i % len(users)]
+            for update in session_updates(rng, user, args.items):
+                response = await client.post("/api/v1/progress/update", headers=user["headers"], json={
+                    "resource_id": update["resource_id"],
+                    "status": update["status"]
+                })
+                if response.status_code != 200:
+                    return False
+            return True
+        
+        async def sync_batch(i: int) -> bool:
+            user = users[i % len(users)]
+            response = await client.post("/api/v1/progress/batch", headers=user["headers"], json={
+                "updates": session_updates(rng, user, args.items)
+            })
+            return response.status_code == 200
+        
+        results = []
+        for name, call in (("single", sync_single), ("batch", sync_batch)):
+            for i in range(min(5, len(users))):
+                await call(i)
+            result = await run_endpoint(name, args.syncs, args.concurrency, call)
+            result["mode"] = result.pop("endpoint")
+            result["requests_per_sync"] = args.items if name == "single" else 1
+            results.append(result)
+        return results
+
+async def main() -> int:
+    args = parse_args()
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    
+    from sqlalchemy import event
+    from main import app
+    from app.core.database import engine
+    from benchmarks.common import print_table
+    from benchmarks.load_test_read_paths import count_statements, sample_users
+    
+    event.listen(engine, "before_cursor_execute", count_statements)
+    users = [user for user in sample_users(engine, args.sample_users) if user["resource_ids"]]
+    if not users:
+        raise SystemExit("No seeded users with resources; run python -m benchmarks.seed_data first")
+    
+    rows = await run(args, app, users)
+    print_table(rows, ["mode", "requests_per_sync", "rps", "p50_ms", "p95_ms", "p99_ms", "sql_avg", "sql_max", "errors"])
+    single, batch = rows
+    if batch["p50_ms"]:
+        print(f"batch sync p50 is {single['p50_ms'] / batch['p50_ms']:.1f}x faster, "
+              f"{single['sql_avg']} -> {batch['sql_avg']} SQL statements per sync")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
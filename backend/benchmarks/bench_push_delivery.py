@@ -0,0 +1,204 @@
+"""Measure daily push notification delivery against a local FCM stand-in.
+
+Registers --devices device tokens for the seeded users, some of them stale
+or malformed, then sends the daily prompt to all of them with the real
+background job and outbox workers: one LLM call, token pages queued in the
+outbox, and batches of --batch-size with --concurrent-batches sending at
+once. For comparison, --per-device-sample tokens are sent one at a time,
+as each user's notification used to be. FCM HTTP v1 takes one token per
+request, so both make one request per device; batching only keeps many of
+them in flight. It reports devices per second for
+both, then checks that every valid token was delivered once and that the
+stale and malformed tokens were deleted. The benchmark's tokens are
+removed afterwards. Needs a migrated database with users (see
+benchmarks.seed_data). Exits 1 if a check fails.
+
+    python -m benchmarks.bench_push_delivery --devices 20000 --output bench/push_delivery.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=20000)
+    parser.add_argument("--per-device-sample", type=int, default=300, help="tokens sent one at a time")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrent-batches", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20, help="stand-in time per request")
+    parser.add_argument("--rate-limit-every", type=int, default=501, help="0 disables 429s")
+    parser.add_argument("--stale-every", type=int, default=50, help="every Nth token is unregistered")
+    parser.add_argument("--bad-every", type=int, default=333, help="every Nth token is malformed")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must happen before the app (and so Settings) is imported
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", "50")
+    os.environ["PUSH_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["PUSH_MAX_CONCURRENT_BATCHES"] = str(args.concurrent_batches)
+    os.environ["OUTBOX_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["OUTBOX_WORKER_CONCURRENCY"] = str(args.concurrent_batches)
+    os.environ["PUSH_RETRY_BACKOFF_SECONDS"] = "0"
+
+def make_tokens(args: argparse.Namespace, run_id: str) -> List[str]:
+    tokens = []
+    for i in range(args.devices):
+        if args.stale_every and i % args.stale_every == args.stale_every - 1:
+            prefix = "stale"
+        elif args.bad_every and i % args.bad_every == args.bad_every - 1:
+            prefix = "bad"
+        else:
+            prefix = "ok"
+        tokens.append(f"{prefix}-bench{run_id}-{i}")
+    return tokens
+
+def register_tokens(tokens: List[str]) -> None:
+    from sqlalchemy import insert, text
+    from app.core.database import engine
+    from app.models.device_token import DeviceToken
+    
+    with engine.begin() as conn:
+        user_ids = conn.execute(text("SELECT id FROM users ORDER BY id LIMIT 10000")).scalars().all()
+        if not user_ids:
+            raise SystemExit("No users; run python -m benchmarks.seed_data first")
+        conn.execute(insert(DeviceToken), [
+            {"user_id": user_ids[i % len(user_ids)], "token": token, "platform": "android"}
+            for i, token in enumerate(tokens)
+        ])
+
+def remaining_tokens(run_id: str) -> List[str]:
+    from sqlalchemy import text
+    from app.core.database import engine
+    with engine.begin() as conn:
+        return conn.execute(
+            text("SELECT token FROM device_tokens WHERE token LIKE :pattern"), {"pattern": f"%-bench{run_id}-%"}
+        ).scalars().all()
+
+def remove_tokens(run_id: str) -> None:
+    from sqlalchemy import text
+    from app.core.database import engine
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM device_tokens WHERE token LIKE :pattern"), {"pattern": f"%-bench{run_id}-%"})
+        conn.execute(
+            text("DELETE FROM notification_outbox WHERE payload->>'token' LIKE :pattern"), {"pattern": f"%-bench{run_id}-%"}
+        )
+
+async def per_device(args: argparse.Namespace, tokens: List[str]) -> Dict[str, Any]:
+    """Baseline: one token per request, one request at a time"""
+    from app.services.push_service import FCMClient
+    from benchmarks.mock_fcm import MockFCM
+    
+    mock = MockFCM(latency_ms=args.latency_ms)
+    client = FCMClient(
+        api_url=await mock.start(),
+        project_id="bench",
+        credentials_path="",
+        batch_size=1,
+        max_concurrent_batches=1,
+        max_connections=1,
+        max_retries=2,
+        retry_backoff_seconds=0,
+        timeout_seconds=10
+    )
+    try:
+        started = time.perf_counter()
+        report = await client.send_multicast(tokens, "Daily Learning Prompt", "benchmark")
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.close()
+        await mock.stop()
+    return {
+        "mode": "per_device",
+        "devices": len(tokens),
+        "seconds": round(elapsed, 3),
+        "devices_per_second": round(len(tokens) / elapsed, 1),
+        "sent": report.sent,
+        "invalid": len(report.invalid_tokens),
+        "failed": report.failed,
+        "retries": report.retries,
+        "requests": mock.requests,
+        "max_in_flight": mock.max_in_flight
+    }
+
+async def batched_delivery(args: argparse.Namespace, tokens: List[str], run_id: str) -> Dict[str, Any]:
+    """The daily notification job and outbox delivery end to end, including pruning"""
+    from app.services.background_tasks import background_task_service
+    from app.services.outbox import outbox_dispatcher
+    from app.services.push_service import push_client, push_notifications_total
+    from benchmarks.mock_fcm import MockFCM
+    
+    mock = MockFCM(latency_ms=args.latency_ms, rate_limit_every=args.rate_limit_every)
+    push_client.api_url = await mock.start()
+    before = dict(push_notifications_total.values)
+    try:
+        started = time.perf_counter()
+        await background_task_service._send_daily_notifications()
+        await outbox_dispatcher.drain()
+        elapsed = time.perf_counter() - started
+    finally:
+        await push_client.close()
+        await mock.stop()
+    
+    counts = {key[0]: value - before.get(key, 0) for key, value in push_notifications_total.values.items()}
+    valid = {token for token in tokens if token.startswith("ok-")}
+    remaining = set(remaining_tokens(run_id))
+    return {
+        "mode": "batched",
+        "devices": len(tokens),
+        "seconds": round(elapsed, 3),
+        "devices_per_second": round(len(tokens) / elapsed, 1),
+        "sent": int(counts.get("sent", 0)),
+        "invalid": int(counts.get("invalid_token", 0)),
+        "failed": int(counts.get("failed", 0)),
+        "requests": mock.requests,
+        "max_in_flight": mock.max_in_flight,
+        # Every valid token delivered, and only the invalid ones pruned
+        "consistent": (
+            mock.delivered >= valid and mock.deliveries == len(mock.delivered)
+            and remaining == valid and counts.get("failed", 0) == 0
+        )
+    }
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    
+    from benchmarks.common import print_table
+    
+    run_id = uuid.uuid4().hex[:8]
+    tokens = make_tokens(args, run_id)
+    register_tokens(tokens)
+    try:
+        rows = [
+            await per_device(args, tokens[:args.per_device_sample]),
+            await batched_delivery(args, tokens, run_id)
+        ]
+    finally:
+        remove_tokens(run_id)
+    
+    print_table(rows, ["mode", "devices", "seconds", "devices_per_second", "sent", "invalid", "failed", "requests", "max_in_flight"])
+    baseline, batched = rows
+    print(f"batched delivery is {batched['devices_per_second'] / baseline['devices_per_second']:.0f}x faster per device")
+    print(f"valid tokens delivered and invalid tokens pruned: {batched['consistent']}")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows
+            }, f, indent=2)
+    return 0 if batched["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
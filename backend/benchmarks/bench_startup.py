@@ -0,0 +1,161 @@
+"""Cold-start benchmark: how long a fresh worker takes to import the app and serve.
+
+Each run imports main in a fresh interpreter with -X importtime and records
+the wall time plus the slowest modules. With --serve it also starts uvicorn
+and times how long /health/live takes to answer. Heavy AI and vector SDKs
+are expected to load on first use, so any that show up at import time are
+reported as eager imports.
+
+    python -m benchmarks.bench_startup --runs 5 --output bench/startup.json
+    python -m benchmarks.bench_startup --compare bench/startup.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Should only be imported on first use, never by importing the app
+LAZY_MODULES = [
+    "langchain_openai", "langchain_google_genai", "langchain_community", "langchain_mcp_adapters",
+    "weaviate", "openai", "google.generativeai", "tiktoken", "alembic"
+]
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to import main in")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to report")
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn start to first /health/live")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    return parser.parse_args()
+
+def benchmark_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    return env
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int]]:
+    """(module, cumulative microseconds) for each line of -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules.append((name.strip(), int(cumulative)))
+    return modules
+
+def import_once() -> Tuple[float, List[Tuple[str, int]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=benchmark_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing main failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve_once(timeout: float = 60) -> float:
+    """Seconds from spawning uvicorn until /health/live answers"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=benchmark_env()
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit("uvicorn exited before becoming live")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/live", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+        raise SystemExit(f"/health/live did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    durations = []
+    modules: List[Tuple[str, int]] = []
+    for _ in range(args.runs):
+        seconds, modules = import_once()
+        durations.append(seconds)
+    
+    imported = {name for name, _ in modules}
+    result = {
+        "import_median_ms": round(statistics.median(durations) * 1000, 1),
+        "import_min_ms": round(min(durations) * 1000, 1),
+        "import_max_ms": round(max(durations) * 1000, 1),
+        "slowest_modules": [
+            {"module": name, "cumulative_ms": round(us / 1000, 1)}
+            for name, us in sorted(modules, key=lambda item: item[1], reverse=True)[:args.top]
+        ],
+        "eager_imports": [name for name in LAZY_MODULES if name in imported]
+    }
+    if args.serve:
+        result["serve_ms"] = round(serve_once() * 1000, 1)
+    return result
+
+def compare(result: Dict[str, Any], baseline_path: str, tolerance: float) -> List[str]:
+    """Regressions relative to a saved baseline"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["result"]
+    regressions = []
+    for key in ("import_median_ms", "serve_ms"):
+        if key in result and key in baseline and result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key} {result[key]} > baseline {baseline[key]}")
+    for name in set(result["eager_imports"]) - set(baseline.get("eager_imports", [])):
+        regressions.append(f"{name} is now imported at startup")
+    return regressions
+
+def main() -> int:
+    args = parse_args()
+    result = run(args)
+    
+    print(f"import main: median {result['import_median_ms']}ms (min {result['import_min_ms']}, max {result['import_max_ms']}) over {args.runs} runs")
+    if "serve_ms" in result:
+        print(f"uvicorn to first /health/live: {result['serve_ms']}ms")
+    print("Slowest modules (cumulative):")
+    for row in result["slowest_modules"]:
+        print(f"  {row['cumulative_ms']:>8}ms  {row['module']}")
+    for name in result["eager_imports"]:
+        print(f"EAGER IMPORT {name}")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "result": result
+            }, f, indent=2)
+    
+    if args.compare:
+        regressions = compare(result, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""Check that ownership-checked and per-user queries are served by their indexes.
+
+Each check runs a real service method for a seeded user, captures the
+SELECTs it issues and EXPLAINs them. A check fails when an expected index
+is missing from the plans, a table it should not touch shows up, or one of
+the large tables is read with a sequential scan. On a small database the
+planner may rightly prefer sequential scans; seed one first (see
+benchmarks.seed_data) or pass --no-seqscan to check index availability
+only. Exits 1 if any check fails.
+
+    python -m benchmarks.check_query_plans
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+LARGE_TABLES = {"curriculums", "curriculum_modules", "learning_resources", "user_profiles", "progress_daily", "progress_events"}
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-seqscan", action="store_true", help="discourage sequential scans while explaining")
+    parser.add_argument("--verbose", action="store_true", help="print every captured statement and its plan")
+    return parser.parse_args()
+
+def plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+def capture_selects(engine, call: Callable[[], Any]) -> List[Tuple[str, Any]]:
+    """The SELECT statements (with parameters) issued while running call"""
+    from sqlalchemy import event
+    statements = []
+    
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+def explain(engine, statements: List[Tuple[str, Any]], no_seqscan: bool) -> List[Dict[str, Any]]:
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if no_seqscan:
+            cursor.execute("SET enable_seqscan = off")
+        plans = []
+        for statement, parameters in statements:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = cursor.fetchone()[0]
+            plans.append((plan if isinstance(plan, list) else json.loads(plan))[0]["Plan"])
+        return plans
+    finally:
+        raw.rollback()
+        raw.close()
+
+def sample_ids(engine) -> Dict[str, int]:
+    """A seeded user and one of their curricula that has modules"""
+    from sqlalchemy import text
+    from benchmarks.seed_data import SEED_EMAIL_DOMAIN
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT u.id, c.id FROM users u JOIN curriculums c ON c.user_id = u.id "
+            "WHERE u.email LIKE :pattern AND EXISTS (SELECT 1 FROM curriculum_modules m WHERE m.curriculum_id = c.id) "
+            "ORDER BY u.id LIMIT 1"
+        ), {"pattern": f"seed-%@{SEED_EMAIL_DOMAIN}"}).first()
+    if row is None:
+        raise SystemExit("No seeded users with curricula; run python -m benchmarks.seed_data first")
+    return {"user_id": row[0], "curriculum_id": row[1]}
+
+def checks(db, ids: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Service calls with the indexes their plans must use (a tuple means any one of them) and tables they must not touch"""
+    from app.models.curriculum import ResourceStatus
+    from app.services.curriculum_service import CurriculumService
+    from app.services.progress_service import ProgressService
+    
+    progress = ProgressService(db)
+    curriculum = CurriculumService(db)
+    user_id = ids["user_id"]
+    return [
+        {
+            "name": "progress ownership check",
+            # A resource id that never exists, so the check runs but nothing is written
+            "call": lambda: progress.update_resource_status(-1, ResourceStatus.COMPLETED, user_id),
+            # id has both the primary key and an explicit index; either will do
+            "indexes": [("learning_resources_pkey", "ix_learning_resources_id")],
+            "forbidden": {"curriculums"}
+        },
+        {
+            "name": "progress summary",
+            "call": lambda: progress.get_progress_summary(user_id),
+            "indexes": ["ix_learning_resources_user_id_status", "ix_user_profiles_user_id"],
+            "forbidden": {"curriculums", "curriculum_modules"}
+        },
+        {
+            "name": "recent progress",
+            "call": lambda: progress.get_recent_progress(user_id),
+            "indexes": ["ix_learning_resources_user_id_status"],
+            "forbidden": {"curriculums"}
+        },
+        {
+            "name": "progress history",
+            "call": lambda: progress.get_progress_history(user_id),
+            "indexes": ["progress_daily_pkey"],
+            "forbidden": {"progress_events"}
+        },
+        {
+            "name": "curriculum list",
+            "call": lambda: curriculum.get_user_curriculums(user_id),
+            "indexes": ["ix_curriculums_user_id_created_at"],
+            "forbidden": set()
+        },
+        {
+            "name": "curriculum tree",
+            "call": lambda: curriculum.get_curriculum_tree(ids["curriculum_id"]),
+            "indexes": ["ix_curriculum_modules_curriculum_id_order", "ix_learning_resources_module_id_order"],
+            "forbidden": set()
+        }
+    ]
+
+def main() -> int:
+    args = parse_args()
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    
+    from app.core.database import SessionLocal, engine
+    
+    ids = sample_ids(engine)
+    db = SessionLocal()
+    failures = 0
+    try:
+        for check in checks(db, ids):
+            statements = capture_selects(engine, check["call"])
+            db.rollback()
+            plans = explain(engine, statements, args.no_seqscan)
+            
+            nodes = [node for plan in plans for node in plan_nodes(plan)]
+            used = {node["Index Name"] for node in nodes if "Index Name" in node}
+            tables = {node["Relation Name"] for node in nodes if "Relation Name" in node}
+            seq_scans = {node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"} & LARGE_TABLES
+            
+            required = [names if isinstance(names, tuple) else (names,) for names in check["indexes"]]
+            problems = [f"missing index {' or '.join(names)}" for names in required if not used & set(names)]
+            problems += [f"touches {name}" for name in sorted(check["forbidden"] & tables)]
+            problems += [f"seq scan on {name}" for name in sorted(seq_scans)]
+            failures += bool(problems)
+            
+            print(f"{'FAIL' if problems else 'ok  '} {check['name']}: {', '.join(problems) or ', '.join(sorted(used))}")
+            if args.verbose:
+                for (statement, _), plan in zip(statements, plans):
+                    print(f"    {' '.join(statement.split())}")
+                    print("    " + json.dumps(plan, indent=2).replace("\n", "\n    "))
+    finally:
+        db.close()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
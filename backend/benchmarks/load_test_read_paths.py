@@ -0,0 +1,212 @@
+"""Load-test the curriculum and progress read paths at growing data scales.
+
+For each --steps value the database is seeded up to that many users (see
+benchmarks.seed_data), then GET /curriculum/, GET /curriculum/{id},
+GET /progress/summary and POST /progress/update are driven in-process
+against a sample of seeded users. Per endpoint and step it records RPS,
+latency percentiles and SQL statements per request. Every seeded user owns
+the same amount of data, so per-request cost should stay flat as the table
+grows; endpoints whose p50 grows faster than --flag-ratio between the
+smallest and largest step are reported as scaling superlinearly.
+
+    python -m benchmarks.load_test_read_paths --steps 1000 10000 100000 --output bench/read_paths.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ENDPOINTS = ["GET /curriculum/", "GET /curriculum/{id}", "GET /progress/summary", "POST /progress/update"]
+PROGRESS_STATUSES = ["pending", "in_progress", "completed", "skipped"]
+
+# Mutable per-request counter; contextvars are copied into the threadpool, the list is shared
+_statements: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("statements", default=None)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[1000, 10000, 100000], help="seeded user counts to test at")
+    parser.add_argument("--curricula", type=int, default=3, help="curricula per seeded user")
+    parser.add_argument("--modules", type=int, default=4, help="modules per curriculum")
+    parser.add_argument("--resources", type=int, default=6, help="resources per module")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per COPY while seeding")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint per step")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sample-users", type=int, default=200, help="seeded users to spread requests across")
+    parser.add_argument("--flag-ratio", type=float, default=1.5, help="p50 growth that counts as superlinear")
+    parser.add_argument("--output", help="write results to this JSON file")
+    return parser.parse_args()
+
+def count_statements(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+def sample_users(engine, count: int) -> List[Dict[str, Any]]:
+    """Seeded users with a token plus the ids of their curricula and resources"""
+    from sqlalchemy import text
+    from app.core.security import create_access_token
+    from benchmarks.seed_data import SEED_EMAIL_DOMAIN
+    
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, email FROM users WHERE email LIKE :pattern ORDER BY random() LIMIT :count"
+        ), {"pattern": f"seed-%@{SEED_EMAIL_DOMAIN}", "count": count}).all()
+        users = []
+        for user_id, email in rows:
+            curriculum_ids = conn.execute(
+                text("SELECT id FROM curriculums WHERE user_id = :user_id"), {"user_id": user_id}
+            ).scalars().all()
+            resource_ids = conn.execute(text(
+                "SELECT r.id FROM learning_resources r "
+                "JOIN curriculum_modules m ON m.id = r.module_id "
+                "JOIN curriculums c ON c.id = m.curriculum_id "
+                "WHERE c.user_id = :user_id"
+            ), {"user_id": user_id}).scalars().all()
+            users.append({
+                "headers": {"Authorization": f"Bearer {create_access_token({'sub': email})}"},
+                "curriculum_ids": curriculum_ids,
+                "resource_ids": resource_ids
+            })
+    return users
+
+async def run_endpoint(name: str, total: int, concurrency: int, one_call: Callable[[int], Awaitable[bool]]) -> Dict[str, Any]:
+    from benchmarks.common import latency_summary
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statements: List[int] = []
+    errors = 0
+    
+    async def worker(i: int):
+        nonlocal errors
+        async with semaphore:
+            counter = [0]
+            token = _statements.set(counter)
+            started = time.perf_counter()
+            try:
+                ok = await one_call(i)
+            except Exception:
+                ok = False
+            finally:
+                _statements.reset(token)
+            if ok:
+                latencies.append(time.perf_counter() - started)
+                statements.append(counter[0])
+            else:
+                errors += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    result = {"endpoint": name, "rps": round(len(latencies) / elapsed, 2), "errors": errors}
+    result.update(latency_summary(latencies))
+    result["sql_avg"] = round(sum(statements) / len(statements), 2) if statements else 0.0
+    result["sql_max"] = max(statements) if statements else 0
+    return result
+
+async def run_step(args: argparse.Namespace, app, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    import httpx
+    
+    rng = random.Random(0)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=120) as client:
+        
+        async def list_curricula(i: int) -> bool:
+            user = users[i % len(users)]
+            response = await client.get("/api/v1/curriculum/", headers=user["headers"])
+            return response.status_code == 200
+        
+        async def get_curriculum(i: int) -> bool:
+            user = users[i % len(users)]
+            curriculum_id = rng.choice(user["curriculum_ids"])
+            response = await client.get(f"/api/v1/curriculum/{curriculum_id}", headers=user["headers"])
+            return response.status_code == 200
+        
+        async def progress_summary(i: int) -> bool:
+            user = users[i % len(users)]
+            response = await client.get("/api/v1/progress/summary", headers=user["headers"])
+            return response.status_code == 200
+        
+        async def update_progress(i: int) -> bool:
+            user = users[i % len(users)]
+            response = await client.post("/api/v1/progress/update", headers=user["headers"], json={
+                "resource_id": rng.choice(user["resource_ids"]),
+                "status": rng.choice(PROGRESS_STATUSES)
+            })
+            return response.status_code == 200
+        
+        calls = [list_curricula, get_curriculum, progress_summary, update_progress]
+        results = []
+        for name, call in zip(ENDPOINTS, calls):
+            # A few untimed calls so the connection pool and caches are warm
+            for i in range(min(10, len(users))):
+                await call(i)
+            results.append(await run_endpoint(name, args.requests, args.concurrency, call))
+        return results
+
+def superlinear(rows: List[Dict[str, Any]], flag_ratio: float) -> List[str]:
+    """Endpoints whose cost grew between the smallest and largest step"""
+    steps = sorted({row["users"] for row in rows})
+    if len(steps) < 2:
+        return []
+    by_key = {(row["users"], row["endpoint"]): row for row in rows}
+    flagged = []
+    for endpoint in ENDPOINTS:
+        first, last = by_key.get((steps[0], endpoint)), by_key.get((steps[-1], endpoint))
+        if not first or not last or not first["count"] or not last["count"]:
+            continue
+        ratio = last["p50_ms"] / first["p50_ms"] if first["p50_ms"] else 0.0
+        if ratio > flag_ratio:
+            flagged.append(f"{endpoint}: p50 {first['p50_ms']}ms -> {last['p50_ms']}ms ({ratio:.1f}x) from {steps[0]} to {steps[-1]} users")
+        if last["sql_avg"] > first["sql_avg"]:
+            flagged.append(f"{endpoint}: SQL statements per request {first['sql_avg']} -> {last['sql_avg']}")
+    return flagged
+
+async def main() -> int:
+    args = parse_args()
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    
+    from sqlalchemy import event
+    from main import app
+    from app.core.database import engine
+    from benchmarks.common import print_table
+    from benchmarks.seed_data import seed
+    
+    event.listen(engine, "before_cursor_execute", count_statements)
+    
+    rows = []
+    for step in sorted(args.steps):
+        started = time.perf_counter()
+        inserted = seed(engine, step, args.curricula, args.modules, args.resources, args.chunk_size)
+        print(f"Seeded up to {step} users ({sum(inserted.values())} new rows in {time.perf_counter() - started:.1f}s)")
+        
+        users = sample_users(engine, args.sample_users)
+        for result in await run_step(args, app, users):
+            result["users"] = step
+            rows.append(result)
+    
+    print_table(rows, ["users", "endpoint", "rps", "p50_ms", "p95_ms", "p99_ms", "sql_avg", "sql_max", "errors"])
+    
+    flagged = superlinear(rows, args.flag_ratio)
+    for line in flagged:
+        print(f"SUPERLINEAR {line}")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": rows,
+                "superlinear": flagged
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
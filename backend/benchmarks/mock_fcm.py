@@ -0,0 +1,100 @@
+"""Local stand-in for the FCM HTTP v1 messages:send endpoint.
+
+Answers 200 with a message name like FCM. Tokens starting with "stale-"
+get FCM's 404 UNREGISTERED error and tokens starting with "bad-" its 400
+INVALID_ARGUMENT, so callers can check that those are pruned. It can add
+latency and rate-limit every Nth request with 429 and Retry-After. It
+records every token delivered to, how many deliveries it accepted (to
+spot duplicates) and the most requests it had in flight.
+Point FCM_API_URL at it (no credentials needed):
+
+    python -m benchmarks.mock_fcm --port 8026
+    FCM_API_URL=http://127.0.0.1:8026 ...
+"""
+import argparse
+import asyncio
+from typing import Set
+
+def fcm_error(status: int, status_name: str, message: str, error_code: str):
+    from aiohttp import web
+    return web.json_response({"error": {
+        "code": status,
+        "message": message,
+        "status": status_name,
+        "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": error_code}]
+    }}, status=status)
+
+class MockFCM:
+    def __init__(self, latency_ms: float = 0, rate_limit_every: int = 0):
+        self.latency_ms = latency_ms
+        self.rate_limit_every = rate_limit_every
+        
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delivered: Set[str] = set()
+        self.deliveries = 0
+        self._runner = None
+    
+    async def handle(self, request):
+        from aiohttp import web
+        
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000)
+            if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+                response = fcm_error(429, "RESOURCE_EXHAUSTED", "Quota exceeded.", "QUOTA_EXCEEDED")
+                response.headers["Retry-After"] = "0"
+                return response
+            
+            token = (await request.json())["message"]["token"]
+            if token.startswith("stale-"):
+                return fcm_error(404, "NOT_FOUND", "Requested entity was not found.", "UNREGISTERED")
+            if token.startswith("bad-"):
+                return fcm_error(
+                    400, "INVALID_ARGUMENT", "The registration token is not a valid FCM registration token", "INVALID_ARGUMENT"
+                )
+            
+            self.delivered.add(token)
+            self.deliveries += 1
+            project = request.match_info["project"]
+            return web.json_response({"name": f"projects/{project}/messages/{self.requests}"})
+        finally:
+            self.in_flight -= 1
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running event loop and return the base URL"""
+        from aiohttp import web
+        
+        app = web.Application()
+        app.router.add_post("/v1/projects/{project}/messages:send", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        return f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+    
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def serve(args: argparse.Namespace):
+    mock = MockFCM(args.latency_ms, args.rate_limit_every)
+    url = await mock.start(port=args.port)
+    print(f"Mock FCM listening on {url}")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await mock.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    asyncio.run(serve(parser.parse_args()))
\ No newline at end of file
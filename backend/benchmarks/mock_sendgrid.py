@@ -0,0 +1,110 @@
+"""Local stand-in for SendGrid's v3 mail/send endpoint.
+
+Accepts the same JSON as SendGrid, enforces its 1000-personalization cap
+and answers 202. It can add latency, rate-limit every Nth request with 429
+and Retry-After, fail a share of requests with 503, and reject addresses
+on a chosen domain with SendGrid's 400 error format. Every accepted
+recipient and their substitutions are recorded, and every accepted
+delivery counted, so callers can check what was delivered and how often.
+Point SENDGRID_API_URL at it:
+
+    python -m benchmarks.mock_sendgrid --port 8025
+    SENDGRID_API_URL=http://127.0.0.1:8025 SENDGRID_API_KEY=test ...
+"""
+import argparse
+import asyncio
+import random
+from typing import Dict
+
+MAX_PERSONALIZATIONS = 1000
+
+class MockSendGrid:
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        rate_limit_every: int = 0,
+        error_rate: float = 0,
+        reject_domain: str = "invalid.example",
+        seed: int = 42
+    ):
+        self.latency_ms = latency_ms
+        self.rate_limit_every = rate_limit_every
+        self.error_rate = error_rate
+        self.reject_domain = reject_domain
+        self.random = random.Random(seed)
+        
+        self.requests = 0
+        self.accepted_requests = 0
+        self.delivered: Dict[str, Dict[str, str]] = {}
+        self.deliveries = 0
+        self._runner = None
+    
+    async def handle(self, request):
+        from aiohttp import web
+        
+        self.requests += 1
+        if request.headers.get("Authorization", "") in ("", "Bearer "):
+            return web.json_response({"errors": [{"message": "Permission denied, wrong credentials"}]}, status=401)
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+            return web.json_response({"errors": [{"message": "too many requests"}]}, status=429, headers={"Retry-After": "0"})
+        if self.random.random() < self.error_rate:
+            return web.json_response({"errors": [{"message": "service unavailable"}]}, status=503)
+        
+        payload = await request.json()
+        personalizations = payload.get("personalizations", [])
+        if not personalizations or len(personalizations) > MAX_PERSONALIZATIONS:
+            return web.json_response({"errors": [{
+                "message": f"The personalizations field must have between 1 and {MAX_PERSONALIZATIONS} items",
+                "field": "personalizations"
+            }]}, status=400)
+        errors = [
+            {"message": "Does not contain a valid address.", "field": f"personalizations.{i}.to.0.email"}
+            for i, personalization in enumerate(personalizations)
+            if personalization["to"][0]["email"].endswith("@" + self.reject_domain)
+        ]
+        if errors:
+            # Like SendGrid, one bad address fails the whole request
+            return web.json_response({"errors": errors}, status=400)
+        
+        self.accepted_requests += 1
+        for personalization in personalizations:
+            self.delivered[personalization["to"][0]["email"]] = personalization.get("substitutions", {})
+        self.deliveries += len(personalizations)
+        return web.Response(status=202)
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running event loop and return the base URL"""
+        from aiohttp import web
+        
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v3/mail/send", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        return f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+    
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def serve(args: argparse.Namespace):
+    mock = MockSendGrid(args.latency_ms, args.rate_limit_every, args.error_rate)
+    url = await mock.start(port=args.port)
+    print(f"Mock SendGrid listening on {url}")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await mock.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with 503")
+    asyncio.run(serve(parser.parse_args()))
\ No newline at end of file
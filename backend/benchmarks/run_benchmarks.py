@@ -0,0 +1,240 @@
+"""Offline end-to-end benchmarks for the AI endpoints using the fake LLM provider.
+
+Starts the real FastAPI app under uvicorn with AI_PROVIDER=fake (unless
+--base-url points at a running server), drives /curriculum/generate,
+/agent/chat and the agent WebSocket concurrently, and reports RPS and
+p50/p95/p99 latency per endpoint. A generate sample runs from submitting
+the job until polling sees it finish. Needs the database from DATABASE_URL,
+migrated with `alembic upgrade head`.
+
+    python -m benchmarks.run_benchmarks --output bench/baseline.json
+    python -m benchmarks.run_benchmarks --compare bench/baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--scenarios", nargs="+", default=["generate", "chat", "websocket"])
+    parser.add_argument("--requests", type=int, default=200, help="requests (or WebSocket messages) per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-distribution", default="lognormal")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must happen before the app (and so Settings) is imported
+    os.environ.setdefault("AI_PROVIDER", "fake")
+    os.environ.setdefault("ENABLE_BACKGROUND_TASKS", "false")
+    # Canned URLs point nowhere real; link checks would only measure the network
+    os.environ.setdefault("LINK_VALIDATION_ENABLED", "false")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", str(args.llm_jitter_ms))
+    os.environ.setdefault("FAKE_LLM_LATENCY_DISTRIBUTION", args.llm_distribution)
+    # Enough generation workers and per-user job slots that --concurrency is what limits the load
+    os.environ.setdefault("GENERATION_WORKER_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("GENERATION_MAX_ACTIVE_JOBS_PER_USER", str(args.concurrency))
+    os.environ.setdefault("GENERATION_POLL_INTERVAL_SECONDS", "0.5")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_server(port: int):
+    import uvicorn
+    from main import app
+    from app.services.generation_jobs import generation_job_runner
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    # The lifespan (and with it background tasks) is off, but generate needs the job workers
+    await generation_job_runner.start()
+    return server, task
+
+async def create_users(client, count: int) -> List[Dict[str, Any]]:
+    """Register and log in benchmark users with profiles"""
+    run_id = uuid.uuid4().hex[:8]
+    users = []
+    for i in range(count):
+        credentials = {"email": f"bench-{run_id}-{i}@example.com", "password": "benchmark-password"}
+        await client.post("/api/v1/users/register", json=credentials)
+        token = (await client.post("/api/v1/users/login", json=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.put("/api/v1/users/me/profile", headers=headers, json={
+            "learning_style": "visual",
+            "pace": "moderate",
+            "interests": ["programming", "data science"],
+            "goals": ["Build ML models"]
+        })
+        me = (await client.get("/api/v1/users/me", headers=headers)).json()
+        users.append({"id": me["id"], "token": token, "headers": headers})
+    return users
+
+async def run_load(name: str, total: int, concurrency: int, one_call: Callable[[int], Awaitable[bool]]) -> Dict[str, Any]:
+    from benchmarks.common import latency_summary
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+    
+    async def worker(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await one_call(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    result = {"endpoint": name, "rps": round(len(latencies) / elapsed, 2), "errors": errors}
+    result.update(latency_summary(latencies))
+    return result
+
+async def run_scenarios(args: argparse.Namespace, base_url: str) -> List[Dict[str, Any]]:
+    import httpx
+    import websockets
+    
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        users = await create_users(client, args.users)
+        
+        async def generate(i: int) -> bool:
+            user = users[i % len(users)]
+            response = await client.post("/api/v1/curriculum/generate", headers=user["headers"], json={
+                "title": f"Benchmark Topic {i % 20}",
+                "description": "Generated by the offline benchmark"
+            })
+            if response.status_code != 202:
+                return False
+            job = response.json()
+            while job["status"] in ("queued", "running"):
+                await asyncio.sleep(0.1)
+                job = (await client.get(f"/api/v1/curriculum/jobs/{job['id']}", headers=user["headers"])).json()
+            return job["status"] == "succeeded"
+        
+        async def chat(i: int) -> bool:
+            user = users[i % len(users)]
+            response = await client.post("/api/v1/agent/chat", headers=user["headers"], json={
+                "message": f"How should I approach lesson {i}?"
+            })
+            return response.status_code == 200
+        
+        results = []
+        for scenario in args.scenarios:
+            if scenario == "generate":
+                results.append(await run_load("POST /curriculum/generate", args.requests, args.concurrency, generate))
+            elif scenario == "chat":
+                results.append(await run_load("POST /agent/chat", args.requests, args.concurrency, chat))
+            elif scenario == "websocket":
+                results.append(await run_websocket(args, base_url, users, websockets))
+            else:
+                raise SystemExit(f"Unknown scenario: {scenario}")
+        return results
+
+async def run_websocket(args: argparse.Namespace, base_url: str, users, websockets) -> Dict[str, Any]:
+    """Each connection sends messages back to back; every round trip is one sample"""
+    ws_url = base_url.replace("http", "ws", 1)
+    connections = min(args.concurrency, args.requests)
+    per_connection = max(1, args.requests // connections)
+    # The socket authenticates with the user's token in the query string
+    sockets = [
+        await websockets.connect(f"{ws_url}/api/v1/agent/ws/{user['id']}?token={user['token']}")
+        for user in (users[i % len(users)] for i in range(connections))
+    ]
+    
+    locks = [asyncio.Lock() for _ in sockets]
+    
+    async def round_trip(i: int) -> bool:
+        # One in-flight message per connection
+        async with locks[i % connections]:
+            ws = sockets[i % connections]
+            await ws.send(json.dumps({"message": f"WebSocket question {i}"}))
+            return "response" in json.loads(await ws.recv())
+    
+    try:
+        return await run_load("WS /agent/ws", connections * per_connection, connections, round_trip)
+    finally:
+        for ws in sockets:
+            await ws.close()
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Regressions relative to a saved baseline"""
+    with open(baseline_path) as f:
+        baseline = {row["endpoint"]: row for row in json.load(f)["results"]}
+    regressions = []
+    for row in results:
+        base = baseline.get(row["endpoint"])
+        if not base:
+            continue
+        if row["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{row['endpoint']}: rps {row['rps']} < baseline {base['rps']}")
+        for key in ("p95_ms", "p99_ms"):
+            if row[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{row['endpoint']}: {key} {row[key]} > baseline {base[key]}")
+        if row["errors"] > base["errors"]:
+            regressions.append(f"{row['endpoint']}: errors {row['errors']} > baseline {base['errors']}")
+    return regressions
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    from benchmarks.common import print_table
+    
+    server = task = None
+    base_url = args.base_url
+    if not base_url:
+        port = free_port()
+        server, task = await start_server(port)
+        base_url = f"http://127.0.0.1:{port}"
+    
+    try:
+        results = await run_scenarios(args, base_url)
+    finally:
+        if server:
+            from app.services.generation_jobs import generation_job_runner
+            await generation_job_runner.stop()
+            server.should_exit = True
+            await task
+    
+    print_table(results, ["endpoint", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors"])
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": vars(args),
+                "results": results
+            }, f, indent=2)
+    
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
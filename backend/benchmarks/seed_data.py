@@ -0,0 +1,201 @@
+"""Bulk-load realistic users, profiles, curricula, modules and resources.
+
+Rows are generated in chunks and streamed into PostgreSQL with COPY, with ids
+assigned up front so child rows reference their parents without round trips.
+Seeding is incremental: --users is the target number of seeded users, so
+repeated runs grow the dataset step by step. All seeded users log in as
+seed-<n>@load.test with the password "seed-password". Run
+`alembic upgrade head` first.
+
+    python -m benchmarks.seed_data --users 100000 --curricula 3 --modules 4 --resources 6
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+SEED_EMAIL_DOMAIN = "load.test"
+SEED_PASSWORD = "seed-password"
+
+LEARNING_STYLES = ["visual", "auditory", "kinesthetic"]
+PACES = ["slow", "moderate", "fast"]
+INTERESTS = ["python", "machine learning", "web development", "statistics", "design", "history", "spanish"]
+RESOURCE_TYPES = ["VIDEO", "ARTICLE", "INTERACTIVE", "QUIZ", "SIMULATION"]
+# Enum names as SQLAlchemy stores them, weighted towards a typical learner's backlog
+STATUSES = ["PENDING"] * 10 + ["IN_PROGRESS"] * 3 + ["COMPLETED"] * 6 + ["SKIPPED"]
+
+def seed_email(n: int) -> str:
+    return f"seed-{n}@{SEED_EMAIL_DOMAIN}"
+
+def pg_array(values: Sequence[str]) -> str:
+    return "{" + ",".join('"' + value.replace('"', '\\"') + '"' for value in values) + "}"
+
+class CopyWriter:
+    """Buffers rows as CSV and streams them to a table with COPY on flush"""
+    
+    def __init__(self, cursor, table: str, columns: List[str]):
+        self.cursor = cursor
+        self.sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = 0
+        self.total = 0
+    
+    def write(self, row: Sequence) -> None:
+        self.writer.writerow(["" if value is None else value for value in row])
+        self.pending += 1
+    
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        self.buffer.seek(0)
+        self.cursor.copy_expert(self.sql, self.buffer)
+        self.total += self.pending
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = 0
+
+def seeded_user_count(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT count(*) FROM users WHERE email LIKE :pattern"),
+            {"pattern": f"seed-%@{SEED_EMAIL_DOMAIN}"}
+        ).scalar()
+
+def _next_ids(cursor) -> Dict[str, int]:
+    ids = {}
+    for table in ("users", "user_profiles", "curriculums", "curriculum_modules", "learning_resources"):
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {table}")
+        ids[table] = cursor.fetchone()[0] + 1
+    return ids
+
+def seed(
+    engine: Engine,
+    users: int,
+    curricula_per_user: int = 3,
+    modules_per_curriculum: int = 4,
+    resources_per_module: int = 6,
+    chunk_size: int = 50000,
+    random_seed: int = 0
+) -> Dict[str, int]:
+    """Grow the seeded dataset to the given number of users; returns rows inserted per table"""
+    from app.core.security import get_password_hash
+    
+    existing = seeded_user_count(engine)
+    if existing >= users:
+        return {}
+    
+    rng = random.Random(random_seed + existing)
+    password_hash = get_password_hash(SEED_PASSWORD)
+    now = datetime.now(timezone.utc)
+    
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # Serialize concurrent seeders so the id ranges below stay ours
+        cursor.execute("LOCK TABLE users, user_profiles, curriculums, curriculum_modules, learning_resources IN EXCLUSIVE MODE")
+        ids = _next_ids(cursor)
+        
+        writers = {
+            "users": CopyWriter(cursor, "users", ["id", "email", "password_hash", "created_at"]),
+            "user_profiles": CopyWriter(cursor, "user_profiles", ["id", "user_id", "learning_style", "pace", "interests", "goals", "created_at"]),
+            "curriculums": CopyWriter(cursor, "curriculums", ["id", "user_id", "title", "description", "created_at", "updated_at"]),
+            "curriculum_modules": CopyWriter(cursor, "curriculum_modules", ["id", "curriculum_id", "title", "description", '"order"', "created_at"]),
+            "learning_resources": CopyWriter(cursor, "learning_resources", ["id", "module_id", "user_id", "title", "description", "url", "resource_type", "status", '"order"', "created_at", "updated_at"])
+        }
+        
+        # Parents are always flushed before children so foreign keys resolve
+        order = list(writers)
+        
+        def flush_all():
+            for name in order:
+                writers[name].flush()
+        
+        for n in range(existing, users):
+            user_id = ids["users"]
+            ids["users"] += 1
+            created = now - timedelta(days=rng.randint(1, 365))
+            writers["users"].write([user_id, seed_email(n), password_hash, created.isoformat()])
+            
+            interests = rng.sample(INTERESTS, 3)
+            writers["user_profiles"].write([
+                ids["user_profiles"], user_id, rng.choice(LEARNING_STYLES), rng.choice(PACES),
+                pg_array(interests), pg_array([f"Get better at {interests[0]}"]), created.isoformat()
+            ])
+            ids["user_profiles"] += 1
+            
+            for c in range(curricula_per_user):
+                curriculum_id = ids["curriculums"]
+                ids["curriculums"] += 1
+                topic = rng.choice(INTERESTS)
+                curriculum_created = created + timedelta(days=c)
+                writers["curriculums"].write([
+                    curriculum_id, user_id, f"{topic.title()} Path {c + 1}",
+                    f"A seeded curriculum about {topic}", curriculum_created.isoformat(), None
+                ])
+                
+                for m in range(modules_per_curriculum):
+                    module_id = ids["curriculum_modules"]
+                    ids["curriculum_modules"] += 1
+                    writers["curriculum_modules"].write([
+                        module_id, curriculum_id, f"{topic.title()} Module {m + 1}",
+                        f"Objectives for module {m + 1}", m, curriculum_created.isoformat()
+                    ])
+                    
+                    for r in range(resources_per_module):
+                        status = rng.choice(STATUSES)
+                        updated = None
+                        if status != "PENDING":
+                            updated = (now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))).isoformat()
+                        writers["learning_resources"].write([
+                            ids["learning_resources"], module_id, user_id, f"{topic.title()} resource {m + 1}.{r + 1}",
+                            "Seeded learning resource", f"https://example.com/{topic.replace(' ', '-')}/{module_id}/{r}",
+                            rng.choice(RESOURCE_TYPES), status, r, curriculum_created.isoformat(), updated
+                        ])
+                        ids["learning_resources"] += 1
+            
+            # Resources dominate the row count, so they decide when a chunk is full
+            if writers["learning_resources"].pending >= chunk_size:
+                flush_all()
+        
+        flush_all()
+        for table in order:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+    
+    return {name: writer.total for name, writer in writers.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, required=True, help="target number of seeded users")
+    parser.add_argument("--curricula", type=int, default=3, help="curricula per user")
+    parser.add_argument("--modules", type=int, default=4, help="modules per curriculum")
+    parser.add_argument("--resources", type=int, default=6, help="resources per module")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per COPY")
+    args = parser.parse_args()
+    
+    from app.core.database import engine
+    started = time.perf_counter()
+    counts = seed(engine, args.users, args.curricula, args.modules, args.resources, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+    print(f"Inserted {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
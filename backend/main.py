@@ -1,24 +1,51 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse, JSONResponse
 from contextlib import asynccontextmanager
-import uvicorn
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine
+from app.core.replicas import replica_router
+from app.core.health import readiness
 from app.api.v1.api import api_router
 from app.core.security import verify_token
+from app.core.metrics import metrics
+from app.core.profiling import instrument_engine, profiling_middleware, sampling_profiler
 from app.services.background_tasks import start_background_tasks
+from app.services.generation_jobs import generation_job_runner
+from app.services.email_service import email_client
+from app.services.link_validator import link_validator
+from app.services.outbox import outbox_dispatcher
+from app.services.push_service import push_client
+from app.services.token_quota import token_quota
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    for replica_engine in replica_router.engines:
+        instrument_engine(replica_engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    if settings.PROFILING_ENABLED:
+        sampling_profiler.start()
+    await replica_router.start()
+    await token_quota.start()
     await start_background_tasks()
+    if settings.GENERATION_WORKERS_ENABLED:
+        await generation_job_runner.start()
+    if settings.OUTBOX_WORKERS_ENABLED:
+        await outbox_dispatcher.start()
     yield
     # Shutdown
-    pass
+    await generation_job_runner.stop()
+    await outbox_dispatcher.stop()
+    await link_validator.close()
+    await email_client.close()
+    await push_client.close()
+    await token_quota.stop()
+    await replica_router.stop()
+    sampling_profiler.stop()
 
 app = FastAPI(
     title="Curriculum Architect API",
@@ -36,6 +63,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request latency, SQL and profiling instrumentation
+if settings.METRICS_ENABLED:
+    app.middleware("http")(profiling_middleware)
+
 # Security
 security = HTTPBearer()
 
@@ -58,8 +89,22 @@ async def root():
     return {"message": "Curriculum Architect API", "version": "1.0.0"}
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
+    """Liveness: the process is up and serving; no dependencies are checked"""
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: the database is reachable and fully migrated"""
+    ready, body = readiness()
+    return JSONResponse(body, status_code=200 if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -51,12 +51,9 @@ docker-compose up -d postgres
 echo "⏳ Waiting for database to be ready..."
 sleep 10
 
-# Run database migrations (if using Alembic)
+# Run database migrations
 echo "🔄 Running database migrations..."
-cd backend
-# Uncomment when Alembic is set up
-# alembic upgrade head
-cd ..
+docker-compose run --rm backend alembic upgrade head
 
 # Start all services
 echo "🚀 Starting all services..."